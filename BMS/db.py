@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, When, Value
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    connection_created信号处理：SQLite启用WAL，读写互不阻塞，并设置锁等待时间
+    """
+    if connection.vendor != 'sqlite':
+        return
+    cursor = connection.cursor()
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', ()):
+        cursor.execute('PRAGMA %s = %s' % (name, value))
+
+
+def bulk_update(objs, fields, batch_size=500):
+    """
+    批量更新（Django 1.10没有bulk_update）：每批对象生成一条UPDATE，各字段的新值用CASE WHEN按主键取；
+    一批中全为None的字段直接SET NULL，全为NULL的CASE在PostgreSQL中推断为text，不能赋给日期等类型的列
+    :param objs: 同一模型的对象
+    :param fields: 需更新的字段名
+    :return: 更新的行数
+    """
+    objs = list(objs)
+    if not objs or not fields:
+        return 0
+    model = type(objs[0])
+    fields = [model._meta.get_field(name) for name in fields]
+    if connections[model.objects.db].vendor == 'sqlite':
+        # SQLite单条语句最多999个参数：每个字段每行2个，另加IN列表中的主键
+        batch_size = min(batch_size, max(999 // (2 * len(fields) + 1), 1))
+    updated = 0
+    for i in range(0, len(objs), batch_size):
+        batch = objs[i:i + batch_size]
+        values = {}
+        for field in fields:
+            if all(getattr(obj, field.attname) is None for obj in batch):
+                values[field.attname] = None
+            else:
+                values[field.attname] = Case(*[When(pk=obj.pk, then=Value(getattr(obj, field.attname)))
+                                               for obj in batch], output_field=field)
+        updated += model.objects.filter(pk__in=[obj.pk for obj in batch]).update(**values)
+    return updated
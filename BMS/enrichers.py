@@ -0,0 +1,57 @@
+"""
+列表页计算列按页批量计算
+
+ModelAdmin声明row_enrichers，每项为 (名称, 方法名)。方法接收一页对象列表，一般执行一次批量查询，返回 {主键: 值}，
+结果写入各对象的 __名称__ 属性。列表页在取出本页结果后、渲染前统一执行，导出按块执行；计算列通过row_value读取，
+列表页之外（单个对象）按需只对该对象计算。
+"""
+from django.contrib.admin.views.main import ChangeList
+
+_changelist_classes = {}
+
+
+def enrich(objs, name, enricher):
+    objs = list(objs)
+    if not objs:
+        return
+    values = enricher(objs)
+    for obj in objs:
+        setattr(obj, '__%s__' % name, values.get(obj.pk))
+
+
+class EnrichedChangeList(ChangeList):
+    def get_results(self, *args, **kwargs):
+        super(EnrichedChangeList, self).get_results(*args, **kwargs)
+        self.model_admin.enrich_rows(self.result_list)
+
+
+def enriched_changelist(changelist_class):
+    # 在admin原有的ChangeList上加入按页计算，每个ChangeList类只生成一次子类
+    if not issubclass(changelist_class, EnrichedChangeList):
+        if changelist_class not in _changelist_classes:
+            _changelist_classes[changelist_class] = type('Enriched%s' % changelist_class.__name__,
+                                                         (EnrichedChangeList, changelist_class), {})
+        changelist_class = _changelist_classes[changelist_class]
+    return changelist_class
+
+
+class RowEnricherMixin(object):
+    """
+    row_enrichers：[(名称, 方法名), ...]，按顺序执行
+    admin自定义get_changelist时，返回的ChangeList应继承EnrichedChangeList
+    """
+    row_enrichers = ()
+
+    def get_changelist(self, request, **kwargs):
+        return enriched_changelist(super(RowEnricherMixin, self).get_changelist(request, **kwargs))
+
+    def enrich_rows(self, objs):
+        # result_list为queryset时求值一次，之后渲染复用同一批对象
+        for name, method in self.row_enrichers:
+            enrich(objs, name, getattr(self, method))
+
+    def row_value(self, obj, name):
+        attr = '__%s__' % name
+        if not hasattr(obj, attr):
+            enrich([obj], name, getattr(self, dict(self.row_enrichers)[name]))
+        return getattr(obj, attr)
@@ -0,0 +1,118 @@
+"""
+SQL查询记录
+
+替换连接的游标，记录每条查询的SQL、耗时和来源：来源为触发查询的list_display字段（由admin的lookup_field调用），
+通过向上查找调用栈中lookup_field的帧得到，只比较代码对象，开销很小。
+"""
+import sys
+import time
+from collections import Counter
+from django.contrib.admin.utils import lookup_field
+from django.db import connections
+from django.db.backends.utils import CursorWrapper
+
+LOOKUP_FIELD_CODE = lookup_field.__code__
+MAX_STACK_DEPTH = 50
+
+
+def query_source():
+    # 调用栈中最近的lookup_field帧对应的list_display字段名
+    frame = sys._getframe(2)
+    depth = 0
+    while frame is not None and depth < MAX_STACK_DEPTH:
+        if frame.f_code is LOOKUP_FIELD_CODE:
+            name = frame.f_locals.get('name')
+            return name if isinstance(name, str) else getattr(name, '__name__', repr(name))
+        frame = frame.f_back
+        depth += 1
+    return None
+
+
+class RecordingCursor(CursorWrapper):
+    def __init__(self, cursor, db, recorder):
+        super(RecordingCursor, self).__init__(cursor, db)
+        self.recorder = recorder
+
+    def execute(self, sql, params=None):
+        started = time.perf_counter()
+        try:
+            return super(RecordingCursor, self).execute(sql, params)
+        finally:
+            self.recorder.add(self.db.alias, sql, params, time.perf_counter() - started)
+
+    def executemany(self, sql, param_list):
+        started = time.perf_counter()
+        try:
+            return super(RecordingCursor, self).executemany(sql, param_list)
+        finally:
+            self.recorder.add(self.db.alias, sql, None, time.perf_counter() - started)
+
+
+class QueryRecorder(object):
+    """
+    记录代码块内所有数据库连接的查询
+    queries为(数据库, SQL, 参数, 耗时秒数, 来源)列表
+    """
+    def __init__(self, using=None):
+        self.using = using
+        self.queries = []
+
+    def add(self, alias, sql, params, seconds):
+        self.queries.append((alias, sql, params, seconds, query_source()))
+
+    def __enter__(self):
+        # 包装连接原有的游标工厂（DEBUG开启时使用make_debug_cursor），可以嵌套使用，也不影响调试记录
+        self.saved = []
+        for connection in [connections[self.using]] if self.using else connections.all():
+            for name in ('make_cursor', 'make_debug_cursor'):
+                self.saved.append((connection, name, connection.__dict__.get(name)))
+                setattr(connection, name, self.wrap(connection, getattr(connection, name)))
+        return self
+
+    def wrap(self, connection, make_cursor):
+        return lambda cursor: RecordingCursor(make_cursor(cursor), connection, self)
+
+    def __exit__(self, *exc_info):
+        for connection, name, previous in reversed(self.saved):
+            if previous is None:
+                delattr(connection, name)
+            else:
+                setattr(connection, name, previous)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def seconds(self):
+        return sum(q[3] for q in self.queries)
+
+    def repeated(self):
+        """
+        重复执行的SQL
+        :return: [(SQL, 执行次数, 参数完全相同的次数, 来源)]，按执行次数倒序；同一SQL参数不同即N+1查询
+        """
+        sql_counts = Counter(q[1] for q in self.queries)
+        exact_counts = Counter((q[1], _params_key(q[2])) for q in self.queries)
+        sources = {}
+        for q in self.queries:
+            if q[4]:
+                sources.setdefault(q[1], q[4])
+        result = []
+        for sql, count in sql_counts.most_common():
+            if count < 2:
+                break
+            exact = sum(n - 1 for (s, _), n in exact_counts.items() if s == sql)
+            result.append((sql, count, exact, sources.get(sql)))
+        return result
+
+    def by_source(self):
+        # {list_display字段: 查询数}
+        return Counter(q[4] for q in self.queries if q[4])
+
+
+def _params_key(params):
+    try:
+        return hash(tuple(params)) if params is not None else None
+    except TypeError:
+        return repr(params)
@@ -0,0 +1,102 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from .instrumentation import QueryRecorder
+
+logger = logging.getLogger('BMS.queries')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryInstrumentationMiddleware(object):
+    """
+    记录每个请求的查询数、数据库耗时、重复查询及其来源的list_display字段，超出预算时记录警告或抛出异常
+
+    相关设置：
+    QUERY_BUDGETS：[(URL正则, 查询数上限), ...]，按顺序取第一个匹配项
+    QUERY_BUDGET_DEFAULT：未匹配时的查询数上限，None为不限
+    QUERY_BUDGET_ACTION：超出预算时 'log'（默认）或 'raise'
+    QUERY_METRICS_DB：SQLite文件路径，设置后每个请求的统计另写入该文件的metrics表
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.budgets = [(re.compile(pattern), budget) for pattern, budget in getattr(settings, 'QUERY_BUDGETS', ())]
+        self.default_budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+        self.action = getattr(settings, 'QUERY_BUDGET_ACTION', 'log')
+        if self.action not in ('log', 'raise'):
+            raise ImproperlyConfigured("QUERY_BUDGET_ACTION must be 'log' or 'raise'")
+        self.metrics = MetricsStore(settings.QUERY_METRICS_DB) if getattr(settings, 'QUERY_METRICS_DB', None) else None
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        budget = self.get_budget(request.path)
+        repeated = recorder.repeated()
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.seconds * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'duplicates': sum(exact for _, _, exact, _ in repeated),
+            'repeated': [{'sql': sql[:200], 'count': count, 'exact': exact, 'source': source}
+                         for sql, count, exact, source in repeated[:5]],
+            'sources': dict(recorder.by_source()),
+            'budget': budget,
+        }
+        if self.metrics:
+            self.metrics.write(record)
+        if budget is not None and recorder.count > budget:
+            logger.warning(json.dumps(record, ensure_ascii=False))
+            if self.action == 'raise':
+                raise QueryBudgetExceeded('%s %s 执行了 %s 次查询，超出预算 %s' % (
+                    request.method, request.path, recorder.count, budget))
+        elif logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(record, ensure_ascii=False))
+        return response
+
+    def get_budget(self, path):
+        for pattern, budget in self.budgets:
+            if pattern.search(path):
+                return budget
+        return self.default_budget
+
+
+class MetricsStore(object):
+    """
+    请求统计写入独立的SQLite文件，不占用业务数据库的连接和写锁
+    """
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def connection(self):
+        if not hasattr(self.local, 'connection'):
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS metrics (time REAL, method TEXT, path TEXT, status INTEGER, '
+                               'queries INTEGER, db_ms REAL, total_ms REAL, duplicates INTEGER, detail TEXT)')
+            self.local.connection = connection
+        return self.local.connection
+
+    def write(self, record):
+        try:
+            self.connection().execute(
+                'INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (time.time(), record['method'], record['path'], record['status'], record['queries'],
+                 record['db_ms'], record['total_ms'], record['duplicates'],
+                 json.dumps({'repeated': record['repeated'], 'sources': record['sources']}, ensure_ascii=False)))
+        except sqlite3.Error:
+            # 统计写入失败不影响请求
+            logger.exception('写入请求统计失败')
@@ -0,0 +1,262 @@
+"""
+生成压测用的模拟数据
+
+数据量以合同数为规模：每个合同对应客户意向及跟进记录，合同下若干项目，每个项目若干样品，
+样品按实验阶段生成下单记录和提取、质检、建库任务，合同按到款情况生成开票申请、发票和进账。
+按合同分块生成并以bulk_create写入，内存占用与总量无关；主键在写入前预先分配，子表直接引用，无需回查。
+指定随机种子时，在同一起始数据库上生成的数据完全相同。
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from crm.models import Customer, Intention, IntentionRecord
+from fm.ledger import rebuild_ledger
+from fm.models import Invoice as FmInvoice, Bill
+from lims.models import SampleInfo, ExtTask, QcTask, LibTask
+from mm.models import Contract, Invoice as MmInvoice
+from pm.models import Project, ProjectProgress, ExtSubmit, QcSubmit, LibSubmit
+from pm.progress import _refresh
+from lims.stages import refresh_stages
+from pm.status import STAGE_TASKS
+
+PROJECTS_PER_CONTRACT = 4
+SAMPLES_PER_PROJECT = 10
+RECORDS_PER_INTENTION = 3
+SUBMITS = (
+    (ExtTask, ExtSubmit, '提取任务'),
+    (QcTask, QcSubmit, '质检任务'),
+    (LibTask, LibSubmit, '建库任务'),
+)
+START_DATE = date(2016, 1, 4)
+
+
+class Seeder(object):
+    def __init__(self, seed=None, batch_size=1000, stdout=None):
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.stdout = stdout
+        self.counts = {}
+        self.next_ids = {}
+
+    def log(self, message):
+        if self.stdout:
+            self.stdout.write(message)
+
+    def allocate(self, model, objs):
+        # 预先分配主键，使子表可直接引用
+        if model not in self.next_ids:
+            self.next_ids[model] = (model.objects.aggregate(Max('pk'))['pk__max'] or 0) + 1
+        for obj in objs:
+            obj.pk = self.next_ids[model]
+            self.next_ids[model] += 1
+        return objs
+
+    def insert(self, model, objs):
+        # 显式指定的batch_size不受数据库参数个数限制约束，需与后端允许的上限取小
+        limit = connection.ops.bulk_batch_size(model._meta.concrete_fields, objs)
+        model.objects.bulk_create(objs, batch_size=min(self.batch_size, max(limit, 1)))
+        self.counts[model._meta.label] = self.counts.get(model._meta.label, 0) + len(objs)
+        return objs
+
+    def save(self, model, objs):
+        return self.insert(model, self.allocate(model, objs))
+
+    def reset_sequences(self):
+        # PostgreSQL等使用序列的数据库需在显式写入主键后重置序列
+        statements = connection.ops.sequence_reset_sql(no_style(), list(self.next_ids))
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def day(self, start=START_DATE, span=720):
+        return start + timedelta(self.random.randrange(span))
+
+    def users(self, prefix, num):
+        users = []
+        for i in range(num):
+            user, _ = User.objects.get_or_create(username='%s%s' % (prefix, i), defaults={'is_staff': True})
+            users.append(user)
+        return users
+
+    def run(self, scale, chunk_size=100):
+        """
+        :param scale: 合同数
+        :param chunk_size: 每块生成的合同数
+        :return: {模型: 生成的行数}
+        """
+        self.salesmen = self.users('seed_sale', 10)
+        self.staff = self.users('seed_lab', 10)
+        done = 0
+        while done < scale:
+            num = min(chunk_size, scale - done)
+            with transaction.atomic():
+                self.seed_chunk(num)
+            done += num
+            self.log('已生成 %s/%s 个合同' % (done, scale))
+        self.reset_sequences()
+        return self.counts
+
+    def seed_chunk(self, num):
+        customers = self.seed_customers(num)
+        contracts = self.allocate(Contract, [self.contract() for _ in range(num)])
+        for contract, customer in zip(contracts, customers):
+            contract.contract_number = 'SEED%08d' % contract.pk
+            contract.customer = customer
+        mm_invoices, fm_invoices, bills = self.finance(contracts)
+        self.insert(Contract, contracts)
+        self.insert(MmInvoice, mm_invoices)
+        self.insert(FmInvoice, fm_invoices)
+        self.insert(Bill, bills)
+        rebuild_ledger([c.pk for c in contracts])
+        projects = self.save(Project, [self.project(c, i) for c in contracts for i in range(PROJECTS_PER_CONTRACT)])
+        samples = []
+        for project in projects:
+            # 同一项目的样品同日收样
+            receive_date = self.day()
+            samples += [self.sample(project, i, receive_date) for i in range(SAMPLES_PER_PROJECT)]
+        self.save(SampleInfo, samples)
+        tasks = self.seed_tasks(samples)
+        self.seed_submits(tasks)
+        self.save(ProjectProgress, [ProjectProgress(project_id=p.pk) for p in projects])
+        _refresh([p.pk for p in projects], STAGE_TASKS)
+        refresh_stages([p.pk for p in projects])
+
+    def seed_customers(self, num):
+        # 每个合同对应一个客户和一条意向
+        customers = self.save(Customer, [
+            Customer(name='客户%s' % self.random.randrange(100000), organization='模拟单位', department='模拟院系',
+                     address='模拟地址', title='教授', contact=self.random.randrange(10000000, 99999999),
+                     email='seed@example.com', level=self.random.randint(1, 3),
+                     linker=self.random.choice(self.salesmen))
+            for _ in range(num)
+        ])
+        intentions = self.save(Intention, [
+            Intention(customer=customer, project_name='意向项目', project_type=self.random.randint(1, 5),
+                      amount=self.random.randrange(10, 200), closing_date=self.day(),
+                      price=Decimal(self.random.randrange(10, 500) * 1000))
+            for customer in customers
+        ])
+        self.save(IntentionRecord, [
+            IntentionRecord(intention=intention, status=self.random.choice(['初次接触', '方案沟通', '报价', '成交']),
+                            record_date=self.day(), note='')
+            for intention in intentions for _ in range(RECORDS_PER_INTENTION)
+        ])
+        return customers
+
+    def contract(self):
+        amount = Decimal(self.random.randrange(10, 500) * 1000)
+        return Contract(name='模拟合同', type=self.random.randint(1, 5), salesman=self.random.choice(self.salesmen),
+                        price=Decimal(self.random.randrange(100, 999)), range=self.random.randint(1, 3),
+                        fis_amount=amount, fin_amount=amount, send_date=self.day(), receive_date=self.day(),
+                        contract_file='')
+
+    def finance(self, contracts):
+        """
+        到款情况：未开票、已开首款发票未到账、首款到账、全部到账；到账的款期分两笔进账并设置合同到款日
+        :return: (开票申请, 发票, 进账)
+        """
+        mm_invoices, fm_invoices, bills = [], [], []
+        for contract in contracts:
+            state = self.random.randrange(4)
+            for period, amount, invoiced, paid in (('fis', contract.fis_amount, state >= 1, state >= 2),
+                                                   ('fin', contract.fin_amount, state >= 2, state >= 3)):
+                if not invoiced:
+                    continue
+                mm_invoice = MmInvoice(contract=contract, title='模拟发票', period=period.upper(), amount=amount,
+                                       note='', submit=True)
+                mm_invoices.append(mm_invoice)
+                fm_invoice = FmInvoice(invoice=mm_invoice, date=self.day())
+                fm_invoices.append(fm_invoice)
+                if not paid:
+                    continue
+                first = (amount / 2).quantize(Decimal('0.01'))
+                first_date = self.day()
+                last_date = first_date + timedelta(self.random.randrange(60))
+                bills.append(Bill(invoice=fm_invoice, income=first, date=first_date))
+                bills.append(Bill(invoice=fm_invoice, income=amount - first, date=last_date))
+                setattr(contract, '%s_date' % period, last_date)
+        # 关联对象创建时尚无主键，分配主键后重新赋值外键
+        self.allocate(MmInvoice, mm_invoices)
+        for fm_invoice in self.allocate(FmInvoice, fm_invoices):
+            fm_invoice.invoice = fm_invoice.invoice
+            fm_invoice.invoice_code = 'F%011d' % fm_invoice.pk
+        for bill in self.allocate(Bill, bills):
+            bill.invoice = bill.invoice
+        return mm_invoices, fm_invoices, bills
+
+    def project(self, contract, i):
+        flags = [self.random.random() < 0.8 for _ in range(3)]
+        project = Project(contract=contract, customer=contract.customer.name, name='项目%s' % i, service_type='16S',
+                          data_amount='30M', is_ext=flags[0], is_qc=flags[1], is_lib=flags[2],
+                          ext_cycle=5, ext_task_cycle=3, qc_cycle=3, qc_task_cycle=2, lib_cycle=5, lib_task_cycle=3,
+                          seq_cycle=10, ana_cycle=10, is_confirm=self.random.random() < 0.9)
+        # 测序、分析阶段：未开始、测序中、分析中、分析完成
+        stage = self.random.randrange(4)
+        if stage >= 1:
+            project.seq_start_date = self.day()
+        if stage >= 2:
+            project.seq_end_date = project.seq_start_date + timedelta(10)
+            project.ana_start_date = project.seq_end_date
+        if stage >= 3:
+            project.ana_end_date = project.ana_start_date + timedelta(10)
+        return project
+
+    def sample(self, project, i, receive_date):
+        return SampleInfo(project=project, type='DNA', species='人', name='S%s' % i, volume=Decimal('20.000'),
+                          concentration=Decimal('50.000'), receive_date=receive_date,
+                          check=self.random.random() < 0.95)
+
+    def seed_tasks(self, samples):
+        # 各阶段依次进行，前一阶段失败（质检不可风险建库）或未完成则不再下单；每阶段有待处理、成功、失败三种结论
+        tasks = dict((model, []) for _, model in STAGE_TASKS)
+        for sample in samples:
+            project = sample.project
+            if not (project.is_confirm and sample.check):
+                continue
+            sub_date = sample.receive_date
+            for model, enabled in ((ExtTask, project.is_ext), (QcTask, project.is_qc), (LibTask, project.is_lib)):
+                if not enabled:
+                    continue
+                task = model(sample=sample, sub_date=sub_date)
+                tasks[model].append(task)
+                outcome = self.random.random()
+                if outcome >= 0.9:
+                    break
+                task.date = sub_date + timedelta(self.random.randrange(1, 7))
+                task.staff = self.random.choice(self.staff)
+                if model is QcTask:
+                    task.result = 1 if outcome < 0.8 else self.random.choice([2, 3])
+                else:
+                    task.result = outcome < 0.8
+                if task.result in (False, 3):
+                    break
+                sub_date = task.date
+        for model, objs in tasks.items():
+            self.save(model, objs)
+        return tasks
+
+    def seed_submits(self, tasks):
+        # 同一项目同一阶段的任务归入一条下单记录，下单日取最早的任务
+        for task_model, submit_model, label in SUBMITS:
+            groups, dates = {}, {}
+            for task in tasks[task_model]:
+                project = task.sample.project_id
+                groups.setdefault(project, []).append(task.sample_id)
+                dates[project] = min(dates.get(project, task.sub_date), task.sub_date)
+            submits = self.allocate(submit_model, [submit_model(date=dates[project], is_submit=True)
+                                                   for project in groups])
+            for submit in submits:
+                submit.slug = '%s #%s' % (label, submit.pk)
+            self.insert(submit_model, submits)
+            through = submit_model.sample.through
+            self.insert(through, [through(**{'%s_id' % submit_model._meta.model_name: submit.pk,
+                                             'sampleinfo_id': sample_id})
+                                  for submit, sample_ids in zip(submits, groups.values()) for sample_id in sample_ids])
+
+
+def seed(scale, seed=None, batch_size=1000, chunk_size=100, stdout=None):
+    return Seeder(seed=seed, batch_size=batch_size, stdout=stdout).run(scale, chunk_size=chunk_size)
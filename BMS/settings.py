@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'lims',
     'mm',
     'fm',
+    'jobs',
     'import_export',
     'daterange_filter',
 ]
@@ -53,8 +54,62 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'BMS.middleware.QueryInstrumentationMiddleware',
 ]
 
+# 查询统计，见BMS.middleware.QueryInstrumentationMiddleware
+QUERY_BUDGETS = [
+    (r'^/pm/project/$', 50),
+    (r'^/lims/\w+/$', 20),
+    (r'^/(mm|fm)/\w+/$', 20),
+]
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGET_ACTION = 'raise' if os.environ.get('BMS_QUERY_BUDGET_RAISE') else 'log'
+QUERY_METRICS_DB = os.environ.get('BMS_QUERY_METRICS_DB')
+
+# 后台任务，见jobs：所选记录数或上传文件超过以下数量时提交后台任务，由 manage.py run_workers 执行
+JOBS_ASYNC_THRESHOLD = int(os.environ.get('BMS_JOBS_ASYNC_THRESHOLD', 500))
+JOBS_EXPORT_ASYNC_THRESHOLD = int(os.environ.get('BMS_JOBS_EXPORT_ASYNC_THRESHOLD', 20000))
+JOBS_IMPORT_ASYNC_SIZE = 5 * 1024 * 1024
+JOBS_RETRY_DELAY = 60
+# SQLite写锁冲突时重新排队的最长等待秒数
+JOBS_LOCKED_DELAY = 5
+
+# 按业务员筛选的分组：(参数值, 名称, 用户组名)，名单缓存秒数见mm.filters
+SALESMAN_GROUPS = (
+    ('sale', '销售', '销售'),
+    ('company', '公司', '公司'),
+)
+SALESMAN_ROSTER_TIMEOUT = 300
+
+# 项目时间线计划窗口的缓存时间（秒），计划相关字段变动后缓存键随之改变
+TIMELINE_CACHE_TIMEOUT = 7 * 24 * 3600
+TIMELINE_PAGE_SIZE = 500
+
+# 实验排期：各阶段未设置实验产能时每工作日可处理的样品数，排期缓存时间（秒）
+LAB_STAGE_CAPACITY = {'ext': 96, 'qc': 96, 'lib': 48}
+LAB_SCHEDULE_TIMEOUT = 3600
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'BMS.queries': {
+            'handlers': ['console'],
+            'level': os.environ.get('BMS_QUERY_LOG_LEVEL', 'WARNING'),
+        },
+        'jobs': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
 ROOT_URLCONF = 'BMS.urls'
 
 TEMPLATES = [
@@ -80,12 +135,40 @@ WSGI_APPLICATION = 'BMS.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/1.10/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'dev.db'),
+# 通过环境变量BMS_DB选择数据库：sqlite（默认）或postgresql
+
+BMS_DB = os.environ.get('BMS_DB', 'sqlite')
+
+if BMS_DB == 'postgresql':
+    # BMS_DB_POOLER指向pgbouncer等连接池时，连接由连接池复用，Django侧不再保持长连接
+    BMS_DB_POOLER = os.environ.get('BMS_DB_POOLER', '')
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('BMS_DB_NAME', 'bms'),
+            'USER': os.environ.get('BMS_DB_USER', 'bms'),
+            'PASSWORD': os.environ.get('BMS_DB_PASSWORD', ''),
+            'HOST': BMS_DB_POOLER.split(':')[0] if BMS_DB_POOLER else os.environ.get('BMS_DB_HOST', 'localhost'),
+            'PORT': BMS_DB_POOLER.split(':')[1] if ':' in BMS_DB_POOLER else os.environ.get('BMS_DB_PORT', ''),
+            'CONN_MAX_AGE': int(os.environ.get('BMS_DB_CONN_MAX_AGE', 0 if BMS_DB_POOLER else 600)),
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('BMS_DB_NAME', os.path.join(BASE_DIR, 'dev.db')),
+            # 等待写锁的秒数，超时才报database is locked
+            'OPTIONS': {'timeout': 20},
+        }
+    }
+
+# 新建SQLite连接时执行的PRAGMA，见BMS.db.configure_sqlite
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 20000),
+)
 
 
 # Password validation
@@ -129,3 +212,6 @@ STATIC_ROOT = os.path.join(BASE_DIR, STATIC_URL.strip("/"))
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, MEDIA_URL.strip("/"))
+
+# 后台任务的上传文件和导出文件，不对外提供，见jobs.models.JobFileStorage
+JOB_FILE_ROOT = os.environ.get('BMS_JOB_FILE_ROOT', os.path.join(BASE_DIR, 'private', 'jobs'))
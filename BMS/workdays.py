@@ -0,0 +1,138 @@
+"""
+工作日计算
+
+周一至周五为工作日，另按节假日数据文件扣除法定节假日、补入调休上班日。
+工作日序号由周运算直接得出，节假日只需在预先计算的偏移表中二分查找一次，
+计算量与相隔天数无关，并对常用参数做缓存。
+节假日数据按年份维护（国务院办公厅每年年底公布次年安排），日期超出数据覆盖的年份时按周一至周五计算并记录警告。
+"""
+import json
+import logging
+import os
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+HOLIDAYS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'holidays.json')
+
+# 工作日序号起点，须为周一
+EPOCH = date(2000, 1, 3)
+
+
+def _weekday_ordinal(day):
+    # EPOCH至day（不含）之间周一至周五的天数，day早于EPOCH时为负
+    weeks, rest = divmod((day - EPOCH).days, 7)
+    return weeks * 5 + min(rest, 5)
+
+
+def _nth_weekday(n):
+    # 第n个周一至周五（从0计）
+    weeks, rest = divmod(n, 5)
+    return EPOCH + timedelta(weeks * 7 + rest)
+
+
+class BusinessCalendar(object):
+    def __init__(self, holidays=(), workdays=(), years=None):
+        """
+        :param years: 节假日数据覆盖的年份，为None时不检查
+        """
+        self.years = set(years) if years is not None else None
+        self.warned_years = set()
+        # 只有落在周一至周五的节假日和落在周末的调休日会改变工作日
+        self.holidays = set(d for d in holidays if d.weekday() < 5)
+        self.workdays = set(d for d in workdays if d.weekday() >= 5)
+        self.specials = sorted(self.holidays | self.workdays)
+        # offsets[k]：前k个特殊日期对工作日序号的累计修正
+        self.offsets = [0]
+        for day in self.specials:
+            self.offsets.append(self.offsets[-1] + (1 if day in self.workdays else -1))
+        # 每个特殊日期次日的工作日序号，用于由序号反查日期
+        self.next_ordinals = [self.ordinal(day + timedelta(1)) for day in self.specials]
+
+    def is_workday(self, day):
+        self.check_year(day)
+        if day in self.workdays:
+            return True
+        return day.weekday() < 5 and day not in self.holidays
+
+    def check_year(self, day):
+        # 超出节假日数据覆盖的年份时每年只警告一次
+        if self.years is not None and day.year not in self.years and day.year not in self.warned_years:
+            self.warned_years.add(day.year)
+            logger.warning('节假日数据未包含%s年，该年按周一至周五计算工作日，请更新节假日数据文件', day.year)
+
+    def ordinal(self, day):
+        # day（不含）之前的工作日数
+        self.check_year(day)
+        return _weekday_ordinal(day) + self.offsets[bisect_left(self.specials, day)]
+
+    def nth_workday(self, n):
+        # 序号为n的工作日
+        k = bisect_right(self.next_ordinals, n)
+        if k < len(self.specials):
+            special = self.specials[k]
+            if special in self.workdays and self.ordinal(special) == n:
+                return special
+        day = _nth_weekday(n - self.offsets[k])
+        self.check_year(day)
+        return day
+
+    def add_business_days(self, from_date, number_of_days):
+        if not number_of_days:
+            return from_date
+        if number_of_days > 0:
+            return self.nth_workday(self.ordinal(from_date + timedelta(1)) + number_of_days - 1)
+        return self.nth_workday(self.ordinal(from_date) + number_of_days)
+
+
+def load_calendar(path=None):
+    """
+    读取节假日数据文件
+    格式：{"年份": {"holidays": [["起始日", "结束日"], ...], "workdays": ["调休上班日", ...]}}
+    """
+    with open(path or getattr(settings, 'HOLIDAYS_FILE', HOLIDAYS_FILE), encoding='utf-8') as f:
+        data = json.load(f)
+    holidays, workdays = [], []
+    for year in data.values():
+        for start, end in year.get('holidays', []):
+            day = _parse(start)
+            while day <= _parse(end):
+                holidays.append(day)
+                day += timedelta(1)
+        workdays += [_parse(day) for day in year.get('workdays', [])]
+    return BusinessCalendar(holidays, workdays, years=[int(year) for year in data])
+
+
+def _parse(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+_calendar = None
+
+
+def get_calendar():
+    global _calendar
+    if _calendar is None:
+        _calendar = load_calendar()
+    return _calendar
+
+
+@lru_cache(maxsize=4096)
+def add_business_days(from_date, number_of_days):
+    return get_calendar().add_business_days(from_date, number_of_days)
+
+
+def add_business_days_many(items):
+    """
+    批量计算截止日，同一页中相同的(起始日, 工作日数)只计算一次
+    :param items: (起始日, 工作日数)序列
+    :return: 对应的日期列表
+    """
+    return [add_business_days(from_date, number_of_days) for from_date, number_of_days in items]
+
+
+def is_workday(day):
+    return get_calendar().is_workday(day)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 18:30
+from __future__ import unicode_literals
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0004_auto_20161226_1709'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Intention',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project_name', models.CharField(max_length=50, verbose_name='项目名称')),
+                ('project_type', models.IntegerField(choices=[(1, '16S/ITS'), (2, '宏基因组'), (3, '单菌'), (4, '转录组'), (5, '其它')], default=1, verbose_name='项目类型')),
+                ('amount', models.IntegerField(verbose_name='数量')),
+                ('closing_date', models.DateField(default=datetime.date(2026, 10, 19), verbose_name='预计成交时间')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='预计成交价')),
+            ],
+            options={
+                'verbose_name': '意向管理',
+                'verbose_name_plural': '意向管理',
+            },
+        ),
+        migrations.CreateModel(
+            name='IntentionRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=15, verbose_name='进展/状态')),
+                ('record_date', models.DateField(default=datetime.date(2026, 10, 19), verbose_name='跟进时间')),
+                ('note', models.TextField(blank=True, verbose_name='备注')),
+                ('intention', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='crm.Intention', verbose_name='意向项目')),
+            ],
+            options={
+                'verbose_name': '进展记录',
+                'verbose_name_plural': '进展记录',
+            },
+        ),
+        migrations.RemoveField(
+            model_name='customer',
+            name='call',
+        ),
+        migrations.RemoveField(
+            model_name='customer',
+            name='phone',
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='contact',
+            field=models.PositiveIntegerField(default=0, verbose_name='联系方式'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='department',
+            field=models.CharField(default='', max_length=20, verbose_name='院系/科室（全称）'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='level',
+            field=models.IntegerField(choices=[(1, '一般'), (2, '重要'), (3, '非常重要')], default=1, verbose_name='客户分级'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='title',
+            field=models.CharField(default='', max_length=50, verbose_name='职务'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='address',
+            field=models.CharField(max_length=50, verbose_name='办公地址'),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='name',
+            field=models.CharField(max_length=12, verbose_name='客户姓名'),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='organization',
+            field=models.CharField(max_length=20, verbose_name='单位（全称）'),
+        ),
+        migrations.AddField(
+            model_name='intention',
+            name='customer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='crm.Customer', verbose_name='客户'),
+        ),
+    ]
@@ -6,20 +6,17 @@ from django.contrib.admin.views.main import ChangeList
 from django.db.models import Sum
 from django.forms.models import BaseInlineFormSet
 from daterange_filter.filter import DateRangeFilter
-from django.contrib.auth.models import User
+from BMS.export import StreamingExportMixin
+from mm.filters import SalesmanListFilter
 
 
 class InvoiceChangeList(ChangeList):
     def get_results(self, *args, **kwargs):
+        # 应收、到账合计按发票的进账合计计算，见fm.ledger
         super(InvoiceChangeList, self).get_results(*args, **kwargs)
-        self.sum = []
-        q_income = self.result_list.aggregate(income_sum=Sum('bill__income'))
-        q_amount = self.result_list.aggregate(amount_sum=Sum('invoice__invoice__invoice__amount'))
-        try:
-            receivable_sum = (q_amount['amount_sum'] or 0) - (q_income['income_sum'] or 0)
-            self.sum = [receivable_sum, q_income['income_sum']]
-        except KeyError:
-            self.sum = ['', '']
+        receivable_sum = sum(obj.invoice.amount - obj.received for obj in self.result_list)
+        income_sum = sum(obj.received for obj in self.result_list)
+        self.sum = [receivable_sum, income_sum]
 
 
 class BillInlineFormSet(BaseInlineFormSet):
@@ -40,36 +37,18 @@ class BillInline(admin.TabularInline):
     extra = 1
 
 
-class SaleListFilter(admin.SimpleListFilter):
-    title = '业务员'
-    parameter_name = 'Sale'
+class SaleListFilter(SalesmanListFilter):
+    field_path = 'invoice__contract__salesman'
 
-    def lookups(self, request, model_admin):
-        qs_sale = User.objects.filter(groups__id=3)
-        qs_company = User.objects.filter(groups__id=6)
-        value = ['sale'] + list(qs_sale.values_list('username', flat=True)) + \
-                ['company'] + list(qs_company.values_list('username', flat=True))
-        label = ['销售'] + ['——' + i.last_name + i.first_name for i in qs_sale] + \
-                ['公司'] + ['——' + i.last_name + i.first_name for i in qs_company]
-        return tuple(zip(value, label))
 
-    def queryset(self, request, queryset):
-        if self.value() == 'sale':
-            return queryset.filter(invoice__contract__salesman__in=list(User.objects.filter(groups__id=3)))
-        if self.value() == 'company':
-            return queryset.filter(invoice__contract__salesman__in=list(User.objects.filter(groups__id=6)))
-        qs = User.objects.filter(groups__in=[3, 6])
-        for i in qs:
-            if self.value() == i.username:
-                return queryset.filter(invoice__contract__salesman=i)
-
-
-class InvoiceAdmin(admin.ModelAdmin):
+class InvoiceAdmin(StreamingExportMixin, admin.ModelAdmin):
     list_display = ('invoice_contract_number', 'invoice_contract_name', 'contract_amount', 'salesman_name',
                     'contract_type', 'invoice_period', 'invoice_title', 'invoice_amount', 'income_date',
                     'bill_receivable', 'invoice_code', 'date', 'tracking_number', 'send_date')
     list_display_links = ['invoice_title', 'invoice_amount']
+    list_select_related = ['invoice__contract__salesman']
     search_fields = ['invoice__title']
+    actions = ['export_csv', 'export_xlsx']
     inlines = [
         BillInline,
     ]
@@ -131,14 +110,7 @@ class InvoiceAdmin(admin.ModelAdmin):
     # bill_income.short_description = '到账金额'
 
     def bill_receivable(self, obj):
-        """
-        改进：是否可以接收来自于bill_income的计算值，避免重读查询
-        :param obj:
-        :return:
-        """
-        current_income_amounts = Bill.objects.filter(invoice__id=obj.id).values_list('income', flat=True)
-        receivable = obj.invoice.invoice.invoice.amount - sum(current_income_amounts)
-        return receivable
+        return obj.invoice.amount - obj.received
     bill_receivable.short_description = '应收金额'
 
     def save_model(self, request, obj, form, change):
@@ -253,9 +225,11 @@ class BillAdmin(admin.ModelAdmin):
         2、进账必须大于0
         3、进账总额不能超过开票金额
         """
-        invoice_amount = obj.invoice.invoice.invoice.invoice.amount
-        current_invoice_amounts = Bill.objects.filter(invoice=obj.invoice).exclude(id=obj.id).values_list('income', flat=True)
-        sum_income = obj.income + sum(current_invoice_amounts)
+        invoice_amount = obj.invoice.invoice.amount
+        # 发票的进账合计由台账维护，修改进账时扣除修改前的金额
+        sum_income = obj.income + obj.invoice.received
+        if change and form.initial.get('invoice') == obj.invoice_id:
+            sum_income -= form.initial['income']
         if not obj.invoice.invoice_code:
             messages.set_level(request, messages.WARNING)
             self.message_user(request, '不能对无单号发票登记进账', level=messages.WARNING)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FmConfig(AppConfig):
     name = 'fm'
     verbose_name = '财务管理系统'
+
+    def ready(self):
+        from . import signals  # noqa
@@ -0,0 +1,140 @@
+"""
+应收台账
+
+Ledger按 (合同, 款期) 保存开票金额、到账金额、应收金额和最后到账日，发票（fm.Invoice）保存各自的进账合计。
+开票申请和进账写入时由信号按变动量以F表达式增量更新，与业务写入在同一事务中，读取时不再汇总开票申请和进账。
+
+台账行不存在时，变动按原始记录重建该合同的台账（正在删除的合同除外，其开票申请和进账随之级联删除）；
+迁移fm 0009按已有数据生成台账，reconcile_ledger命令按原始记录核对全部台账，可选修正。
+"""
+from threading import local
+from django.db import transaction
+from django.db.models import F, Q, Sum, Max
+from BMS.db import bulk_update
+from mm.models import Contract, Invoice as mm_Invoice
+from .models import Invoice, Bill, Ledger
+
+EMPTY = (0, 0, 0, None)
+# 当前线程中正在删除的合同
+_deleting = local()
+
+
+def deleting_contracts():
+    if not hasattr(_deleting, 'ids'):
+        _deleting.ids = set()
+    return _deleting.ids
+
+
+def post(contract_id, period, invoiced=0, received=0, income_date=None, removed_date=None):
+    """
+    按变动量更新台账
+    :param income_date: 新增进账的到账日，晚于最后到账日时更新
+    :param removed_date: 撤销进账的到账日，等于最后到账日时按进账重新取最后到账日
+    :return: 台账行不存在、按原始记录重建了该合同的台账时为True，此时该合同已写入的变动均已计入
+    """
+    rows = Ledger.objects.filter(contract=contract_id, period=period)
+    with transaction.atomic():
+        updated = rows.update(invoiced=F('invoiced') + invoiced, received=F('received') + received,
+                              outstanding=F('outstanding') + invoiced - received)
+        if not updated:
+            if contract_id not in deleting_contracts():
+                rebuild_ledger([contract_id])
+            return True
+        if removed_date and rows.filter(last_income_date=removed_date).exists():
+            last_date = Bill.objects.filter(invoice__invoice__contract=contract_id, invoice__invoice__period=period)\
+                .aggregate(last_date=Max('date'))['last_date']
+            rows.update(last_income_date=last_date)
+        elif income_date:
+            rows.filter(Q(last_income_date=None) | Q(last_income_date__lt=income_date))\
+                .update(last_income_date=income_date)
+    return False
+
+
+def post_bill(invoice_id, income, income_date=None, removed_date=None, rebuilt=()):
+    """
+    进账变动：更新发票的进账合计及其开票申请所属合同、款期的台账
+    :param rebuilt: 本次已重建台账的合同，不再计入变动
+    :return: (合同ID, 是否已重建该合同的台账)
+    """
+    key = mm_Invoice.objects.filter(invoice=invoice_id).values_list('contract', 'period').first()
+    if key and key[0] in rebuilt:
+        return key[0], True
+    with transaction.atomic():
+        Invoice.objects.filter(pk=invoice_id).update(received=F('received') + income)
+        if key:
+            return key[0], post(*key, received=income, income_date=income_date, removed_date=removed_date)
+    return None, False
+
+
+def raw_totals(contract_ids):
+    """
+    按原始记录汇总
+    :return: ({(合同ID, 款期): (开票金额, 到账金额, 最后到账日)}, {发票ID: 进账合计})
+    """
+    totals = {}
+    for contract, period, amount in mm_Invoice.objects.filter(contract__in=contract_ids)\
+            .values_list('contract', 'period').annotate(amount=Sum('amount')).order_by():
+        totals[(contract, period)] = (amount, 0, None)
+    for contract, period, income, last_date in Bill.objects.filter(invoice__invoice__contract__in=contract_ids)\
+            .values_list('invoice__invoice__contract', 'invoice__invoice__period')\
+            .annotate(income=Sum('income'), last_date=Max('date')).order_by():
+        totals[(contract, period)] = (totals.get((contract, period), (0,))[0], income, last_date)
+    received = dict((pk, 0) for pk in Invoice.objects.filter(invoice__contract__in=contract_ids)
+                    .values_list('pk', flat=True))
+    received.update(Bill.objects.filter(invoice__invoice__contract__in=contract_ids).values_list('invoice')
+                    .annotate(income=Sum('income')).order_by())
+    return totals, received
+
+
+def rebuild_ledger(contract_ids):
+    """
+    按原始记录重建合同的台账和发票进账合计
+    """
+    contract_ids = set(Contract.objects.filter(pk__in=set(contract_ids)).values_list('pk', flat=True))
+    if not contract_ids:
+        return
+    totals, received = raw_totals(contract_ids)
+    with transaction.atomic():
+        Ledger.objects.filter(contract__in=contract_ids).delete()
+        Ledger.objects.bulk_create([
+            Ledger(contract_id=contract, period=period, invoiced=invoiced, received=income,
+                   outstanding=invoiced - income, last_income_date=last_date)
+            for (contract, period), (invoiced, income, last_date) in totals.items()])
+        invoices = [obj for obj in Invoice.objects.filter(pk__in=received).only('received')
+                    if obj.received != received[obj.pk]]
+        for obj in invoices:
+            obj.received = received[obj.pk]
+        bulk_update(invoices, ['received'])
+
+
+def reconcile(fix=False, batch_size=500):
+    """
+    按原始记录核对台账和发票进账合计
+    :param fix: 重建不一致的合同
+    :return: (不一致的 (合同ID, 款期, 台账值, 原始值) 列表, 进账合计不一致的发票数)，
+             值为 (开票金额, 到账金额, 应收金额, 最后到账日)
+    """
+    contract_ids = list(Contract.objects.order_by('pk').values_list('pk', flat=True))
+    mismatches, invoice_count = [], 0
+    for i in range(0, len(contract_ids), batch_size):
+        batch = contract_ids[i:i + batch_size]
+        totals, received = raw_totals(batch)
+        totals = dict((key, (invoiced, income, invoiced - income, last_date))
+                      for key, (invoiced, income, last_date) in totals.items())
+        ledger = dict(((contract, period), tuple(values)) for contract, period, *values in Ledger.objects.filter(
+            contract__in=batch).values_list('contract', 'period', 'invoiced', 'received', 'outstanding',
+                                            'last_income_date'))
+        dirty = set()
+        for key in set(totals) | set(ledger):
+            # 开票申请全部删除后台账行保留为零，视同没有
+            if ledger.get(key, EMPTY) != totals.get(key, EMPTY):
+                mismatches.append(key + (ledger.get(key), totals.get(key)))
+                dirty.add(key[0])
+        for pk, contract, value in Invoice.objects.filter(pk__in=received)\
+                .values_list('pk', 'invoice__contract', 'received'):
+            if value != received[pk]:
+                invoice_count += 1
+                dirty.add(contract)
+        if fix and dirty:
+            rebuild_ledger(dirty)
+    return mismatches, invoice_count
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from fm.ledger import reconcile
+
+
+class Command(BaseCommand):
+    help = '按开票申请和进账核对应收台账及发票进账合计，--fix重建不一致的合同'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='重建不一致的合同的台账')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批核对的合同数')
+
+    def handle(self, *args, **options):
+        mismatches, invoice_count = reconcile(fix=options['fix'], batch_size=options['batch_size'])
+        for contract, period, ledger, raw in mismatches[:50]:
+            self.stdout.write('合同 %s %s：台账 %s，原始记录 %s' % (contract, period, ledger, raw))
+        if not mismatches and not invoice_count:
+            self.stdout.write(self.style.SUCCESS('台账与原始记录一致'))
+            return
+        message = '%s 条台账、%s 张发票的进账合计与原始记录不一致' % (len(mismatches), invoice_count)
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(message + '，已重建'))
+        else:
+            self.stdout.write(self.style.WARNING(message + '，可加--fix重建'))
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 18:30
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fm', '0006_auto_20170111_1353'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='income_date',
+            field=models.DateField(null=True, verbose_name='到账日期'),
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='invoice_code',
+            field=models.CharField(max_length=12, unique=True, verbose_name='发票号码'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 18:30
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fm', '0007_sync_models'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bill',
+            name='date',
+            field=models.DateField(db_index=True, verbose_name='到账日期'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 18:31
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Sum, Max
+import django.db.models.deletion
+
+
+def fill_ledger(apps, schema_editor):
+    # 按已有开票申请和进账生成台账及发票进账合计，汇总方式同fm.ledger.raw_totals
+    from BMS.db import bulk_update
+    Contract = apps.get_model('mm', 'Contract')
+    mm_Invoice = apps.get_model('mm', 'Invoice')
+    Invoice = apps.get_model('fm', 'Invoice')
+    Bill = apps.get_model('fm', 'Bill')
+    Ledger = apps.get_model('fm', 'Ledger')
+    contract_ids = list(Contract.objects.order_by('pk').values_list('pk', flat=True))
+    for i in range(0, len(contract_ids), 500):
+        batch = contract_ids[i:i + 500]
+        totals = {}
+        for contract, period, amount in mm_Invoice.objects.filter(contract__in=batch)\
+                .values_list('contract', 'period').annotate(amount=Sum('amount')).order_by():
+            totals[(contract, period)] = (amount, 0, None)
+        for contract, period, income, last_date in Bill.objects.filter(invoice__invoice__contract__in=batch)\
+                .values_list('invoice__invoice__contract', 'invoice__invoice__period')\
+                .annotate(income=Sum('income'), last_date=Max('date')).order_by():
+            totals[(contract, period)] = (totals.get((contract, period), (0,))[0], income, last_date)
+        Ledger.objects.bulk_create([
+            Ledger(contract_id=contract, period=period, invoiced=invoiced, received=income,
+                   outstanding=invoiced - income, last_income_date=last_date)
+            for (contract, period), (invoiced, income, last_date) in totals.items()])
+        received = dict(Bill.objects.filter(invoice__invoice__contract__in=batch).values_list('invoice')
+                        .annotate(income=Sum('income')).order_by())
+        invoices = list(Invoice.objects.filter(pk__in=received).only('received'))
+        for obj in invoices:
+            obj.received = received[obj.pk]
+        bulk_update(invoices, ['received'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mm', '0012_hot_filter_indexes'),
+        ('fm', '0008_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ledger',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('FIS', '首款'), ('FIN', '尾款')], max_length=3, verbose_name='款期')),
+                ('invoiced', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='开票金额')),
+                ('received', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='到账金额')),
+                ('outstanding', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='应收金额')),
+                ('last_income_date', models.DateField(null=True, verbose_name='最后到账日')),
+                ('contract', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mm.Contract', verbose_name='合同')),
+            ],
+            options={
+                'verbose_name': '应收台账',
+                'verbose_name_plural': '应收台账',
+            },
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='received',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=9, verbose_name='已到账金额'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ledger',
+            unique_together=set([('contract', 'period')]),
+        ),
+        migrations.RunPython(fill_ledger, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from mm.models import Invoice as mm_Invoice
 
 
 class Invoice(models.Model):
@@ -11,6 +12,8 @@ class Invoice(models.Model):
     tracking_number = models.CharField('快递单号', max_length=15, blank=True)
     send_date = models.DateField('寄出日期', null=True)
     income_date = models.DateField('到账日期', null=True)
+    # 进账合计，由进账写入时增量维护，见fm.ledger
+    received = models.DecimalField('已到账金额', max_digits=9, decimal_places=2, default=0, editable=False)
 
     class Meta:
         verbose_name = '发票管理'
@@ -23,7 +26,7 @@ class Invoice(models.Model):
 class Bill(models.Model):
     invoice = models.ForeignKey(Invoice, verbose_name='发票')
     income = models.DecimalField('到账金额', max_digits=9, decimal_places=2)
-    date = models.DateField('到账日期')
+    date = models.DateField('到账日期', db_index=True)
 
     class Meta:
         verbose_name = '进账管理'
@@ -31,3 +34,27 @@ class Bill(models.Model):
 
     def __str__(self):
         return '%f' % self.income
+
+
+class Ledger(models.Model):
+    """
+    应收台账：按合同、款期汇总开票申请和进账，随开票申请和进账写入增量更新，见fm.ledger
+    """
+    contract = models.ForeignKey(
+        'mm.Contract',
+        verbose_name='合同',
+        on_delete=models.CASCADE,
+    )
+    period = models.CharField('款期', max_length=3, choices=mm_Invoice.PERIOD_CHOICES)
+    invoiced = models.DecimalField('开票金额', max_digits=12, decimal_places=2, default=0)
+    received = models.DecimalField('到账金额', max_digits=12, decimal_places=2, default=0)
+    outstanding = models.DecimalField('应收金额', max_digits=12, decimal_places=2, default=0)
+    last_income_date = models.DateField('最后到账日', null=True)
+
+    class Meta:
+        unique_together = ('contract', 'period')
+        verbose_name = '应收台账'
+        verbose_name_plural = '应收台账'
+
+    def __str__(self):
+        return '%s %s' % (self.contract_id, self.get_period_display())
@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from mm.models import Contract, Invoice as mm_Invoice
+from .ledger import post, post_bill, rebuild_ledger, deleting_contracts
+from .models import Bill, Ledger
+
+
+def update_income_dates(contract_ids):
+    """
+    按台账重新计算合同首款、尾款到款日，款项到齐时取最后到账日期，否则清空
+    :param contract_ids: 受影响的合同
+    """
+    contract_ids = set(contract_ids)
+    if not contract_ids:
+        return
+    rows = Ledger.objects.filter(contract__in=contract_ids)\
+        .values_list('contract', 'period', 'received', 'last_income_date')
+    income = {(contract, period): (total, last_date) for contract, period, total, last_date in rows}
+    for contract in Contract.objects.filter(pk__in=contract_ids).only('fis_amount', 'fis_date', 'fin_amount',
+                                                                       'fin_date'):
+        values = {}
+        for period in ('fis', 'fin'):
+            total, last_date = income.get((contract.pk, period.upper()), (0, None))
+            income_date = last_date if total and total >= getattr(contract, '%s_amount' % period) else None
+            if getattr(contract, '%s_date' % period) != income_date:
+                values['%s_date' % period] = income_date
+        if values:
+            Contract.objects.filter(pk=contract.pk).update(**values)
+
+
+@receiver(pre_save, sender=Bill)
+def bill_saving(sender, instance, **kwargs):
+    # 记下修改前的发票、金额和到账日，保存后按差额记账
+    instance.__ledger__ = Bill.objects.filter(pk=instance.pk).values_list('invoice', 'income', 'date').first() \
+        if instance.pk else None
+
+
+@receiver(post_save, sender=Bill)
+def bill_saved(sender, instance, **kwargs):
+    with transaction.atomic():
+        contract_ids, rebuilt = set(), set()
+        old = getattr(instance, '__ledger__', None)
+        if old:
+            contract_id, is_rebuilt = post_bill(old[0], -old[1], removed_date=old[2])
+            contract_ids.add(contract_id)
+            if is_rebuilt:
+                # 重建时已按保存后的进账计算
+                rebuilt.add(contract_id)
+        contract_ids.add(post_bill(instance.invoice_id, instance.income, income_date=instance.date,
+                                   rebuilt=rebuilt)[0])
+        update_income_dates(contract_ids - {None})
+
+
+@receiver(post_delete, sender=Bill)
+def bill_deleted(sender, instance, **kwargs):
+    with transaction.atomic():
+        contract_id, _ = post_bill(instance.invoice_id, -instance.income, removed_date=instance.date)
+        update_income_dates([contract_id] if contract_id else [])
+
+
+@receiver(pre_save, sender=mm_Invoice)
+def invoice_saving(sender, instance, **kwargs):
+    instance.__ledger__ = mm_Invoice.objects.filter(pk=instance.pk).values_list('contract', 'period', 'amount')\
+        .first() if instance.pk else None
+
+
+@receiver(post_save, sender=mm_Invoice)
+def invoice_saved(sender, instance, **kwargs):
+    # 开票申请修改款期时其进账随之转到新款期，到款情况随之变化
+    with transaction.atomic():
+        old = getattr(instance, '__ledger__', None)
+        if old and old[:2] != (instance.contract_id, instance.period):
+            rebuild_ledger([old[0], instance.contract_id])
+        else:
+            post(instance.contract_id, instance.period, invoiced=instance.amount - (old[2] if old else 0))
+        update_income_dates([instance.contract_id] + ([old[0]] if old else []))
+
+
+@receiver(post_delete, sender=mm_Invoice)
+def invoice_deleted(sender, instance, **kwargs):
+    # 进账随发票先行删除，此处只扣除开票金额
+    with transaction.atomic():
+        post(instance.contract_id, instance.period, invoiced=-instance.amount)
+        update_income_dates([instance.contract_id])
+
+
+@receiver(pre_delete, sender=Contract)
+def contract_deleting(sender, instance, **kwargs):
+    # 级联删除开票申请和进账时不重建该合同的台账
+    deleting_contracts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Contract)
+def contract_deleted(sender, instance, **kwargs):
+    deleting_contracts().discard(instance.pk)
@@ -1,3 +1,185 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from mm.models import Contract, Invoice as mm_Invoice
+from .ledger import reconcile
+from .admin import BillAdmin
+from .models import Invoice, Bill, Ledger
 
-# Create your tests here.
+
+class LedgerTest(TestCase):
+    """
+    应收台账随开票申请和进账增量更新，与原始记录一致
+    """
+    def setUp(self):
+        user = User.objects.create_user('sale')
+        self.contract = Contract.objects.create(contract_number='C001', name='合同', type=1, salesman=user, price=1,
+                                                range=1, fis_amount=100, fin_amount=50)
+        self.mm_invoice = mm_Invoice.objects.create(contract=self.contract, title='抬头', period='FIS', amount=100,
+                                                    note='', submit=True)
+        self.invoice = Invoice.objects.create(invoice=self.mm_invoice, invoice_code='F001')
+
+    def ledger(self, period='FIS'):
+        return Ledger.objects.filter(contract=self.contract, period=period)\
+            .values_list('invoiced', 'received', 'outstanding', 'last_income_date').first()
+
+    def assertConsistent(self):
+        self.assertEqual(reconcile(), ([], 0))
+
+    def test_bills(self):
+        self.assertEqual(self.ledger(), (100, 0, 100, None))
+        first = Bill.objects.create(invoice=self.invoice, income=Decimal('40'), date=date(2017, 5, 2))
+        second = Bill.objects.create(invoice=self.invoice, income=Decimal('60'), date=date(2017, 5, 9))
+        self.assertEqual(self.ledger(), (100, 100, 0, date(2017, 5, 9)))
+        self.assertEqual(Invoice.objects.get().received, 100)
+        self.assertEqual(Contract.objects.get().fis_date, date(2017, 5, 9))
+        second.income = Decimal('50')
+        second.save()
+        self.assertEqual(self.ledger(), (100, 90, 10, date(2017, 5, 9)))
+        self.assertIsNone(Contract.objects.get().fis_date)
+        second.delete()
+        self.assertEqual(self.ledger(), (100, 40, 60, date(2017, 5, 2)))
+        self.assertConsistent()
+        first.delete()
+        self.assertEqual(self.ledger(), (100, 0, 100, None))
+        self.assertConsistent()
+
+    def test_invoices(self):
+        Bill.objects.create(invoice=self.invoice, income=Decimal('50'), date=date(2017, 5, 2))
+        self.mm_invoice.amount = 50
+        self.mm_invoice.save()
+        self.assertEqual(self.ledger(), (50, 50, 0, date(2017, 5, 2)))
+        # 改为尾款，进账随之转移
+        self.mm_invoice.period = 'FIN'
+        self.mm_invoice.save()
+        self.assertEqual(self.ledger(), None)
+        self.assertEqual(self.ledger('FIN'), (50, 50, 0, date(2017, 5, 2)))
+        self.assertEqual(Contract.objects.get().fin_date, date(2017, 5, 2))
+        self.assertConsistent()
+        self.mm_invoice.delete()
+        self.assertEqual(self.ledger('FIN'), (0, 0, 0, None))
+        self.assertConsistent()
+
+    def test_reconcile(self):
+        Bill.objects.create(invoice=self.invoice, income=Decimal('30'), date=date(2017, 5, 2))
+        Ledger.objects.update(received=0)
+        Invoice.objects.update(received=0)
+        mismatches, invoice_count = reconcile(fix=True)
+        self.assertEqual(len(mismatches), 1)
+        self.assertEqual(invoice_count, 1)
+        self.assertEqual(self.ledger(), (100, 30, 70, date(2017, 5, 2)))
+        self.assertEqual(Invoice.objects.get().received, 30)
+        self.assertConsistent()
+
+    def test_missing_rows(self):
+        # 台账行不存在时，减少和修改同样按原始记录重建，不重复计入
+        bill = Bill.objects.create(invoice=self.invoice, income=Decimal('40'), date=date(2017, 5, 2))
+        Ledger.objects.all().delete()
+        Invoice.objects.update(received=0)
+        bill.income = Decimal('60')
+        bill.save()
+        self.assertEqual(self.ledger(), (100, 60, 40, date(2017, 5, 2)))
+        self.assertEqual(Invoice.objects.get().received, 60)
+        Ledger.objects.all().delete()
+        bill.delete()
+        self.assertEqual(self.ledger(), (100, 0, 100, None))
+        self.assertConsistent()
+
+    def test_delete_contract(self):
+        Bill.objects.create(invoice=self.invoice, income=Decimal('40'), date=date(2017, 5, 2))
+        self.contract.delete()
+        self.assertFalse(Ledger.objects.exists())
+
+
+class InvoiceChangeListTest(TestCase):
+    """
+    发票列表页：应收金额和合计取自发票的进账合计，查询数与发票数无关，结果与逐行汇总进账一致
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.invoice_num = 0
+
+    def add_invoices(self, num):
+        for i in range(num):
+            self.invoice_num += 1
+            contract = Contract.objects.create(contract_number='C%03d' % self.invoice_num, name='合同', type=1,
+                                               salesman=self.user, price=1, range=1, fis_amount=300, fin_amount=100)
+            for period, amount in (('FIS', 200), ('FIN', 100)):
+                mm_invoice = mm_Invoice.objects.create(contract=contract, title='抬头', period=period, amount=amount,
+                                                       note='', submit=True)
+                invoice = Invoice.objects.create(invoice=mm_invoice,
+                                                 invoice_code='F%03d%s' % (self.invoice_num, period))
+                # 各发票进账笔数不同，部分发票没有进账
+                for day in range(self.invoice_num % 3 if period == 'FIS' else 1):
+                    Bill.objects.create(invoice=invoice, income=Decimal('30.5'), date=date(2017, 5, 2 + day))
+
+    def get(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/fm/invoice/')
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_query_count_is_constant(self):
+        self.client.force_login(self.user)
+        self.add_invoices(2)
+        # 首次请求读取并缓存业务员名单
+        self.get()
+        count = self.get()[0]
+        self.add_invoices(10)
+        self.assertEqual(self.get()[0], count)
+
+    def test_values(self):
+        self.client.force_login(self.user)
+        self.add_invoices(5)
+        cl = self.get()[1].context['cl']
+        invoice_admin = admin.site._registry[Invoice]
+        self.assertEqual(len(cl.result_list), 10)
+        receivable_sum = income_sum = 0
+        for obj in cl.result_list:
+            # 原先逐行汇总进账
+            income = sum(Bill.objects.filter(invoice__id=obj.id).values_list('income', flat=True))
+            self.assertEqual(invoice_admin.bill_receivable(obj), obj.invoice.amount - income)
+            receivable_sum += obj.invoice.amount - income
+            income_sum += income
+        self.assertEqual(cl.sum, [receivable_sum, income_sum])
+        self.assertEqual(income_sum, Bill.objects.aggregate(Sum('income'))['income__sum'])
+
+
+class BillAdminTest(TestCase):
+    """
+    进账登记：进账总额按发票的进账合计校验，修改进账时扣除修改前的金额
+    """
+    def setUp(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        contract = Contract.objects.create(contract_number='C001', name='合同', type=1, salesman=user, price=1,
+                                           range=1, fis_amount=100, fin_amount=0)
+        mm_invoice = mm_Invoice.objects.create(contract=contract, title='抬头', period='FIS', amount=100, note='',
+                                               submit=True)
+        self.invoice = Invoice.objects.create(invoice=mm_invoice, invoice_code='F001')
+        self.bill = Bill.objects.create(invoice=self.invoice, income=Decimal('60'), date=date(2017, 5, 2))
+        self.bill_admin = BillAdmin(Bill, admin.site)
+
+    def save(self, obj, change):
+        request = RequestFactory().post('/')
+        request._messages = CookieStorage(request)
+        form = self.bill_admin.get_form(request, obj if change else None)(instance=obj if change else None)
+        obj.invoice.refresh_from_db()
+        self.bill_admin.save_model(request, obj, form, change)
+        return [str(message) for message in request._messages]
+
+    def test_save(self):
+        # 改为100不超过开票金额
+        self.bill.income = Decimal('100')
+        self.assertEqual(self.save(self.bill, True), [])
+        self.assertEqual(Bill.objects.get().income, 100)
+        extra = Bill(invoice=self.invoice, income=Decimal('1'), date=date(2017, 5, 3))
+        self.assertEqual(self.save(extra, False), ['进账总额 101.00 超过开票金额 100.00'])
+        self.assertEqual(Bill.objects.count(), 1)
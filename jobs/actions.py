@@ -0,0 +1,36 @@
+"""
+admin action中提交后台任务
+
+所选记录数不超过JOBS_ASYNC_THRESHOLD时在请求内直接执行并显示结果，否则提交后台任务，由run_workers执行。
+"""
+import hashlib
+from django.conf import settings
+from django.contrib import messages
+from django.core.urlresolvers import reverse
+from django.utils.html import format_html
+from .models import Job
+from .registry import run_handler
+
+
+def job_key(name, ids):
+    # 相同任务、相同记录未完成前不重复提交
+    return '%s:%s' % (name, hashlib.md5(','.join(str(pk) for pk in sorted(ids)).encode()).hexdigest()[:16])
+
+
+def enqueue(model_admin, request, name, key=None, **kwargs):
+    job = Job.objects.enqueue(name, user=request.user, key=key, **kwargs)
+    model_admin.message_user(request, format_html(
+        '已提交后台任务 <a href="{}">{}</a>，完成后可在后台任务中查看结果',
+        reverse('admin:jobs_job_change', args=[job.pk]), job))
+    return job
+
+
+def run_or_enqueue(model_admin, request, name, queryset, **kwargs):
+    """
+    :param name: 任务名，任务函数接收所选记录主键列表ids及其余参数
+    """
+    ids = list(queryset.order_by().values_list('pk', flat=True))
+    if len(ids) > settings.JOBS_ASYNC_THRESHOLD:
+        return enqueue(model_admin, request, name, key=job_key(name, ids), ids=ids, **kwargs)
+    for level, message in run_handler(name, ids=ids, **kwargs):
+        model_admin.message_user(request, message, level=level)
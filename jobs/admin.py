@@ -0,0 +1,84 @@
+import mimetypes
+import os
+from django.conf.urls import url
+from django.contrib import admin
+from django.contrib import messages
+from django.core.exceptions import PermissionDenied
+from django.core.urlresolvers import reverse
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.utils.html import format_html, linebreaks
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    """
+    Admin class for background job
+    """
+    list_display = ('id', 'name', 'status', 'progress', 'attempts', 'user', 'created', 'finished', 'result_file')
+    list_filter = ['status', 'name']
+    list_select_related = ['user']
+    search_fields = ['name']
+    actions = ['make_retry']
+    fields = ('name', 'status', 'progress', 'attempts', 'max_attempts', 'worker', 'user', 'created', 'started',
+              'finished', 'heartbeat', 'result_text', 'result_file', 'error', 'kwargs')
+    readonly_fields = fields
+
+    def progress(self, obj):
+        # 进度条，总数未知时只显示已完成数
+        if not obj.progress_total:
+            return obj.progress_done or ''
+        percent = min(100, obj.progress_done * 100 // obj.progress_total)
+        return format_html('<progress value="{}" max="100"></progress> {}/{}', percent, obj.progress_done,
+                           obj.progress_total)
+    progress.short_description = '进度'
+
+    def result_text(self, obj):
+        return linebreaks(obj.result, autoescape=True)
+    result_text.short_description = '结果'
+
+    def result_file(self, obj):
+        if obj.file:
+            return format_html('<a href="{}">下载</a>', reverse('admin:jobs_job_download', args=[obj.pk]))
+        return ''
+    result_file.short_description = '结果文件'
+
+    def get_urls(self):
+        return [
+            url(r'^(\d+)/download/$', self.admin_site.admin_view(self.download_view), name='jobs_job_download'),
+        ] + super(JobAdmin, self).get_urls()
+
+    def download_view(self, request, object_id):
+        # 结果文件只能由提交人或管理员下载
+        job = get_object_or_404(Job, pk=object_id)
+        if not (request.user.is_superuser or job.user_id == request.user.pk):
+            raise PermissionDenied
+        if not job.file or not job.file.storage.exists(job.file.name):
+            raise Http404
+        filename = os.path.basename(job.file.name)
+        response = FileResponse(job.file.storage.open(job.file.name, 'rb'),
+                                content_type=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+        return response
+
+    def make_retry(self, request, queryset):
+        # 失败的任务重新排队，执行次数清零
+        rows_updated = queryset.filter(status=Job.FAILED).update(status=Job.PENDING, attempts=0, error='',
+                                                                  worker='', finished=None, run_after=None)
+        if rows_updated:
+            self.message_user(request, '%s 个任务已重新提交' % rows_updated)
+        else:
+            self.message_user(request, '只能重试失败的任务', level=messages.ERROR)
+    make_retry.short_description = '重试所选失败任务'
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_queryset(self, request):
+        # 只允许管理员查看所有任务
+        qs = super(JobAdmin, self).get_queryset(request)
+        if request.user.is_superuser:
+            return qs
+        return qs.filter(user=request.user)
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    name = 'jobs'
+    verbose_name = "后台任务"
+
+    def ready(self):
+        # 导入各应用的jobs模块以注册任务
+        autodiscover_modules('jobs')
@@ -0,0 +1,22 @@
+import tempfile
+from django.apps import apps
+from django.contrib import admin, messages
+from django.core.files import File
+from BMS.export import AdminExporter, write_csv, write_xlsx
+from .registry import register
+
+
+@register('jobs.export')
+def export(job, app_label, model_name, ids, file_format='csv'):
+    """
+    按后台列表的列导出所选记录，文件保存到任务的结果文件
+    """
+    model = apps.get_model(app_label, model_name)
+    model_admin = admin.site._registry[model]
+    exporter = AdminExporter(model_admin, None, model._default_manager.all())
+    with tempfile.TemporaryFile() as f:
+        write = write_xlsx if file_format == 'xlsx' else write_csv
+        write(exporter, f, exporter.rows(ids, progress=job.set_progress))
+        f.seek(0)
+        job.file.save('%s.%s' % (model_admin.export_filename(), file_format), File(f), save=False)
+    return [(messages.INFO, '已导出 %s 条记录' % len(ids))]
@@ -0,0 +1,38 @@
+import multiprocessing
+import signal
+from django.core.management.base import BaseCommand
+from django.db import connections
+from jobs.runner import work
+
+
+class Command(BaseCommand):
+    help = '启动后台任务进程，从数据库领取并执行后台任务'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2, help='进程数')
+        parser.add_argument('--poll', type=float, default=2, help='队列为空时的等待秒数')
+        parser.add_argument('--stale', type=int, default=600, help='运行中任务超过该秒数没有心跳时重新排队')
+        parser.add_argument('--once', action='store_true', help='执行完当前队列中的任务后退出')
+
+    def handle(self, *args, **options):
+        kwargs = {'once': options['once'], 'poll': options['poll'], 'stale': options['stale']}
+        if options['processes'] <= 1:
+            work(**kwargs)
+            return
+        # 子进程不能共用父进程的数据库连接
+        connections.close_all()
+        stop = multiprocessing.Event()
+        workers = [multiprocessing.Process(target=work, kwargs=dict(kwargs, stop=stop))
+                   for _ in range(options['processes'])]
+        for worker in workers:
+            worker.start()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        self.stdout.write('已启动 %s 个后台任务进程' % len(workers))
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            # 当前任务执行完后退出
+            stop.set()
+            for worker in workers:
+                worker.join()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 17:55
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='任务')),
+                ('key', models.CharField(blank=True, db_index=True, max_length=100, verbose_name='去重键')),
+                ('kwargs', models.TextField(default='{}', verbose_name='参数')),
+                ('status', models.CharField(choices=[('pending', '等待'), ('running', '运行中'), ('done', '完成'), ('failed', '失败')], default='pending', max_length=10, verbose_name='状态')),
+                ('progress_done', models.PositiveIntegerField(default=0, verbose_name='已完成')),
+                ('progress_total', models.PositiveIntegerField(null=True, verbose_name='总数')),
+                ('result', models.TextField(blank=True, verbose_name='结果')),
+                ('file', models.FileField(blank=True, upload_to='jobs/%Y/%m', verbose_name='结果文件')),
+                ('error', models.TextField(blank=True, verbose_name='错误')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='执行次数')),
+                ('max_attempts', models.PositiveIntegerField(default=3, verbose_name='最多执行次数')),
+                ('worker', models.CharField(blank=True, max_length=50, verbose_name='执行进程')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='提交时间')),
+                ('started', models.DateTimeField(null=True, verbose_name='开始时间')),
+                ('finished', models.DateTimeField(null=True, verbose_name='结束时间')),
+                ('heartbeat', models.DateTimeField(null=True, verbose_name='最后活动')),
+                ('run_after', models.DateTimeField(null=True, verbose_name='重试时间')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='提交人')),
+            ],
+            options={
+                'verbose_name': '后台任务',
+                'verbose_name_plural': '后台任务',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='job',
+            index_together=set([('status', 'id')]),
+        ),
+    ]
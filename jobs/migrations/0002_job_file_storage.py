@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 18:28
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import jobs.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='file',
+            field=models.FileField(blank=True, storage=jobs.models.JobFileStorage(), upload_to='results/%Y/%m', verbose_name='结果文件'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+import json
+from django.conf import settings
+from django.db import models
+from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class JobFileStorage(FileSystemStorage):
+    """
+    后台任务的上传文件和结果文件保存在JOB_FILE_ROOT，不在MEDIA_ROOT下，没有公开URL，只能经后台下载
+    """
+    def __init__(self):
+        super(JobFileStorage, self).__init__(location=settings.JOB_FILE_ROOT, base_url=None)
+
+job_storage = JobFileStorage()
+
+
+class JobManager(models.Manager):
+    def enqueue(self, name, user=None, key=None, **kwargs):
+        """
+        新建后台任务；指定key时，同一key尚未完成的任务只保留一个
+        :param name: 任务名，见jobs.registry
+        :param kwargs: 任务参数，需可JSON序列化
+        """
+        if key:
+            job = self.filter(key=key, status__in=[Job.PENDING, Job.RUNNING]).first()
+            if job:
+                return job
+        return self.create(name=name, user=user, key=key or '', kwargs=json.dumps(kwargs))
+
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, '等待'),
+        (RUNNING, '运行中'),
+        (DONE, '完成'),
+        (FAILED, '失败'),
+    )
+    name = models.CharField('任务', max_length=100)
+    key = models.CharField('去重键', max_length=100, blank=True, db_index=True)
+    kwargs = models.TextField('参数', default='{}')
+    status = models.CharField('状态', max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    progress_done = models.PositiveIntegerField('已完成', default=0)
+    progress_total = models.PositiveIntegerField('总数', null=True)
+    result = models.TextField('结果', blank=True)
+    file = models.FileField('结果文件', upload_to='results/%Y/%m', storage=job_storage, blank=True)
+    error = models.TextField('错误', blank=True)
+    attempts = models.PositiveIntegerField('执行次数', default=0)
+    max_attempts = models.PositiveIntegerField('最多执行次数', default=3)
+    worker = models.CharField('执行进程', max_length=50, blank=True)
+    user = models.ForeignKey(User, verbose_name='提交人', null=True, blank=True, on_delete=models.SET_NULL)
+    created = models.DateTimeField('提交时间', auto_now_add=True)
+    started = models.DateTimeField('开始时间', null=True)
+    finished = models.DateTimeField('结束时间', null=True)
+    heartbeat = models.DateTimeField('最后活动', null=True)
+    run_after = models.DateTimeField('重试时间', null=True)
+
+    objects = JobManager()
+
+    class Meta:
+        # 领取任务按状态取最早的一个
+        index_together = ('status', 'id')
+        verbose_name = '后台任务'
+        verbose_name_plural = '后台任务'
+
+    def __str__(self):
+        return '%s #%s' % (self.name, self.pk)
+
+    def get_kwargs(self):
+        return json.loads(self.kwargs)
+
+    def set_progress(self, done, total=None):
+        # 直接update，不覆盖其他字段，同时作为心跳
+        self.progress_done = done
+        if total is not None:
+            self.progress_total = total
+        self.heartbeat = timezone.now()
+        Job.objects.filter(pk=self.pk).update(progress_done=self.progress_done, progress_total=self.progress_total,
+                                              heartbeat=self.heartbeat)
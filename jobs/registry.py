@@ -0,0 +1,42 @@
+"""
+后台任务注册
+
+任务函数的第一个参数为报告进度的对象（有set_progress方法，同步执行时为NullJob），其余为提交任务时的参数，
+返回[(消息级别, 消息), ...]。失败的任务会重试，任务函数应可以安全地重复执行：所选记录用chunked分块，
+每块在一个事务中写入，提交后更新进度，失败时只回滚当前块，重试时已完成的块不应重复写入。
+"""
+from django.db import transaction
+
+_handlers = {}
+CHUNK_SIZE = 500
+
+
+def register(name):
+    def decorator(func):
+        _handlers[name] = func
+        return func
+    return decorator
+
+
+def get_handler(name):
+    try:
+        return _handlers[name]
+    except KeyError:
+        raise LookupError('未注册的后台任务：%s' % name)
+
+
+class NullJob(object):
+    # 同步执行时忽略进度
+    def set_progress(self, done, total=None):
+        pass
+
+
+def run_handler(name, job=None, **kwargs):
+    return get_handler(name)(job or NullJob(), **kwargs)
+
+
+def chunked(ids, size=CHUNK_SIZE):
+    # 分块处理所选主键，避免IN参数过多
+    ids = list(ids)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
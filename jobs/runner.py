@@ -0,0 +1,113 @@
+"""
+后台任务执行
+
+领取任务用带状态条件的UPDATE，多个进程同时领取同一任务时只有一个成功，不需要行锁或外部消息队列。
+执行失败的任务在执行次数未达上限前，间隔JOBS_RETRY_DELAY秒的倍数后重新执行；进程意外退出时，超过stale秒没有心跳的任务同样重新排队。
+SQLite上多个任务的写事务冲突（database is locked）时，任务随机等待几秒后重新排队，不计执行次数。
+"""
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import timedelta
+from django.db import close_old_connections, OperationalError
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Job
+from .registry import run_handler
+
+logger = logging.getLogger(__name__)
+
+
+def worker_name():
+    return '%s:%s' % (socket.gethostname(), os.getpid())
+
+
+def claim(worker):
+    """
+    领取最早提交的等待任务
+    :return: Job或None
+    """
+    while True:
+        now = timezone.now()
+        pk = Job.objects.filter(Q(run_after__isnull=True) | Q(run_after__lte=now), status=Job.PENDING)\
+            .order_by('pk').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        if Job.objects.filter(pk=pk, status=Job.PENDING).update(
+                status=Job.RUNNING, worker=worker, attempts=F('attempts') + 1, started=now, heartbeat=now,
+                error=''):
+            return Job.objects.get(pk=pk)
+        # 已被其他进程领取，取下一个
+
+
+def reclaim_stale(seconds):
+    # 进程退出后遗留的运行中任务：未达执行次数上限的重新排队，否则标记失败
+    deadline = timezone.now() - timedelta(seconds=seconds)
+    stale = Job.objects.filter(status=Job.RUNNING, heartbeat__lt=deadline)
+    if not stale.exists():
+        # 先读后写，空闲时不占用写锁
+        return 0
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(status=Job.PENDING, worker='')
+    failed = stale.update(status=Job.FAILED, error='执行超时，进程可能已退出', finished=timezone.now())
+    return requeued + failed
+
+
+def execute(job):
+    try:
+        result = run_handler(job.name, job, **job.get_kwargs())
+    except OperationalError as e:
+        if 'locked' not in str(e):
+            return fail(job)
+        # 与其他进程的写事务冲突，错开后重试；各块单独提交，已完成的部分不会重复
+        logger.warning('后台任务 %s 等待数据库写锁，稍后重试', job)
+        run_after = timezone.now() + timedelta(seconds=random.uniform(1, settings.JOBS_LOCKED_DELAY))
+        Job.objects.filter(pk=job.pk).update(status=Job.PENDING, attempts=F('attempts') - 1, worker='',
+                                             run_after=run_after)
+        return False
+    except Exception:
+        return fail(job)
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.DONE, result='\n'.join(message for _, message in result or ()), file=job.file.name or '',
+        finished=timezone.now(), heartbeat=timezone.now())
+    logger.info('后台任务 %s 已完成', job)
+    return True
+
+
+def fail(job):
+    # 记录异常，未达执行次数上限的按间隔重新排队
+    error = traceback.format_exc()
+    logger.exception('后台任务 %s 执行失败（第 %s 次）', job, job.attempts)
+    if job.attempts < job.max_attempts:
+        # 间隔逐次加长后重试
+        run_after = timezone.now() + timedelta(seconds=settings.JOBS_RETRY_DELAY * job.attempts)
+        Job.objects.filter(pk=job.pk).update(status=Job.PENDING, error=error, worker='', run_after=run_after)
+    else:
+        Job.objects.filter(pk=job.pk).update(status=Job.FAILED, error=error, worker='', finished=timezone.now())
+    return False
+
+
+def work(once=False, poll=2, stale=600, stop=None):
+    """
+    循环领取并执行任务
+    :param once: 队列为空时退出
+    :param poll: 队列为空时的等待秒数
+    :param stop: threading/multiprocessing.Event，设置后执行完当前任务退出
+    """
+    worker = worker_name()
+    while not (stop and stop.is_set()):
+        close_old_connections()
+        reclaim_stale(stale)
+        job = claim(worker)
+        if job is not None:
+            execute(job)
+            continue
+        if once:
+            return
+        if stop:
+            stop.wait(poll)
+        else:
+            time.sleep(poll)
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from .models import Job
+from .registry import register
+from .runner import claim, execute, work
+
+calls = []
+
+
+@register('jobs.test_flaky')
+def flaky(job, fail_times):
+    calls.append(fail_times)
+    if len(calls) <= fail_times:
+        raise RuntimeError('失败')
+    job.set_progress(1, 1)
+    return [(20, '完成')]
+
+
+@register('jobs.test_locked')
+def locked(job):
+    raise OperationalError('database is locked')
+
+
+@override_settings(JOBS_RETRY_DELAY=0)
+class RunnerTest(TestCase):
+    def setUp(self):
+        del calls[:]
+
+    def test_enqueue_key(self):
+        job = Job.objects.enqueue('jobs.test_flaky', key='k', fail_times=0)
+        self.assertEqual(Job.objects.enqueue('jobs.test_flaky', key='k', fail_times=0), job)
+        work(once=True)
+        self.assertNotEqual(Job.objects.enqueue('jobs.test_flaky', key='k', fail_times=0), job)
+
+    def test_claim_once(self):
+        Job.objects.enqueue('jobs.test_flaky', fail_times=0)
+        self.assertIsNotNone(claim('a'))
+        self.assertIsNone(claim('b'))
+
+    def test_retry(self):
+        job = Job.objects.enqueue('jobs.test_flaky', fail_times=2)
+        work(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result, job.progress_done), (Job.DONE, 3, '完成', 1))
+
+    def test_failed(self):
+        job = Job.objects.enqueue('jobs.test_flaky', fail_times=5)
+        self.assertFalse(execute(claim('a')))
+        work(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, len(calls)), (Job.FAILED, 3, 3))
+        self.assertIn('RuntimeError', job.error)
+
+    def test_locked(self):
+        # 写锁冲突重新排队，不计执行次数
+        job = Job.objects.enqueue('jobs.test_locked')
+        self.assertFalse(execute(claim('a')))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), (Job.PENDING, 0, ''))
+        self.assertIsNotNone(job.run_after)
+
+
+class DownloadTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', is_staff=True)
+        self.job = Job.objects.create(name='jobs.export', user=self.owner)
+        self.job.file.save('t.csv', ContentFile(b'a,b\n'))
+        self.url = '/jobs/job/%s/download/' % self.job.pk
+
+    def tearDown(self):
+        self.job.file.delete(save=False)
+
+    def test_download(self):
+        # 结果文件不在MEDIA_ROOT下，只有提交人和管理员能下载
+        self.assertFalse(self.job.file.path.startswith(settings.MEDIA_ROOT))
+        self.client.force_login(User.objects.create_user('other', is_staff=True))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_login(self.owner)
+        response = self.client.get(self.url)
+        self.assertEqual(b''.join(response.streaming_content), b'a,b\n')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
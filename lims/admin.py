@@ -1,26 +1,59 @@
 from django.contrib import admin
-from .models import SampleInfo, QcTask, ExtTask, LibTask
+from .models import SampleInfo, QcTask, ExtTask, LibTask, StageCapacity
 from django import forms
 from django.contrib import messages
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
-from datetime import date, timedelta
+from datetime import date
 from django.utils.html import format_html
+from django.db import transaction
+from django.conf.urls import url
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.template.response import TemplateResponse
+from pm.progress import refresh_progress
+from BMS.workdays import add_business_days_many
+from BMS.enrichers import EnrichedChangeList, RowEnricherMixin
+from BMS.export import StreamingExportMixin
+from .importer import IMPORT_FIELDS, import_samples
+from .stages import refresh_stages
+from .scheduler import stage_plan
+from django.conf import settings
+from django.core.urlresolvers import reverse
+from django.http import HttpResponseRedirect
+from jobs.actions import enqueue
+from jobs.models import job_storage
+
+
+class PrunedChangeList(EnrichedChangeList):
+    # 列表页只读取list_only中列出的字段，关联表由list_select_related一次联表读取
+    def get_queryset(self, request):
+        qs = super(PrunedChangeList, self).get_queryset(request)
+        if getattr(self.model_admin, 'list_only', None):
+            qs = qs.only(*self.model_admin.list_only)
+        return qs
+
+
+class TaskRowMixin(RowEnricherMixin):
+    # 批量计算本页实验任务的截止日，读取阶段排期得到预计完成日
+    row_enrichers = [('due_date', 'due_date_map'), ('projected', 'projected_map')]
 
+    def due_date_map(self, objs):
+        due_dates = add_business_days_many((obj.sub_date, getattr(obj.sample.project, self.cycle_field))
+                                           for obj in objs)
+        return dict((obj.pk, due_date) for obj, due_date in zip(objs, due_dates))
 
-def add_business_days(from_date, number_of_days):
-    to_date = from_date
-    if number_of_days >= 0:
-        while number_of_days:
-            to_date += timedelta(1)
-            if to_date.weekday() < 5:
-                number_of_days -= 1
-    else:
-        while number_of_days:
-            to_date -= timedelta(1)
-            if to_date.weekday() < 5:
-                number_of_days += 1
-    return to_date
+    def projected_map(self, objs):
+        tasks = stage_plan(self.stage)['tasks']
+        return dict((obj.pk, tasks.get(obj.pk)) for obj in objs)
+
+    def projected_date(self, obj):
+        projected = self.row_value(obj, 'projected')
+        if not projected:
+            return '-'
+        if projected[0] > self.row_value(obj, 'due_date'):
+            return format_html('<span style="color:{};">{}</span>', 'red', projected[0].strftime('%Y%m%d'))
+        return projected[0].strftime('%Y%m%d')
+    projected_date.short_description = '预计完成'
 
 
 class SampleInfoResource(resources.ModelResource):
@@ -37,17 +70,27 @@ class SampleInfoForm(forms.ModelForm):
         return self.cleaned_data['note']
 
 
-class SampleInfoAdmin(ImportExportModelAdmin):
+class SampleImportForm(forms.Form):
+    import_file = forms.FileField(label='样品表', help_text='CSV（UTF-8）或XLSX，表头为字段名或中文字段名')
+    dry_run = forms.BooleanField(label='只校验不导入', required=False)
+
+
+class SampleInfoAdmin(RowEnricherMixin, StreamingExportMixin, ImportExportModelAdmin):
     form = SampleInfoForm
     list_display = ['contract', 'project', 'type', 'species', 'name', 'volume', 'concentration', 'receive_date',
                     'check', 'note']
     resources_class = SampleInfoResource
     list_display_links = ['name']
     list_filter = ['check']
-    actions = ['make_pass']
+    actions = ['make_pass', 'export_csv', 'export_xlsx']
     fields = (('contract', 'contract_name', 'project', 'customer'), ('name', 'receive_date'), 'type', 'species',
               'volume', 'concentration', 'check', 'note')
     raw_id_fields = ['project']
+    change_list_template = 'admin/lims/sampleinfo/change_list.html'
+    list_select_related = ['project__contract']
+    list_only = ['project__name', 'project__customer', 'project__contract__contract_number',
+                 'project__contract__name', 'type', 'species', 'name', 'volume', 'concentration', 'receive_date',
+                 'check', 'note']
 
     def contract(self, obj):
         return obj.project.contract
@@ -62,7 +105,9 @@ class SampleInfoAdmin(ImportExportModelAdmin):
     customer.short_description = '客户'
 
     def make_pass(self, request, queryset):
+        project_ids = set(queryset.values_list('project', flat=True))
         rows_updated = queryset.update(check=True)
+        refresh_stages(project_ids)
         if rows_updated:
             self.message_user(request, '%s 个样品核验通过' % rows_updated)
         else:
@@ -79,6 +124,43 @@ class SampleInfoAdmin(ImportExportModelAdmin):
         else:
             obj.save()
 
+    def get_changelist(self, request):
+        return PrunedChangeList
+
+    def get_urls(self):
+        urls = super(SampleInfoAdmin, self).get_urls()
+        return [
+            url(r'^stream_import/$', self.admin_site.admin_view(self.stream_import_view),
+                name='lims_sampleinfo_stream_import'),
+        ] + urls
+
+    def stream_import_view(self, request):
+        # 大文件导入：逐块读取、校验和写入，不预览
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = SampleImportForm(request.POST or None, request.FILES or None)
+        importer = None
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['import_file']
+            if upload.size > settings.JOBS_IMPORT_ASYNC_SIZE:
+                path = job_storage.save('uploads/%s' % upload.name, upload)
+                enqueue(self, request, 'lims.import_samples', path=path, filename=upload.name,
+                        dry_run=form.cleaned_data['dry_run'])
+                return HttpResponseRedirect(reverse('admin:lims_sampleinfo_changelist'))
+            try:
+                importer = import_samples(upload, upload.name, dry_run=form.cleaned_data['dry_run'])
+            except ValidationError as e:
+                form.add_error('import_file', e)
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.model._meta,
+            title='批量导入样品',
+            form=form,
+            fields=IMPORT_FIELDS,
+            importer=importer,
+        )
+        return TemplateResponse(request, 'admin/lims/sampleinfo/stream_import.html', context)
+
     def get_queryset(self, request):
         qs = super(SampleInfoAdmin, self).get_queryset(request)
         if request.user.is_superuser or request.user.has_perm('lims.add_sampleinfo'):
@@ -105,13 +187,20 @@ class ExtTaskForm(forms.ModelForm):
         return self.cleaned_data['note']
 
 
-class ExtTaskAdmin(admin.ModelAdmin):
+class ExtTaskAdmin(TaskRowMixin, StreamingExportMixin, admin.ModelAdmin):
     form = ExtTaskForm
-    list_display = ['contract', 'project', 'sample_name', 'receive_date', 'left_days', 'date', 'operator', 'result',
-                    'note']
+    list_display = ['contract', 'project', 'sample_name', 'receive_date', 'left_days', 'projected_date', 'date',
+                    'operator', 'result', 'note']
     list_display_links = ['sample_name']
     list_filter = ['result']
-    actions = ['make_pass']
+    actions = ['make_pass', 'export_csv', 'export_xlsx']
+    stage = 'ext'
+    cycle_field = 'ext_cycle'
+    list_select_related = ['sample__project__contract', 'staff']
+    list_only = ['sub_date', 'date', 'result', 'note', 'sample__name', 'sample__receive_date', 'sample__project__name',
+                 'sample__project__customer', 'sample__project__ext_cycle',
+                 'sample__project__contract__contract_number', 'sample__project__contract__name', 'staff__username',
+                 'staff__first_name', 'staff__last_name']
     fields = (('contract', 'contract_name', 'project', 'customer'), ('sample_name', 'receive_date'), 'result', 'note')
 
     def contract(self, obj):
@@ -141,7 +230,7 @@ class ExtTaskAdmin(admin.ModelAdmin):
     def left_days(self, obj):
         if obj.date:
             return '完成'
-        due_date = add_business_days(obj.sub_date, obj.sample.project.ext_cycle)
+        due_date = self.row_value(obj, 'due_date')
         left = (due_date - date.today()).days
         if left >= 0:
             return '余%s天' % left
@@ -159,7 +248,11 @@ class ExtTaskAdmin(admin.ModelAdmin):
     operator.short_description = '实验员'
 
     def make_pass(self, request, queryset):
-        rows_updated = queryset.update(result=True, date=date.today(), staff=request.user)
+        # 批量update不触发信号，需手动同步项目进度
+        project_ids = list(queryset.values_list('sample__project', flat=True).distinct())
+        with transaction.atomic():
+            rows_updated = queryset.update(result=True, date=date.today(), staff=request.user)
+            refresh_progress(project_ids, ['ext'])
         if rows_updated:
             self.message_user(request, '%s 个样品提取成功' % rows_updated)
         else:
@@ -175,6 +268,9 @@ class ExtTaskAdmin(admin.ModelAdmin):
             obj.staff = request.user
         obj.save()
 
+    def get_changelist(self, request):
+        return PrunedChangeList
+
     def get_queryset(self, request):
         qs = super(ExtTaskAdmin, self).get_queryset(request)
         if request.user.is_superuser or request.user.has_perm('lims.add_exttask'):
@@ -200,13 +296,20 @@ class QcTaskForm(forms.ModelForm):
         return self.cleaned_data['note']
 
 
-class QcTaskAdmin(admin.ModelAdmin):
+class QcTaskAdmin(TaskRowMixin, StreamingExportMixin, admin.ModelAdmin):
     form = QcTaskForm
-    list_display = ['contract', 'project', 'sample_name', 'receive_date', 'left_days', 'date', 'volume', 'concentration',
-                    'total', 'operator', 'result', 'note']
+    list_display = ['contract', 'project', 'sample_name', 'receive_date', 'left_days', 'projected_date', 'date',
+                    'volume', 'concentration', 'total', 'operator', 'result', 'note']
     list_display_links = ['sample_name']
     list_filter = ['result']
-    actions = ['make_pass']
+    actions = ['make_pass', 'export_csv', 'export_xlsx']
+    stage = 'qc'
+    cycle_field = 'qc_cycle'
+    list_select_related = ['sample__project__contract', 'staff']
+    list_only = ['sub_date', 'date', 'volume', 'concentration', 'total', 'result', 'note', 'sample__name',
+                 'sample__receive_date', 'sample__project__name', 'sample__project__customer',
+                 'sample__project__qc_cycle', 'sample__project__contract__contract_number',
+                 'sample__project__contract__name', 'staff__username', 'staff__first_name', 'staff__last_name']
     fields = (('contract', 'contract_name', 'project', 'customer'), ('sample_name', 'receive_date'), 'volume',
               'concentration', 'total', 'result', 'note')
 
@@ -237,7 +340,7 @@ class QcTaskAdmin(admin.ModelAdmin):
     def left_days(self, obj):
         if obj.date:
             return '完成'
-        due_date = add_business_days(obj.sub_date, obj.sample.project.qc_cycle)
+        due_date = self.row_value(obj, 'due_date')
         left = (due_date - date.today()).days
         if left >= 0:
             return '余%s天' % left
@@ -255,7 +358,11 @@ class QcTaskAdmin(admin.ModelAdmin):
     operator.short_description = '实验员'
 
     def make_pass(self, request, queryset):
-        rows_updated = queryset.update(result=1, date=date.today(), staff=request.user)
+        # 批量update不触发信号，需手动同步项目进度
+        project_ids = list(queryset.values_list('sample__project', flat=True).distinct())
+        with transaction.atomic():
+            rows_updated = queryset.update(result=1, date=date.today(), staff=request.user)
+            refresh_progress(project_ids, ['qc'])
         if rows_updated:
             self.message_user(request, '%s 个样品质检合格' % rows_updated)
         else:
@@ -275,6 +382,9 @@ class QcTaskAdmin(admin.ModelAdmin):
             obj.staff = request.user
         obj.save()
 
+    def get_changelist(self, request):
+        return PrunedChangeList
+
     def get_queryset(self, request):
         qs = super(QcTaskAdmin, self).get_queryset(request)
         if request.user.is_superuser or request.user.has_perm('lims.add_qctask'):
@@ -301,13 +411,22 @@ class LibTaskForm(forms.ModelForm):
         return self.cleaned_data['note']
 
 
-class LibTaskAdmin(admin.ModelAdmin):
+class LibTaskAdmin(TaskRowMixin, StreamingExportMixin, admin.ModelAdmin):
     form = LibTaskForm
-    list_display = ['contract', 'project', 'sample_name', 'receive_date', 'left_days', 'date', 'type', 'sample_code',
-                    'lib_code', 'index', 'length', 'volume', 'concentration', 'total', 'operator', 'result', 'note']
+    list_display = ['contract', 'project', 'sample_name', 'receive_date', 'left_days', 'projected_date', 'date',
+                    'type', 'sample_code', 'lib_code', 'index', 'length', 'volume', 'concentration', 'total', 'operator',
+                    'result', 'note']
     list_display_links = ['sample_name']
     list_filter = ['result']
-    actions = ['make_pass']
+    actions = ['make_pass', 'export_csv', 'export_xlsx']
+    stage = 'lib'
+    cycle_field = 'lib_cycle'
+    list_select_related = ['sample__project__contract', 'staff']
+    list_only = ['sub_date', 'date', 'type', 'sample_code', 'lib_code', 'index', 'length', 'volume', 'concentration',
+                 'total', 'result', 'note', 'sample__name', 'sample__receive_date', 'sample__project__name',
+                 'sample__project__customer', 'sample__project__lib_cycle',
+                 'sample__project__contract__contract_number', 'sample__project__contract__name', 'staff__username',
+                 'staff__first_name', 'staff__last_name']
     fields = (('contract', 'contract_name', 'project', 'customer'), ('sample_name', 'receive_date'), 'type',
               'sample_code', 'lib_code', 'index', 'length', 'volume', 'concentration', 'total', 'result', 'note')
 
@@ -338,7 +457,7 @@ class LibTaskAdmin(admin.ModelAdmin):
     def left_days(self, obj):
         if obj.date:
             return '完成'
-        due_date = add_business_days(obj.sub_date, obj.sample.project.lib_cycle)
+        due_date = self.row_value(obj, 'due_date')
         left = (due_date - date.today()).days
         if left >= 0:
             return '余%s天' % left
@@ -356,7 +475,11 @@ class LibTaskAdmin(admin.ModelAdmin):
     operator.short_description = '实验员'
 
     def make_pass(self, request, queryset):
-        rows_updated = queryset.update(result=True, date=date.today(), staff=request.user)
+        # 批量update不触发信号，需手动同步项目进度
+        project_ids = list(queryset.values_list('sample__project', flat=True).distinct())
+        with transaction.atomic():
+            rows_updated = queryset.update(result=True, date=date.today(), staff=request.user)
+            refresh_progress(project_ids, ['lib'])
         if rows_updated:
             self.message_user(request, '%s 个样品建库合格' % rows_updated)
         else:
@@ -381,6 +504,9 @@ class LibTaskAdmin(admin.ModelAdmin):
             obj.staff = request.user
         obj.save()
 
+    def get_changelist(self, request):
+        return PrunedChangeList
+
     def get_queryset(self, request):
         qs = super(LibTaskAdmin, self).get_queryset(request)
         if request.user.is_superuser or request.user.has_perm('lims.add_libtask'):
@@ -399,7 +525,16 @@ class LibTaskAdmin(admin.ModelAdmin):
                     'sample_code', 'lib_code', 'index', 'length', 'volume', 'concentration', 'total', 'result', 'note']
         return ['contract', 'contract_name', 'project', 'customer', 'sample_name', 'receive_date']
 
+
+class StageCapacityAdmin(admin.ModelAdmin):
+    list_display = ('stage', 'staff', 'capacity')
+    list_editable = ['capacity']
+    list_filter = ['stage']
+    raw_id_fields = ['staff']
+    list_select_related = ['staff']
+
 admin.site.register(SampleInfo, SampleInfoAdmin)
 admin.site.register(ExtTask, ExtTaskAdmin)
 admin.site.register(QcTask, QcTaskAdmin)
 admin.site.register(LibTask, LibTaskAdmin)
+admin.site.register(StageCapacity, StageCapacityAdmin)
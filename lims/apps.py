@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LimsConfig(AppConfig):
     name = 'lims'
     verbose_name = "实验管理系统"
+
+    def ready(self):
+        from . import signals  # noqa
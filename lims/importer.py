@@ -0,0 +1,159 @@
+"""
+样品表流式导入
+
+逐行读取上传的CSV/XLSX，按块处理：每块一次查询核对项目，一次查询按 (项目, 样品名称, 收样日期) 找出已有样品，
+新样品bulk_create，有变动的样品批量更新，未变动的跳过。只保留计数和前若干条错误，内存占用与文件大小无关。
+"""
+import codecs
+import csv
+import logging
+import os
+from datetime import datetime
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from BMS.db import bulk_update
+from pm.models import Project
+from .models import SampleInfo
+
+logger = logging.getLogger(__name__)
+
+# 与SampleInfoResource一致：不导入核对结果和备注
+IMPORT_FIELDS = ('project', 'type', 'species', 'name', 'volume', 'concentration', 'receive_date')
+UPDATE_FIELDS = ('type', 'species', 'volume', 'concentration')
+
+
+def read_rows(f, filename, encoding='utf-8-sig'):
+    """
+    逐行读取上传文件，表头可以是字段名或中文字段名
+    :return: 生成(行号, {字段名: 值})
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.csv':
+        rows = csv.reader(codecs.iterdecode(f, encoding))
+    elif ext == '.xlsx':
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValidationError('导入XLSX需要安装openpyxl')
+        sheet = load_workbook(f, read_only=True).active
+        rows = ([cell.value for cell in row] for row in sheet.iter_rows())
+    else:
+        raise ValidationError('只支持CSV和XLSX文件')
+    names = dict((str(SampleInfo._meta.get_field(name).verbose_name), name) for name in IMPORT_FIELDS)
+    header = [str(title).strip() if title is not None else '' for title in next(rows, [])]
+    header = [names.get(title, title) for title in header]
+    missing = [name for name in IMPORT_FIELDS if name not in header]
+    if missing:
+        raise ValidationError('缺少列：%s' % '，'.join(missing))
+    for line, values in enumerate(rows, start=2):
+        if any(value not in (None, '') for value in values):
+            yield line, dict(zip(header, values))
+
+
+def clean_row(values):
+    data = {}
+    for name in IMPORT_FIELDS:
+        field = SampleInfo._meta.get_field(name)
+        value = values.get(name)
+        if isinstance(value, str):
+            value = value.strip()
+        if value in (None, ''):
+            raise ValidationError('%s不能为空' % field.verbose_name)
+        if name == 'project':
+            try:
+                data['project_id'] = int(value)
+            except (TypeError, ValueError):
+                raise ValidationError('项目应为项目编号：%s' % value)
+            continue
+        if isinstance(value, datetime):
+            value = value.date()
+        elif isinstance(value, float) and isinstance(field, models.DecimalField):
+            # XLSX的数值单元格读出为float，按最短表示转换并保留字段的小数位，避免二进制展开超出位数
+            value = Decimal(repr(value)).quantize(Decimal(1).scaleb(-field.decimal_places))
+        data[field.attname] = field.clean(value, None)
+    return data
+
+
+class SampleImporter(object):
+    """
+    :param chunk_size: 每块行数，每块在一个事务中写入
+    :param dry_run: 只校验不写入
+    :param max_errors: 最多保留的错误条数
+    :param progress: 每块处理完成后调用 progress(已处理行数)
+    """
+    def __init__(self, chunk_size=1000, dry_run=False, max_errors=100, progress=None):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.max_errors = max_errors
+        self.progress = progress
+        self.counts = {'new': 0, 'update': 0, 'skip': 0, 'error': 0}
+        self.errors = []
+        self.seen = set()
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def error(self, line, messages):
+        self.counts['error'] += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, '；'.join(messages)))
+
+    def run(self, rows):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk)
+        self.errors.sort()
+        return self
+
+    def import_chunk(self, chunk):
+        parsed = []
+        for line, values in chunk:
+            try:
+                parsed.append((line, clean_row(values)))
+            except ValidationError as e:
+                self.error(line, e.messages)
+        project_ids = set(Project.objects.filter(pk__in=set(data['project_id'] for _, data in parsed))
+                          .values_list('pk', flat=True))
+        existing = dict(((obj.project_id, obj.name, obj.receive_date), obj) for obj in SampleInfo.objects.filter(
+            project__in=project_ids, name__in=set(data['name'] for _, data in parsed),
+            receive_date__in=set(data['receive_date'] for _, data in parsed)).only('project', 'name', 'receive_date',
+                                                                                     *UPDATE_FIELDS))
+        new, changed = [], []
+        for line, data in parsed:
+            key = (data['project_id'], data['name'], data['receive_date'])
+            if data['project_id'] not in project_ids:
+                self.error(line, ['项目不存在：%s' % data['project_id']])
+                continue
+            if key in self.seen:
+                self.error(line, ['与文件中前面的样品重复（项目、样品名称、收样日期相同）'])
+                continue
+            self.seen.add(key)
+            obj = existing.get(key)
+            if obj is None:
+                new.append(SampleInfo(**data))
+            elif any(getattr(obj, name) != data[name] for name in UPDATE_FIELDS):
+                for name in UPDATE_FIELDS:
+                    setattr(obj, name, data[name])
+                changed.append(obj)
+            else:
+                self.counts['skip'] += 1
+        if not self.dry_run:
+            with transaction.atomic():
+                SampleInfo.objects.bulk_create(new)
+                bulk_update(changed, UPDATE_FIELDS)
+        self.counts['new'] += len(new)
+        self.counts['update'] += len(changed)
+        logger.info('样品导入：已处理 %s 行 %s', self.total, self.counts)
+        if self.progress:
+            self.progress(self.total)
+
+
+def import_samples(f, filename, **kwargs):
+    return SampleImporter(**kwargs).run(read_rows(f, filename))
@@ -0,0 +1,26 @@
+from django.contrib import messages
+from django.core.exceptions import ValidationError
+from jobs.models import job_storage
+from jobs.registry import register
+from .importer import import_samples
+
+MAX_RESULT_ERRORS = 20
+
+
+@register('lims.import_samples')
+def import_samples_job(job, path, filename, dry_run=False):
+    """
+    导入已上传的样品表；按样品键值去重，重试时已导入的行计为未变动
+    """
+    with job_storage.open(path, 'rb') as f:
+        try:
+            importer = import_samples(f, filename, dry_run=dry_run, progress=job.set_progress)
+        except ValidationError as e:
+            return [(messages.ERROR, '；'.join(e.messages))]
+    if not dry_run:
+        job_storage.delete(path)
+    result = [(messages.INFO, '%s共 %s 行：新增 %s，更新 %s，未变动 %s，错误 %s' % (
+        '校验' if dry_run else '导入', importer.total, importer.counts['new'], importer.counts['update'],
+        importer.counts['skip'], importer.counts['error']))]
+    result += [(messages.ERROR, '第 %s 行：%s' % error) for error in importer.errors[:MAX_RESULT_ERRORS]]
+    return result
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 18:30
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lims', '0008_sync_models'),
+        ('pm', '0016_sync_models'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='Barcode',
+        ),
+        migrations.RemoveField(
+            model_name='experiment',
+            name='sample',
+        ),
+        migrations.DeleteModel(
+            name='Primer',
+        ),
+        migrations.DeleteModel(
+            name='Experiment',
+        ),
+        migrations.AddField(
+            model_name='sampleinfo',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='pm.Project', verbose_name='项目'),
+        ),
+        migrations.AddField(
+            model_name='qctask',
+            name='sample',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='lims.SampleInfo', verbose_name='样品'),
+        ),
+        migrations.AddField(
+            model_name='qctask',
+            name='staff',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='实验员'),
+        ),
+        migrations.AddField(
+            model_name='libtask',
+            name='sample',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='lims.SampleInfo', verbose_name='样品'),
+        ),
+        migrations.AddField(
+            model_name='libtask',
+            name='staff',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='实验员'),
+        ),
+        migrations.AddField(
+            model_name='exttask',
+            name='sample',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='lims.SampleInfo', verbose_name='样品'),
+        ),
+        migrations.AddField(
+            model_name='exttask',
+            name='staff',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='实验员'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='sampleinfo',
+            unique_together=set([('project', 'name', 'receive_date')]),
+        ),
+    ]
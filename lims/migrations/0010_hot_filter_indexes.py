@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 18:30
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pm', '0019_hot_filter_indexes'),
+        ('lims', '0009_sync_models'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='exttask',
+            index_together=set([('result', 'sample')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='libtask',
+            index_together=set([('result', 'sample')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='qctask',
+            index_together=set([('result', 'sample')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='sampleinfo',
+            index_together=set([('check', 'project')]),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 18:30
+from __future__ import unicode_literals
+
+from collections import defaultdict
+from django.db import migrations, models
+
+TASK_MODELS = (('ext', 'ExtTask'), ('qc', 'QcTask'), ('lib', 'LibTask'))
+
+
+def fill_stages(apps, schema_editor):
+    # 按项目分批推算已有样品的流程状态，推算规则同lims.stages
+    from lims.stages import sample_stage
+    Project = apps.get_model('pm', 'Project')
+    SampleInfo = apps.get_model('lims', 'SampleInfo')
+    project_ids = list(Project.objects.order_by('pk').values_list('pk', flat=True))
+    for i in range(0, len(project_ids), 500):
+        batch = project_ids[i:i + 500]
+        projects = dict((row[0], row[1:]) for row in Project.objects.filter(pk__in=batch).values_list(
+            'pk', 'is_confirm', 'is_ext', 'is_qc', 'is_lib'))
+        results = defaultdict(lambda: defaultdict(list))
+        for stage, model_name in TASK_MODELS:
+            for sample, result in apps.get_model('lims', model_name).objects.filter(sample__project__in=batch)\
+                    .values_list('sample', 'result'):
+                results[sample][stage].append(result)
+        changed = defaultdict(list)
+        for pk, project, check in SampleInfo.objects.filter(project__in=batch).values_list('pk', 'project', 'check'):
+            changed[sample_stage(projects[project], check, results.get(pk, {}))].append(pk)
+        for stage, pks in changed.items():
+            for j in range(0, len(pks), 500):
+                SampleInfo.objects.filter(pk__in=pks[j:j + 500]).update(stage=stage)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lims', '0010_hot_filter_indexes'),
+        ('pm', '0019_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sampleinfo',
+            name='stage',
+            field=models.CharField(choices=[('received', '待核对'), ('checked', '待项目确认'), ('ext_pending', '待提取'), ('ext_running', '提取中'), ('ext_failed', '提取不合格'), ('qc_pending', '待质检'), ('qc_running', '质检中'), ('qc_failed', '质检不合格'), ('lib_pending', '待建库'), ('lib_running', '建库中'), ('done', '完成')], db_index=True, default='received', editable=False, max_length=12, verbose_name='流程状态'),
+        ),
+        migrations.RunPython(fill_stages, migrations.RunPython.noop),
+    ]
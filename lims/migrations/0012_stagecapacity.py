@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 18:31
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('lims', '0011_sampleinfo_stage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StageCapacity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('ext', '提取'), ('qc', '质检'), ('lib', '建库')], max_length=3, verbose_name='实验')),
+                ('capacity', models.PositiveIntegerField(verbose_name='每工作日样品数')),
+                ('staff', models.ForeignKey(blank=True, help_text='指定实验员的任务只排入该实验员的产能，其余任务排入最早有空的产能', null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='实验员')),
+            ],
+            options={
+                'verbose_name': '4实验产能',
+                'verbose_name_plural': '4实验产能',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='stagecapacity',
+            unique_together=set([('stage', 'staff')]),
+        ),
+    ]
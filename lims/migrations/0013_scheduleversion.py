@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 18:43
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lims', '0012_stagecapacity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('ext', '提取'), ('qc', '质检'), ('lib', '建库')], max_length=3, unique=True, verbose_name='实验')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='版本')),
+            ],
+            options={
+                'verbose_name': '实验排期版本',
+                'verbose_name_plural': '实验排期版本',
+            },
+        ),
+    ]
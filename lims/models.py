@@ -4,27 +4,49 @@ from pm.models import Project
 
 
 class IsExtManager(models.Manager):
-    # 返回通过核对且需提取的样品
+    # 返回可下提取任务的样品
     def get_queryset(self):
-        return super(IsExtManager, self).get_queryset().filter(project__is_confirm=True).filter(check=True)\
-            .filter(project__is_ext=True)
+        return super(IsExtManager, self).get_queryset().filter(stage=SampleInfo.EXT_PENDING)
 
 
 class IsQcManager(models.Manager):
-    # 返回通过项目确认、样品核对且需质检的样品
+    # 返回可下质检任务的样品
     def get_queryset(self):
-        return super(IsQcManager, self).get_queryset().filter(project__is_confirm=True).filter(check=True)\
-            .filter(project__is_qc=True)
+        return super(IsQcManager, self).get_queryset().filter(stage=SampleInfo.QC_PENDING)
 
 
 class IsLibManager(models.Manager):
-    # 返回通过核对且需建库的样品
+    # 返回可下建库任务的样品
     def get_queryset(self):
-        return super(IsLibManager, self).get_queryset().filter(project__is_confirm=True).filter(check=True)\
-            .filter(project__is_lib=True)
+        return super(IsLibManager, self).get_queryset().filter(stage=SampleInfo.LIB_PENDING)
 
 
 class SampleInfo(models.Model):
+    # 流程状态由lims.stages按项目确认、样品核对和各阶段实验结果维护
+    RECEIVED = 'received'
+    CHECKED = 'checked'
+    EXT_PENDING = 'ext_pending'
+    EXT_RUNNING = 'ext_running'
+    EXT_FAILED = 'ext_failed'
+    QC_PENDING = 'qc_pending'
+    QC_RUNNING = 'qc_running'
+    QC_FAILED = 'qc_failed'
+    LIB_PENDING = 'lib_pending'
+    LIB_RUNNING = 'lib_running'
+    DONE = 'done'
+    STAGE_CHOICES = (
+        (RECEIVED, '待核对'),
+        (CHECKED, '待项目确认'),
+        (EXT_PENDING, '待提取'),
+        (EXT_RUNNING, '提取中'),
+        (EXT_FAILED, '提取不合格'),
+        (QC_PENDING, '待质检'),
+        (QC_RUNNING, '质检中'),
+        (QC_FAILED, '质检不合格'),
+        (LIB_PENDING, '待建库'),
+        (LIB_RUNNING, '建库中'),
+        (DONE, '完成'),
+    )
     project = models.ForeignKey(
         'pm.Project',
         verbose_name='项目',
@@ -38,6 +60,8 @@ class SampleInfo(models.Model):
     receive_date = models.DateField('收样日期')
     check = models.NullBooleanField('样品核对', null=True)
     note = models.TextField('备注', blank=True, null=True)
+    stage = models.CharField('流程状态', max_length=12, choices=STAGE_CHOICES, default=RECEIVED, db_index=True,
+                             editable=False)
 
     objects = models.Manager()
     is_ext_objects = IsExtManager()
@@ -46,6 +70,7 @@ class SampleInfo(models.Model):
 
     class Meta:
         unique_together = ('project', 'name', 'receive_date')
+        index_together = ('check', 'project')
         verbose_name = '0样品管理'
         verbose_name_plural = '0样品管理'
 
@@ -70,6 +95,8 @@ class ExtTask(models.Model):
     note = models.TextField('备注', blank=True, null=True)
 
     class Meta:
+        # 按结论筛选样品（待处理：result IS NULL），只读索引即可得到样品
+        index_together = ('result', 'sample')
         verbose_name = '1提取实验'
         verbose_name_plural = '1提取实验'
 
@@ -107,6 +134,8 @@ class QcTask(models.Model):
     note = models.TextField('备注', blank=True, null=True)
 
     class Meta:
+        # 按结论筛选样品（待处理：result IS NULL），只读索引即可得到样品
+        index_together = ('result', 'sample')
         verbose_name = '2样品质检'
         verbose_name_plural = '2样品质检'
 
@@ -139,6 +168,8 @@ class LibTask(models.Model):
     note = models.TextField('备注', blank=True, null=True)
 
     class Meta:
+        # 按结论筛选样品（待处理：result IS NULL），只读索引即可得到样品
+        index_together = ('result', 'sample')
         verbose_name = '3样品建库'
         verbose_name_plural = '3样品建库'
 
@@ -146,6 +177,44 @@ class LibTask(models.Model):
         return '%s' % self.result
 
 
+class StageCapacity(models.Model):
+    """
+    实验产能：实验员为空时为不指定实验员的产能，各实验阶段未设置时按settings.LAB_STAGE_CAPACITY
+    """
+    STAGE_CHOICES = (
+        ('ext', '提取'),
+        ('qc', '质检'),
+        ('lib', '建库'),
+    )
+    stage = models.CharField('实验', max_length=3, choices=STAGE_CHOICES)
+    staff = models.ForeignKey(
+        User,
+        verbose_name='实验员',
+        blank=True,
+        null=True,
+        help_text='指定实验员的任务只排入该实验员的产能，其余任务排入最早有空的产能'
+    )
+    capacity = models.PositiveIntegerField('每工作日样品数')
+
+    class Meta:
+        unique_together = ('stage', 'staff')
+        verbose_name = '4实验产能'
+        verbose_name_plural = '4实验产能'
+
+    def __str__(self):
+        return '%s %s' % (self.get_stage_display(), self.staff or '通用')
 
 
+class ScheduleVersion(models.Model):
+    """
+    实验排期版本：实验任务、项目或产能变动时在同一事务中加一，各进程读取排期时按版本判断缓存是否过期
+    """
+    stage = models.CharField('实验', max_length=3, choices=StageCapacity.STAGE_CHOICES, unique=True)
+    version = models.PositiveIntegerField('版本', default=0)
 
+    class Meta:
+        verbose_name = '实验排期版本'
+        verbose_name_plural = '实验排期版本'
+
+    def __str__(self):
+        return '%s %s' % (self.get_stage_display(), self.version)
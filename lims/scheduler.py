@@ -0,0 +1,143 @@
+"""
+实验排期
+
+按各实验阶段的产能（StageCapacity，每工作日样品数）把未出结果的实验任务排到工作日上，得到每个任务的预计完成日，
+项目的预计完成日取其各阶段任务中最晚的一个。
+
+每个阶段一次查询读出全部待处理任务，按截止日（下单日加项目周期，工作日）、下单日依次排入：指定了实验员且该实验员
+设有产能的任务排入该实验员的产能，其余任务排入最早有空的产能（最小堆，堆顶始终为当天仍有余量的产能）。
+任务不早于下单日和今天开始。日期均换算为工作日序号计算，排期耗时为 O(n log m)，n为任务数，m为产能条数。
+
+排期按阶段缓存。实验任务变动（refresh_progress）、项目变动或产能变动时，在同一事务中把对应阶段的排期版本
+（ScheduleVersion）加一；读取排期时先查版本（一次查询），缓存的版本不同或已跨日即整个阶段重新排期。
+版本存于数据库，多进程部署时各进程在变动提交后的下次读取即重新排期，不依赖缓存后端是否共享；
+配置共享的缓存后端（CACHES）时，各进程还可共用重新排好的排期。
+
+每个版本整个阶段重新排期，不做增量重排：单个任务或产能变动后，版本变化后的首次读取仍读出并重排该阶段全部待处理任务
+（固定3次查询，5万个任务约0.2秒），其余读取只查询版本。
+"""
+import heapq
+from datetime import date
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from BMS.workdays import add_business_days, get_calendar
+from .models import ExtTask, QcTask, LibTask, StageCapacity, ScheduleVersion
+
+STAGE_TASKS = (
+    ('ext', ExtTask),
+    ('qc', QcTask),
+    ('lib', LibTask),
+)
+
+
+def plan_key(stage):
+    return 'lims:schedule:%s' % stage
+
+
+def plan_versions():
+    # {阶段: 排期版本}，须在读取实验任务前读取
+    return dict(ScheduleVersion.objects.values_list('stage', 'version'))
+
+
+def stage_lanes(stage):
+    """
+    :return: [(实验员ID或None, 每工作日样品数)]
+    """
+    lanes = list(StageCapacity.objects.filter(stage=stage, capacity__gt=0).values_list('staff', 'capacity'))
+    return lanes or [(None, settings.LAB_STAGE_CAPACITY[stage])]
+
+
+def schedule(tasks, lanes, today):
+    """
+    :param tasks: [(任务ID, 截止日, 下单日, 实验员ID)]
+    :param lanes: [(实验员ID或None, 每工作日样品数)]
+    :return: {任务ID: (预计完成日, 排入产能的实验员ID)}
+    """
+    calendar = get_calendar()
+    start = calendar.ordinal(today)
+    # 各产能最早仍有余量的工作日序号，及各工作日已排数；下单日在今天之后的任务排在下单日，不占用之前的余量
+    days = [start] * len(lanes)
+    used = [{} for _ in lanes]
+    heap = [(start, i) for i in range(len(lanes))]
+    staff_lanes = dict((staff, i) for i, (staff, _) in enumerate(lanes) if staff is not None)
+    ordinals = {}
+    result = {}
+    for pk, due_date, sub_date, staff in sorted(tasks, key=lambda task: (task[1], task[2], task[0])):
+        i = staff_lanes.get(staff)
+        if i is None:
+            # 跳过已过期的堆项，堆顶即最早有空的产能
+            while heap[0][0] != days[heap[0][1]]:
+                heapq.heappop(heap)
+            i = heap[0][1]
+        if sub_date not in ordinals:
+            ordinals[sub_date] = calendar.ordinal(sub_date)
+        capacity = lanes[i][1]
+        day = max(days[i], ordinals[sub_date])
+        while used[i].get(day, 0) >= capacity:
+            day += 1
+        used[i][day] = used[i].get(day, 0) + 1
+        if day == days[i] and used[i][day] >= capacity:
+            while used[i].get(days[i], 0) >= capacity:
+                del used[i][days[i]]
+                days[i] += 1
+            heapq.heappush(heap, (days[i], i))
+        result[pk] = (day, lanes[i][0])
+    dates = dict((day, calendar.nth_workday(day)) for day in set(day for day, _ in result.values()))
+    return dict((pk, (dates[day], staff)) for pk, (day, staff) in result.items())
+
+
+def build_plan(stage, model, today, version=0):
+    cycle_field = 'sample__project__%s_cycle' % stage
+    rows = model.objects.filter(result=None).values_list('pk', 'sub_date', 'staff', 'sample__project', cycle_field)
+    tasks, task_projects = [], {}
+    for pk, sub_date, staff, project, cycle in rows.iterator():
+        tasks.append((pk, add_business_days(sub_date, cycle), sub_date, staff))
+        task_projects[pk] = project
+    planned = schedule(tasks, stage_lanes(stage), today)
+    projects = {}
+    for pk, (day, _) in planned.items():
+        project = task_projects[pk]
+        if project not in projects or projects[project] < day:
+            projects[project] = day
+    return {'today': today, 'version': version, 'tasks': planned, 'projects': projects}
+
+
+def stage_plan(stage, today=None, versions=None):
+    """
+    读取阶段排期，缓存中没有或版本已变时重新排期
+    :param versions: plan_versions()的结果，读取多个阶段时只查询一次
+    :return: {'today': 排期日, 'version': 排期版本, 'tasks': {任务ID: (预计完成日, 实验员ID)},
+              'projects': {项目ID: 预计完成日}}
+    """
+    today = today or date.today()
+    version = (plan_versions() if versions is None else versions).get(stage, 0)
+    plan = cache.get(plan_key(stage))
+    if plan is None or plan['today'] != today or plan['version'] != version:
+        plan = build_plan(stage, dict(STAGE_TASKS)[stage], today, version)
+        cache.set(plan_key(stage), plan, settings.LAB_SCHEDULE_TIMEOUT)
+    return plan
+
+
+def project_plan_map(project_ids, today=None):
+    # 项目实验预计完成日 {project_id: 各阶段中最晚的预计完成日}，没有待处理任务的项目不在结果中
+    result = {}
+    versions = plan_versions()
+    for stage, _ in STAGE_TASKS:
+        projects = stage_plan(stage, today, versions)['projects']
+        for pk in project_ids:
+            day = projects.get(pk)
+            if day and (pk not in result or result[pk] < day):
+                result[pk] = day
+    return result
+
+
+def mark_dirty(stages=None):
+    """
+    排期版本加一，随所在事务提交后各进程读取时重新排期；事务回滚时版本不变
+    """
+    stages = [stage for stage, _ in STAGE_TASKS if not stages or stage in stages]
+    if ScheduleVersion.objects.filter(stage__in=stages).update(version=F('version') + 1) < len(stages):
+        # 尚无版本记录的阶段
+        for stage in stages:
+            ScheduleVersion.objects.get_or_create(stage=stage, defaults={'version': 1})
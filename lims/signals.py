@@ -0,0 +1,44 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from pm.models import Project
+from pm.progress import refresh_progress
+from .models import SampleInfo, ExtTask, QcTask, LibTask, StageCapacity
+from .scheduler import mark_dirty
+from .stages import refresh_stages
+
+TASK_STAGES = {
+    ExtTask: 'ext',
+    QcTask: 'qc',
+    LibTask: 'lib',
+}
+
+
+@receiver(post_save, sender=ExtTask)
+@receiver(post_save, sender=QcTask)
+@receiver(post_save, sender=LibTask)
+@receiver(post_delete, sender=ExtTask)
+@receiver(post_delete, sender=QcTask)
+@receiver(post_delete, sender=LibTask)
+def task_changed(sender, instance, **kwargs):
+    # 实验任务新增、修改或删除时同步项目对应阶段进度
+    project_ids = SampleInfo.objects.filter(pk=instance.sample_id).values_list('project', flat=True)
+    refresh_progress(project_ids, [TASK_STAGES[sender]])
+
+
+@receiver(post_save, sender=SampleInfo)
+def sample_changed(sender, instance, **kwargs):
+    # 样品核对或所属项目变动时更新流程状态
+    refresh_stages([instance.project_id])
+
+
+@receiver(post_save, sender=Project)
+def project_changed(sender, instance, **kwargs):
+    # 项目确认或需做的实验阶段变动时更新样品流程状态；周期变动影响任务截止日，重新排期
+    refresh_stages([instance.pk])
+    mark_dirty()
+
+
+@receiver(post_save, sender=StageCapacity)
+@receiver(post_delete, sender=StageCapacity)
+def capacity_changed(sender, instance, **kwargs):
+    mark_dirty([instance.stage])
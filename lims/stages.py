@@ -0,0 +1,83 @@
+"""
+样品流程状态
+
+按项目确认、需做的实验阶段、样品核对和各阶段实验结果推算每个样品的流程状态，只更新有变化的样品，
+同一状态的样品一条UPDATE。项目、样品或实验任务变动后按项目调用refresh_stages。
+"""
+from collections import defaultdict
+from django.db import transaction
+from pm.models import Project
+from .models import SampleInfo, ExtTask, QcTask, LibTask
+
+# (阶段, 任务模型, 待下单, 进行中, 不合格)，按流程顺序
+STAGES = (
+    ('ext', ExtTask, SampleInfo.EXT_PENDING, SampleInfo.EXT_RUNNING, SampleInfo.EXT_FAILED),
+    ('qc', QcTask, SampleInfo.QC_PENDING, SampleInfo.QC_RUNNING, SampleInfo.QC_FAILED),
+    ('lib', LibTask, SampleInfo.LIB_PENDING, SampleInfo.LIB_RUNNING, None),
+)
+# 各阶段合格的结论；建库不合格可重新下单，不合格的任务不计
+PASSED = {'ext': (True,), 'qc': (1, 2), 'lib': (True,)}
+FAILED = {'ext': (False,), 'qc': (3,), 'lib': ()}
+IGNORED = {'ext': (), 'qc': (), 'lib': (False,)}
+
+
+def sample_stage(project, check, results):
+    """
+    :param project: (是否确认, 需提取, 需质检, 需建库)
+    :param check: 样品核对
+    :param results: {阶段: [该样品各任务的结论]}
+    """
+    is_confirm, needs = project[0], dict(zip(('ext', 'qc', 'lib'), project[1:]))
+    if not check:
+        return SampleInfo.RECEIVED
+    if not is_confirm:
+        return SampleInfo.CHECKED
+    for stage, _, pending, running, failed in STAGES:
+        if not needs[stage]:
+            continue
+        stage_results = [result for result in results.get(stage, ()) if result not in IGNORED[stage]]
+        if any(result in PASSED[stage] for result in stage_results):
+            continue
+        if not stage_results:
+            return pending
+        if all(result in FAILED[stage] for result in stage_results):
+            return failed
+        return running
+    return SampleInfo.DONE
+
+
+def refresh_stages(project_ids):
+    """
+    重新推算项目下全部样品的流程状态
+    :return: 状态有变化的样品数
+    """
+    project_ids = set(project_ids)
+    if not project_ids:
+        return 0
+    with transaction.atomic():
+        projects = dict((row[0], row[1:]) for row in Project.objects.filter(pk__in=project_ids).values_list(
+            'pk', 'is_confirm', 'is_ext', 'is_qc', 'is_lib'))
+        results = defaultdict(lambda: defaultdict(list))
+        for stage, model, _, _, _ in STAGES:
+            for sample, result in model.objects.filter(sample__project__in=project_ids)\
+                    .values_list('sample', 'result'):
+                results[sample][stage].append(result)
+        changed = defaultdict(list)
+        for pk, project, check, stage in SampleInfo.objects.filter(project__in=project_ids)\
+                .values_list('pk', 'project', 'check', 'stage'):
+            new_stage = sample_stage(projects[project], check, results.get(pk, {}))
+            if new_stage != stage:
+                changed[new_stage].append(pk)
+        for stage, pks in changed.items():
+            for i in range(0, len(pks), 500):
+                SampleInfo.objects.filter(pk__in=pks[i:i + 500]).update(stage=stage)
+    return sum(len(pks) for pks in changed.values())
+
+
+def rebuild_stages(batch_size=500):
+    """
+    按项目分批重新推算全部样品的流程状态
+    :return: 状态有变化的样品数
+    """
+    project_ids = list(Project.objects.order_by('pk').values_list('pk', flat=True))
+    return sum(refresh_stages(project_ids[i:i + batch_size]) for i in range(0, len(project_ids), batch_size))
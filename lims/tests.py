@@ -1,3 +1,317 @@
-from django.test import TestCase
+import csv
+import io
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import skipUnless
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from BMS.export import AdminExporter
+from jobs.models import Job, job_storage
+from jobs.runner import work
+from mm.models import Contract
+from pm.models import Project
+from .importer import clean_row, import_samples
+from .models import SampleInfo, ExtTask, QcTask, LibTask, StageCapacity, ScheduleVersion
+from .scheduler import build_plan, schedule, stage_plan
 
-# Create your tests here.
+
+class ChangeListQueryCountTest(TestCase):
+    """
+    列表页查询数不随行数增长
+    """
+    urls = ['/lims/sampleinfo/', '/lims/exttask/', '/lims/qctask/', '/lims/libtask/']
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.force_login(self.user)
+        self.contract = Contract.objects.create(contract_number='C001', name='合同', type=1, salesman=self.user,
+                                                price=1, range=1, fis_amount=100, fin_amount=100)
+        self.project_num = 0
+
+    def add_samples(self, num):
+        # 每个样品属于不同项目，使逐行查询能被发现
+        for i in range(num):
+            self.project_num += 1
+            project = Project.objects.create(contract=self.contract, customer='客户', name='项目%s' % self.project_num,
+                                             service_type='16S', data_amount='1', is_ext=True, is_qc=True,
+                                             is_lib=True, ext_cycle=1, ext_task_cycle=1, qc_cycle=1, qc_task_cycle=1,
+                                             lib_cycle=1, lib_task_cycle=1, seq_cycle=1, ana_cycle=1,
+                                             is_confirm=True)
+            sample = SampleInfo.objects.create(project=project, type='DNA', species='人', name='S%s' % i, volume=1,
+                                               concentration=1, receive_date=date(2017, 1, 3), check=True)
+            ExtTask.objects.create(sample=sample, sub_date=date(2017, 1, 4), date=date(2017, 1, 5), result=True,
+                                   staff=self.user)
+            QcTask.objects.create(sample=sample, sub_date=date(2017, 1, 5), staff=self.user)
+            LibTask.objects.create(sample=sample, sub_date=date(2017, 1, 6))
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_query_count_is_constant(self):
+        self.add_samples(2)
+        counts = dict((url, self.count_queries(url)) for url in self.urls)
+        self.add_samples(20)
+        for url in self.urls:
+            self.assertEqual(self.count_queries(url), counts[url], url)
+
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+class ImporterTest(TestCase):
+    """
+    样品表流式导入：新增、更新、跳过未变动的样品，文件内重复和无效的行计为错误；大文件交给后台任务
+    """
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        contract = Contract.objects.create(contract_number='C001', name='合同', type=1, salesman=self.user, price=1,
+                                           range=1, fis_amount=1, fin_amount=0)
+        self.project = Project.objects.create(
+            contract=contract, customer='客户', name='项目', service_type='16S', data_amount='1G', is_ext=True,
+            is_qc=True, is_lib=True, ext_cycle=1, ext_task_cycle=1, qc_cycle=1, qc_task_cycle=1, lib_cycle=1,
+            lib_task_cycle=1, seq_cycle=1, ana_cycle=1)
+        for name in ('S0', 'S1'):
+            SampleInfo.objects.create(project=self.project, type='DNA', species='人', name=name, volume=1,
+                                      concentration=1, receive_date=date(2017, 5, 2))
+        self.client.force_login(self.user)
+
+    def csv_file(self):
+        pk = self.project.pk
+        lines = ['项目,样品类型,物种,样品名称,体积uL,浓度ng/uL,收样日期',
+                 '%s,DNA,人,S0,1,1,2017-05-02' % pk,
+                 '%s,RNA,人,S1,2.5,1,2017-05-02' % pk,
+                 '%s,DNA,人,S2,1.1,0.3,2017-05-02' % pk,
+                 '%s,DNA,人,S2,1,1,2017-05-02' % pk,
+                 '999,DNA,人,S3,1,1,2017-05-02',
+                 '%s,DNA,人,S4,abc,1,2017-05-02' % pk,
+                 '%s,DNA,人,S5,1,1,' % pk]
+        return SimpleUploadedFile('samples.csv', '\n'.join(lines).encode('utf-8-sig'))
+
+    def samples(self):
+        return list(SampleInfo.objects.order_by('name').values_list('name', 'type', 'volume', 'concentration'))
+
+    def test_csv(self):
+        response = self.client.post('/lims/sampleinfo/stream_import/', {'import_file': self.csv_file()})
+        importer = response.context['importer']
+        self.assertEqual(importer.counts, {'new': 1, 'update': 1, 'skip': 1, 'error': 4})
+        self.assertEqual([line for line, _ in importer.errors], [5, 6, 7, 8])
+        self.assertIn('重复', importer.errors[0][1])
+        self.assertIn('项目不存在', importer.errors[1][1])
+        self.assertEqual(self.samples(), [('S0', 'DNA', 1, 1), ('S1', 'RNA', Decimal('2.5'), 1),
+                                          ('S2', 'DNA', Decimal('1.1'), Decimal('0.3'))])
+
+    def test_dry_run(self):
+        response = self.client.post('/lims/sampleinfo/stream_import/', {'import_file': self.csv_file(),
+                                                                         'dry_run': 'on'})
+        self.assertEqual(response.context['importer'].counts['new'], 1)
+        self.assertEqual(SampleInfo.objects.count(), 2)
+
+    def test_float(self):
+        # XLSX数值单元格读出为float
+        data = clean_row({'project': self.project.pk, 'type': 'DNA', 'species': '人', 'name': 'S', 'volume': 1.1,
+                          'concentration': 0.1 + 0.2, 'receive_date': datetime(2017, 5, 2)})
+        self.assertEqual((data['volume'], data['concentration'], data['receive_date']),
+                         (Decimal('1.100'), Decimal('0.300'), date(2017, 5, 2)))
+
+    @skipUnless(openpyxl, '需要openpyxl')
+    def test_xlsx(self):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['project', 'type', 'species', 'name', 'volume', 'concentration', 'receive_date'])
+        sheet.append([self.project.pk, 'RNA', '人', 'S1', 1.1, 0.3, datetime(2017, 5, 2)])
+        sheet.append([self.project.pk, 'DNA', '人', 'S2', 12.345, 2, datetime(2017, 5, 2)])
+        sheet.append([None] * 7)
+        f = io.BytesIO()
+        workbook.save(f)
+        f.seek(0)
+        importer = import_samples(f, 'samples.xlsx')
+        self.assertEqual(importer.counts, {'new': 1, 'update': 1, 'skip': 0, 'error': 0})
+        self.assertEqual(self.samples()[1:], [('S1', 'RNA', Decimal('1.1'), Decimal('0.3')),
+                                              ('S2', 'DNA', Decimal('12.345'), 2)])
+
+    @override_settings(JOBS_IMPORT_ASYNC_SIZE=10)
+    def test_job(self):
+        # 超过大小的文件保存后提交后台任务，请求内不导入
+        response = self.client.post('/lims/sampleinfo/stream_import/', {'import_file': self.csv_file()})
+        self.assertRedirects(response, '/lims/sampleinfo/', fetch_redirect_response=False)
+        self.assertEqual(SampleInfo.objects.count(), 2)
+        job = Job.objects.get()
+        path = job.get_kwargs()['path']
+        self.assertEqual((job.name, job.user, job_storage.exists(path)), ('lims.import_samples', self.user, True))
+        work(once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertIn('新增 1，更新 1，未变动 1，错误 4', job.result)
+        self.assertEqual(SampleInfo.objects.count(), 3)
+        self.assertFalse(job_storage.exists(path))
+
+
+class ExportTest(TestCase):
+    """
+    列表流式导出：按主键分块读取，各行与列表所选记录一一对应，计算列按块计算
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        contract = Contract.objects.create(contract_number='C001', name='合同', type=1, salesman=self.user, price=1,
+                                           range=1, fis_amount=0, fin_amount=0)
+        project = Project.objects.create(
+            contract=contract, customer='客户', name='项目', service_type='16S', data_amount='1G', is_ext=True,
+            is_qc=True, is_lib=True, ext_cycle=3, ext_task_cycle=1, qc_cycle=1, qc_task_cycle=1, lib_cycle=1,
+            lib_task_cycle=1, seq_cycle=1, ana_cycle=1, is_confirm=True)
+        for i in range(7):
+            sample = SampleInfo.objects.create(project=project, type='DNA', species='人', name='S%s' % i, volume=1,
+                                               concentration=1, receive_date=date(2017, 5, i + 1), check=True)
+            ExtTask.objects.create(sample=sample, sub_date=date(2017, 5, 8), staff=self.user if i % 2 else None,
+                                   date=date(2017, 5, 9) if i % 3 == 0 else None, result=True if i % 3 == 0 else None)
+        self.client.force_login(self.user)
+
+    def expected(self, queryset):
+        # 按主键顺序逐行读取
+        return [[obj.sample.project.contract.contract_number, obj.sample.project.name, obj.sample.name,
+                 obj.sample.receive_date, obj.date or '', '是' if obj.result else '']
+                for obj in queryset.select_related('sample__project__contract').order_by('pk')]
+
+    def columns(self, exporter, rows):
+        indexes = [exporter.fields.index(name) for name in ('contract', 'project', 'sample_name', 'receive_date',
+                                                            'date', 'result')]
+        return [[row[i] for i in indexes] for row in rows]
+
+    def exporter(self, chunk_size):
+        request = RequestFactory().get('/lims/exttask/')
+        request.user = self.user
+        return AdminExporter(admin.site._registry[ExtTask], request, ExtTask.objects.all(), chunk_size=chunk_size)
+
+    def test_rows(self):
+        exporter = self.exporter(3)
+        rows = list(exporter.rows())
+        self.assertEqual(self.columns(exporter, rows), self.expected(ExtTask.objects.all()))
+        self.assertEqual(rows, list(self.exporter(500).rows()))
+        # 按所选主键分块导出
+        ids = list(ExtTask.objects.filter(result=None).order_by('pk').values_list('pk', flat=True))
+        self.assertEqual(self.columns(exporter, exporter.rows(ids)),
+                         self.expected(ExtTask.objects.filter(pk__in=ids)))
+
+    def test_csv(self):
+        ids = list(ExtTask.objects.order_by('pk').values_list('pk', flat=True))[1:6]
+        response = self.client.post('/lims/exttask/', {'action': 'export_csv', '_selected_action': ids})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        exporter = self.exporter(3)
+        self.assertEqual(lines[0], exporter.headers())
+        self.assertEqual(lines[1:], [[str(value) for value in row] for row in exporter.rows(ids)])
+        self.assertEqual([row[2] for row in lines[1:]], ['S1', 'S2', 'S3', 'S4', 'S5'])
+
+    @skipUnless(openpyxl, '需要openpyxl')
+    def test_xlsx(self):
+        response = self.client.post('/lims/exttask/', {'action': 'export_xlsx', 'select_across': '1', 'index': '0',
+                                                        '_selected_action': [ExtTask.objects.first().pk]})
+        sheet = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True).active
+        rows = [[cell.value for cell in row] for row in sheet.iter_rows()]
+        exporter = self.exporter(3)
+        self.assertEqual(rows[0], exporter.headers())
+        self.assertEqual(len(rows), ExtTask.objects.count() + 1)
+        self.assertEqual([row[2] for row in rows[1:]], ['S%s' % i for i in range(7)])
+
+
+class SchedulerTest(TestCase):
+    """
+    实验排期：按截止日排入产能，每工作日不超过产能，任务出结果后重新排期
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('lab')
+        contract = Contract.objects.create(contract_number='C001', name='合同', type=1, salesman=self.user, price=1,
+                                           range=1, fis_amount=0, fin_amount=0)
+        self.projects = [Project.objects.create(
+            contract=contract, customer='客户', name='项目%s' % i, service_type='16S', data_amount='1', is_ext=True,
+            is_qc=True, is_lib=True, ext_cycle=cycle, ext_task_cycle=1, qc_cycle=1, qc_task_cycle=1, lib_cycle=1,
+            lib_task_cycle=1, seq_cycle=1, ana_cycle=1, is_confirm=True) for i, cycle in enumerate((10, 2))]
+        # 2017-05-08为周一
+        self.today = date(2017, 5, 8)
+
+    def test_schedule(self):
+        tasks = [(1, date(2017, 5, 20), date(2017, 5, 1), None), (2, date(2017, 5, 10), date(2017, 5, 1), None),
+                 (3, date(2017, 5, 12), date(2017, 5, 1), 7), (4, date(2017, 5, 11), date(2017, 5, 10), None)]
+        # 通用产能每天1个，实验员7每天1个：任务3只排入实验员7，其余按截止日排入最早有空的产能
+        # 任务4下单日在今天之后，不占用实验员7当天的余量
+        planned = schedule(tasks, [(None, 1), (7, 1)], self.today)
+        self.assertEqual(planned, {
+            2: (date(2017, 5, 8), None),
+            4: (date(2017, 5, 10), 7),
+            3: (date(2017, 5, 8), 7),
+            1: (date(2017, 5, 9), None),
+        })
+
+    def test_other_process(self):
+        # 其他进程的写入不清除本进程的缓存，按数据库中的排期版本重新排期
+        sample = SampleInfo.objects.create(project=self.projects[0], type='DNA', species='人', name='S', volume=1,
+                                           concentration=1, receive_date=date(2017, 5, 2), check=True)
+        self.assertEqual(stage_plan('ext', self.today)['tasks'], {})
+        ExtTask.objects.bulk_create([ExtTask(sample=sample, sub_date=date(2017, 5, 5))])
+        self.assertEqual(stage_plan('ext', self.today)['tasks'], {})
+        ScheduleVersion.objects.filter(stage='ext').update(version=F('version') + 1)
+        self.assertEqual(len(stage_plan('ext', self.today)['tasks']), 1)
+
+    def test_stage_plan(self):
+        StageCapacity.objects.create(stage='ext', capacity=2)
+        tasks = []
+        for i, project in enumerate(self.projects * 2):
+            sample = SampleInfo.objects.create(project=project, type='DNA', species='人', name='S%s' % i, volume=1,
+                                               concentration=1, receive_date=date(2017, 5, 2), check=True)
+            tasks.append(ExtTask.objects.create(sample=sample, sub_date=date(2017, 5, 5)))
+        plan = stage_plan('ext', self.today)
+        # 项目1周期短先排
+        self.assertEqual([plan['tasks'][task.pk][0] for task in tasks],
+                         [date(2017, 5, 9), date(2017, 5, 8), date(2017, 5, 9), date(2017, 5, 8)])
+        self.assertEqual(plan['projects'], {self.projects[0].pk: date(2017, 5, 9),
+                                            self.projects[1].pk: date(2017, 5, 8)})
+        # 缓存命中时只查询排期版本
+        with self.assertNumQueries(1):
+            stage_plan('ext', self.today)
+        # 出结果后只重排提取阶段
+        stage_plan('qc', self.today)
+        tasks[1].result = True
+        tasks[1].save()
+        with self.assertNumQueries(1):
+            stage_plan('qc', self.today)
+        plan = stage_plan('ext', self.today)
+        self.assertNotIn(tasks[1].pk, plan['tasks'])
+        self.assertEqual(plan['tasks'][tasks[0].pk][0], date(2017, 5, 8))
+
+    def test_single_change(self):
+        # 单个任务变动后整个阶段按新版本重排一次：查询版本、待处理任务和产能，查询数与任务数无关
+        StageCapacity.objects.create(stage='ext', capacity=1)
+        tasks = []
+        for i in range(6):
+            sample = SampleInfo.objects.create(project=self.projects[i % 2], type='DNA', species='人', name='S%s' % i,
+                                               volume=1, concentration=1, receive_date=date(2017, 5, 2), check=True)
+            tasks.append(ExtTask.objects.create(sample=sample, sub_date=date(2017, 5, 5)))
+        before = stage_plan('ext', self.today)
+        # 项目1的任务1、3、5截止日早，先排
+        self.assertEqual([before['tasks'][task.pk][0].day for task in tasks], [11, 8, 12, 9, 15, 10])
+        tasks[3].result = True
+        tasks[3].save()
+        with self.assertNumQueries(3):
+            plan = stage_plan('ext', self.today)
+        self.assertEqual(plan['version'], before['version'] + 1)
+        self.assertEqual(set(plan['tasks']), set(before['tasks']) - {tasks[3].pk})
+        self.assertEqual(plan, build_plan('ext', ExtTask, self.today, plan['version']))
+        # 排在完成任务之前的任务不变，之后的依次提前
+        self.assertEqual([plan['tasks'][task.pk][0].day for i, task in enumerate(tasks) if i != 3],
+                         [10, 8, 11, 12, 9])
+        with self.assertNumQueries(1):
+            self.assertEqual(stage_plan('ext', self.today), plan)
@@ -1,7 +1,5 @@
 from django.contrib import admin
 from .models import Invoice, Contract
-from fm.models import Invoice as fm_Invoice
-from fm.models import Bill
 from django.contrib import messages
 from datetime import datetime
 from django.utils.html import format_html
@@ -9,24 +7,27 @@ from django import forms
 from django.forms.models import BaseInlineFormSet
 from daterange_filter.filter import DateRangeFilter
 from django.contrib.admin.views.main import ChangeList
-from django.db.models import Sum
-from django.contrib.auth.models import User
+from django.db.models import Max, Case, When, F, DecimalField, DateField
+from jobs.actions import run_or_enqueue
+from .filters import SalesmanListFilter
+from fm.models import Ledger
 
 
 class InvoiceForm(forms.ModelForm):
-    # 开票金额与合同对应款期额校验 #22
+    # 开票金额与合同对应款期额校验 #22，已开票金额读取应收台账
     def clean_amount(self):
-        obj_contract = Contract.objects.filter(contract_number=self.cleaned_data['contract']).first()
-        if self.cleaned_data['period'] == 'FIS':
-            q = Invoice.objects.filter(contract=self.cleaned_data['contract']).filter(period='FIS')\
-                .aggregate(Sum('amount'))
-            if q['amount__sum'] + self.cleaned_data['amount'] > obj_contract.fis_amount:
-                raise forms.ValidationError('首款已开票金额%s元，超出可开票总额' % q['amount__sum'])
-        if self.cleaned_data['period'] == 'FIN':
-            q = Invoice.objects.filter(contract=self.cleaned_data['contract']).filter(period='FIN')\
-                .aggregate(Sum('amount'))
-            if q['amount__sum'] + self.cleaned_data['amount'] > obj_contract.fin_amount:
-                raise forms.ValidationError('尾款已开票金额%s元，超出可开票总额' % q['amount__sum'])
+        contract = self.cleaned_data.get('contract')
+        period = self.cleaned_data.get('period')
+        if not contract or period not in ('FIS', 'FIN'):
+            return self.cleaned_data['amount']
+        invoiced = Ledger.objects.filter(contract=contract, period=period).values_list('invoiced', flat=True)\
+            .first() or 0
+        if self.instance.pk and (self.instance.contract_id, self.instance.period) == (contract.pk, period):
+            # 修改开票申请时不计入修改前的金额
+            invoiced -= self.instance.amount
+        if invoiced + self.cleaned_data['amount'] > getattr(contract, '%s_amount' % period.lower()):
+            raise forms.ValidationError('%s已开票金额%s元，超出可开票总额' % (
+                dict(Invoice.PERIOD_CHOICES)[period], invoiced))
         return self.cleaned_data['amount']
 
 
@@ -44,19 +45,7 @@ class InvoiceAdmin(admin.ModelAdmin):
         """
         批量提交开票申请
         """
-        i = ''
-        n = 0
-        for obj in queryset:
-            if not obj.submit:
-                i = fm_Invoice.objects.create(invoice=obj)
-                obj.submit = True
-                obj.save()
-            else:
-                n += 1
-        if i:
-            self.message_user(request, '%s 个开票申请已成功提交到财务' % i)
-        if n:
-            self.message_user(request, '%s 个开票申请已提交过，不能再次提交' % n, level=messages.ERROR)
+        run_or_enqueue(self, request, 'mm.submit_invoices', queryset)
     make_invoice_submit.short_description = '提交开票申请到财务'
 
 
@@ -84,36 +73,27 @@ class InvoiceInline(admin.StackedInline):
     fields = ('title', 'period', 'amount', 'note')
 
 
+def annotate_income(qs):
+    # 各款期到账合计与最后到账日，取自应收台账（每个合同每个款期一行）
+    annotations = {}
+    for period in ('FIS', 'FIN'):
+        annotations['%s_income_sum' % period.lower()] = Max(Case(
+            When(ledger__period=period, then=F('ledger__received')),
+            output_field=DecimalField(max_digits=12, decimal_places=2)))
+        annotations['%s_income_date' % period.lower()] = Max(Case(
+            When(ledger__period=period, then=F('ledger__last_income_date')),
+            output_field=DateField()))
+    return qs.annotate(**annotations)
+
+
 class ContractChangeList(ChangeList):
+    def get_queryset(self, request):
+        # 到账信息随列表查询一并聚合
+        return annotate_income(super(ContractChangeList, self).get_queryset(request))
+
     def get_results(self, *args, **kwargs):
         super(ContractChangeList, self).get_results(*args, **kwargs)
-        fis_amount = self.result_list.aggregate(fis_sum=Sum('fis_amount'))
-        fin_amount = self.result_list.aggregate(fin_sum=Sum('fin_amount'))
-        self.amount = (fis_amount['fis_sum'] or 0) + (fin_amount['fin_sum'] or 0)
-
-
-class SaleListFilter(admin.SimpleListFilter):
-    title = '业务员'
-    parameter_name = 'Sale'
-
-    def lookups(self, request, model_admin):
-        qs_sale = User.objects.filter(groups__id=3)
-        qs_company = User.objects.filter(groups__id=6)
-        value = ['sale'] + list(qs_sale.values_list('username', flat=True)) + \
-                ['company'] + list(qs_company.values_list('username', flat=True))
-        label = ['销售'] + ['——' + i.last_name + i.first_name for i in qs_sale] + \
-                ['公司'] + ['——' + i.last_name + i.first_name for i in qs_company]
-        return tuple(zip(value, label))
-
-    def queryset(self, request, queryset):
-        if self.value() == 'sale':
-            return queryset.filter(salesman__in=list(User.objects.filter(groups__id=3)))
-        if self.value() == 'company':
-            return queryset.filter(salesman__in=list(User.objects.filter(groups__id=6)))
-        qs = User.objects.filter(groups__in=[3, 6])
-        for i in qs:
-            if self.value() == i.username:
-                return queryset.filter(salesman=i)
+        self.amount = sum(obj.fis_amount + obj.fin_amount for obj in self.result_list)
 
 
 class ContractAdmin(admin.ModelAdmin):
@@ -138,6 +118,7 @@ class ContractAdmin(admin.ModelAdmin):
         })
     )
     raw_id_fields = ['salesman']
+    list_select_related = ['salesman']
     search_fields = ['contract_number', 'name', 'tracking_number']
     actions = ['make_receive']
 
@@ -156,46 +137,38 @@ class ContractAdmin(admin.ModelAdmin):
     total.short_description = '总款'
 
     def fis_income(self, obj):
-        # 首款到账信息显示
-        q_income = Bill.objects.filter(invoice__invoice__contract=obj).filter(invoice__invoice__period='FIS')
-        income = q_income.aggregate(total_income=Sum('income'))['total_income'] or 0
+        # 首款到账信息显示，到款日由进账登记时维护
+        if not hasattr(obj, 'fis_income_sum'):
+            obj = annotate_income(Contract.objects.filter(pk=obj.pk)).get()
+        income = obj.fis_income_sum or 0
         if income:
-            date = q_income.last().date
             amount = obj.fis_amount
             t = amount - income
             if t > 0:
                 return format_html('<span style="color:{};">{}</span>', 'red', '%s / %s' % (income, amount))
             else:
-                obj.fis_date = date
-                obj.save()
-                return '%s/%s' % (income, date)
+                return '%s/%s' % (income, obj.fis_income_date)
         return '0/%s' % obj.fis_amount
     fis_income.short_description = '首款'
 
     def fin_income(self, obj):
-        # 尾款到账信息显示
-        q_income = Bill.objects.filter(invoice__invoice__contract=obj).filter(invoice__invoice__period='FIN')
-        income = q_income.aggregate(total_income=Sum('income'))['total_income'] or 0
+        # 尾款到账信息显示，到款日由进账登记时维护
+        if not hasattr(obj, 'fin_income_sum'):
+            obj = annotate_income(Contract.objects.filter(pk=obj.pk)).get()
+        income = obj.fin_income_sum or 0
         if income:
-            date = q_income.last().date
             amount = obj.fin_amount
             t = amount - income
             if t > 0:
                 return format_html('<span style="color:{};">{}</span>', 'red', '%s / %s' % (income, amount))
             else:
-                obj.fin_date = date
-                obj.save()
-                return '%s/%s' % (income, date)
+                return '%s/%s' % (income, obj.fin_income_date)
         return '0/%s' % obj.fin_amount
     fin_income.short_description = '尾款'
 
     def make_receive(self, request, queryset):
         # 批量记录合同回寄时间戳
-        rows_updated = queryset.update(receive_date=datetime.now())
-        if rows_updated:
-            self.message_user(request, '%s 个合同寄到登记已完成' % rows_updated)
-        else:
-            self.message_user(request, '%s 未能成功登记' % rows_updated, level=messages.ERROR)
+        run_or_enqueue(self, request, 'mm.receive_contracts', queryset)
     make_receive.short_description = '登记所选合同已收到'
 
     def get_changelist(self, request):
@@ -233,7 +206,7 @@ class ContractAdmin(admin.ModelAdmin):
     def get_list_filter(self, request):
         if request.user.is_superuser or request.user.has_perm('mm.add_contract'):
             return [
-                SaleListFilter,
+                SalesmanListFilter,
                 'type',
                 ('send_date', DateRangeFilter),
             ]
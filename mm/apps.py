@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_save, post_delete
 
 
 class MmConfig(AppConfig):
     name = 'mm'
     verbose_name = '商务管理系统'
+
+    def ready(self):
+        from django.contrib.auth.models import Group, User
+        from .filters import clear_salesman_roster
+        # 业务员名单缓存随用户组成员、用户姓名和用户组变动失效
+        m2m_changed.connect(clear_salesman_roster, sender=User.groups.through, dispatch_uid='mm_roster_groups')
+        for model in (User, Group):
+            post_save.connect(clear_salesman_roster, sender=model, dispatch_uid='mm_roster_save_%s' % model.__name__)
+            post_delete.connect(clear_salesman_roster, sender=model,
+                                dispatch_uid='mm_roster_delete_%s' % model.__name__)
@@ -0,0 +1,62 @@
+"""
+按业务员筛选
+
+销售、公司两类业务员名单按用户组名读取（见settings.SALESMAN_GROUPS），一次查询后缓存；
+用户组成员、用户姓名或用户组变动时清除缓存，另设缓存时间，多进程部署时其他进程的缓存也会按时过期。
+"""
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache
+
+ROSTER_CACHE_KEY = 'mm:salesman_roster'
+
+
+def salesman_roster():
+    """
+    :return: [(参数值, 名称, [(用户ID, 用户名, 姓名)])]，按SALESMAN_GROUPS的顺序
+    """
+    roster = cache.get(ROSTER_CACHE_KEY)
+    if roster is None:
+        from django.contrib.auth.models import User
+        groups = settings.SALESMAN_GROUPS
+        members = dict((group_name, []) for _, _, group_name in groups)
+        for pk, username, last_name, first_name, group_name in User.objects.filter(
+                groups__name__in=list(members)).order_by('pk').values_list(
+                'pk', 'username', 'last_name', 'first_name', 'groups__name'):
+            members[group_name].append((pk, username, last_name + first_name))
+        roster = [(value, label, members[group_name]) for value, label, group_name in groups]
+        cache.set(ROSTER_CACHE_KEY, roster, settings.SALESMAN_ROSTER_TIMEOUT)
+    return roster
+
+
+def clear_salesman_roster(**kwargs):
+    cache.delete(ROSTER_CACHE_KEY)
+
+
+class SalesmanListFilter(admin.SimpleListFilter):
+    """
+    业务员筛选，子类以field_path指定业务员外键的路径
+    参数值为组（销售、公司）或业务员用户名
+    """
+    title = '业务员'
+    parameter_name = 'Sale'
+    field_path = 'salesman'
+
+    def lookups(self, request, model_admin):
+        choices = []
+        for value, label, members in salesman_roster():
+            choices.append((value, label))
+            choices += [(username, '——' + name) for _, username, name in members]
+        return choices
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if not value:
+            return None
+        for group_value, _, members in salesman_roster():
+            if value == group_value:
+                return queryset.filter(**{'%s__in' % self.field_path: [pk for pk, _, _ in members]})
+            for pk, username, _ in members:
+                if value == username:
+                    return queryset.filter(**{self.field_path: pk})
+        return None
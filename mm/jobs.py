@@ -0,0 +1,42 @@
+from datetime import datetime
+from django.contrib import messages
+from django.db import transaction
+from fm.models import Invoice as fm_Invoice
+from jobs.registry import register, chunked
+from .models import Invoice, Contract
+
+
+@register('mm.receive_contracts')
+def receive_contracts(job, ids):
+    # 批量记录合同回寄时间戳
+    rows_updated = done = 0
+    now = datetime.now()
+    for part in chunked(ids):
+        rows_updated += Contract.objects.filter(pk__in=part).update(receive_date=now)
+        done += len(part)
+        job.set_progress(done, len(ids))
+    if rows_updated:
+        return [(messages.INFO, '%s 个合同寄到登记已完成' % rows_updated)]
+    return [(messages.ERROR, '%s 未能成功登记' % rows_updated)]
+
+
+@register('mm.submit_invoices')
+def submit_invoices(job, ids):
+    """
+    批量提交开票申请，已提交过的跳过，重试时不会重复提交
+    """
+    submitted = done = 0
+    for part in chunked(ids):
+        with transaction.atomic():
+            # 新建的开票申请submit为空，同样视为未提交
+            pending = list(Invoice.objects.filter(pk__in=part).exclude(submit=True).values_list('pk', flat=True))
+            fm_Invoice.objects.bulk_create([fm_Invoice(invoice_id=pk) for pk in pending])
+            submitted += Invoice.objects.filter(pk__in=pending).update(submit=True)
+        done += len(part)
+        job.set_progress(done, len(ids))
+    result = []
+    if submitted:
+        result.append((messages.INFO, '%s 个开票申请已成功提交到财务' % submitted))
+    if len(ids) - submitted:
+        result.append((messages.ERROR, '%s 个开票申请已提交过，不能再次提交' % (len(ids) - submitted)))
+    return result
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 18:30
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mm', '0010_auto_20170111_1353'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='contract',
+            name='total',
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='contract_file',
+            field=models.FileField(default='', upload_to='uploads/%Y/%m', verbose_name='附件'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='fin_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='尾款额'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='fin_date',
+            field=models.DateField(blank=True, null=True, verbose_name='尾款到款日'),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='fis_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='首款额'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='fis_date',
+            field=models.DateField(blank=True, null=True, verbose_name='首款到款日'),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='type',
+            field=models.IntegerField(choices=[(1, '16S/ITS'), (2, '宏基因组'), (3, '单菌'), (4, '转录组'), (5, '其它')], default=1, verbose_name='类型'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='contract',
+            name='contract_number',
+            field=models.CharField(max_length=15, unique=True, verbose_name='合同号'),
+        ),
+        migrations.AlterField(
+            model_name='contract',
+            name='name',
+            field=models.CharField(max_length=100, verbose_name='合同名'),
+        ),
+        migrations.AlterField(
+            model_name='contract',
+            name='range',
+            field=models.IntegerField(choices=[(1, '高于销售底价'), (2, '总监底价'), (3, '低于总监底价')], verbose_name='价格区间'),
+        ),
+        migrations.AlterField(
+            model_name='contract',
+            name='salesman',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='业务员'),
+        ),
+    ]
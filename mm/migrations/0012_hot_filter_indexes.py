@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 18:30
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mm', '0011_sync_models'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contract',
+            name='fin_date',
+            field=models.DateField(blank=True, db_index=True, null=True, verbose_name='尾款到款日'),
+        ),
+        migrations.AlterField(
+            model_name='contract',
+            name='fis_date',
+            field=models.DateField(blank=True, db_index=True, null=True, verbose_name='首款到款日'),
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='period',
+            field=models.CharField(choices=[('FIS', '首款'), ('FIN', '尾款')], db_index=True, default='FIS', max_length=3, verbose_name='款期'),
+        ),
+        migrations.AlterIndexTogether(
+            name='invoice',
+            index_together=set([('contract', 'period')]),
+        ),
+    ]
@@ -28,9 +28,9 @@ class Contract(models.Model):
         choices=RANGE_CHOICES,
     )
     fis_amount = models.DecimalField('首款额', max_digits=12, decimal_places=2)
-    fis_date = models.DateField('首款到款日', blank=True, null=True)
+    fis_date = models.DateField('首款到款日', blank=True, null=True, db_index=True)
     fin_amount = models.DecimalField('尾款额', max_digits=12, decimal_places=2)
-    fin_date = models.DateField('尾款到款日', blank=True, null=True)
+    fin_date = models.DateField('尾款到款日', blank=True, null=True, db_index=True)
     send_date = models.DateField('合同寄出日', null=True)
     tracking_number = models.CharField('快递单号', max_length=15, blank=True)
     receive_date = models.DateField('合同寄到日', null=True)
@@ -63,12 +63,13 @@ class Invoice(models.Model):
         on_delete=models.CASCADE,
     )
     title = models.CharField('发票抬头', max_length=25)
-    period = models.CharField('款期', max_length=3, choices=PERIOD_CHOICES, default='FIS')
+    period = models.CharField('款期', max_length=3, choices=PERIOD_CHOICES, default='FIS', db_index=True)
     amount = models.DecimalField('开票金额', max_digits=9, decimal_places=2)
     note = models.TextField('备注')
     submit = models.NullBooleanField('提交开票', null=True)
 
     class Meta:
+        index_together = ('contract', 'period')
         verbose_name = '开票申请'
         verbose_name_plural = '开票申请'
 
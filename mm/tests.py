@@ -1,3 +1,138 @@
+from datetime import date
+from decimal import Decimal
+from django.contrib import admin
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.html import format_html
+from fm.models import Invoice as fm_Invoice, Bill
+from .filters import salesman_roster, SalesmanListFilter
+from .models import Contract, Invoice
 
-# Create your tests here.
+
+class SalesmanListFilterTest(TestCase):
+    """
+    业务员名单按用户组名读取并缓存，组成员变动后失效
+    """
+    def setUp(self):
+        cache.clear()
+        self.sale = User.objects.create_user('sale1', first_name='一', last_name='张')
+        self.other = User.objects.create_user('other')
+        Group.objects.create(name='销售').user_set.add(self.sale)
+        Group.objects.create(name='公司')
+        for i, user in enumerate((self.sale, self.other)):
+            Contract.objects.create(contract_number='C%s' % i, name='合同', type=1, salesman=user, price=1, range=1,
+                                    fis_amount=1, fin_amount=1)
+
+    def filter(self, value):
+        list_filter = SalesmanListFilter(None, {'Sale': value}, Contract, None)
+        return list(list_filter.queryset(None, Contract.objects.all()).values_list('salesman__username', flat=True))
+
+    def test_roster(self):
+        self.assertEqual(salesman_roster(), [('sale', '销售', [(self.sale.pk, 'sale1', '张一')]),
+                                             ('company', '公司', [])])
+        with self.assertNumQueries(0):
+            salesman_roster()
+        Group.objects.get(name='公司').user_set.add(self.other)
+        self.assertEqual(salesman_roster()[1][2], [(self.other.pk, 'other', '')])
+
+    def test_queryset(self):
+        self.assertEqual(self.filter('sale'), ['sale1'])
+        self.assertEqual(self.filter('sale1'), ['sale1'])
+        self.assertEqual(self.filter('company'), [])
+
+
+class SubmitInvoicesTest(TestCase):
+    """
+    提交开票申请：新建的申请submit为空，视为未提交；已提交的不再提交
+    """
+    def setUp(self):
+        user = User.objects.create_user('sale')
+        contract = Contract.objects.create(contract_number='C001', name='合同', type=1, salesman=user, price=1,
+                                           range=1, fis_amount=100, fin_amount=50)
+        self.new = Invoice.objects.create(contract=contract, title='抬头', period='FIS', amount=100, note='')
+        self.submitted = Invoice.objects.create(contract=contract, title='抬头', period='FIN', amount=50, note='',
+                                                submit=True)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def submit(self, *invoices):
+        return self.client.post('/mm/invoice/', {'action': 'make_invoice_submit',
+                                                 '_selected_action': [obj.pk for obj in invoices]}, follow=True)
+
+    def test_submit(self):
+        self.assertIsNone(self.new.submit)
+        response = self.submit(self.new, self.submitted)
+        self.new.refresh_from_db()
+        self.assertTrue(self.new.submit)
+        self.assertEqual(list(fm_Invoice.objects.values_list('invoice', flat=True)), [self.new.pk])
+        self.assertEqual([str(message) for message in response.context['messages']],
+                         ['1 个开票申请已成功提交到财务', '1 个开票申请已提交过，不能再次提交'])
+        self.submit(self.new)
+        self.assertEqual(fm_Invoice.objects.count(), 1)
+
+
+class ContractChangeListTest(TestCase):
+    """
+    合同列表页：首款、尾款到账信息随列表查询聚合，查询数与合同数无关，结果与逐行汇总进账一致
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.contract_num = 0
+
+    def add_contracts(self, num):
+        for i in range(num):
+            self.contract_num += 1
+            contract = Contract.objects.create(contract_number='C%03d' % self.contract_num, name='合同', type=1,
+                                               salesman=self.user, price=1, range=1, fis_amount=100, fin_amount=50)
+            # 首款分两张发票，每张到账0至2笔（到齐、部分到账、未到账）；尾款一张发票，逢偶数合同一次到齐
+            for j, (period, amount) in enumerate((('FIS', 60), ('FIS', 40), ('FIN', 50))):
+                invoice = fm_Invoice.objects.create(invoice=Invoice.objects.create(
+                    contract=contract, title='抬头', period=period, amount=amount, note='', submit=True),
+                    invoice_code='F%03d%s' % (self.contract_num, j))
+                bills = self.contract_num % 3 if period == 'FIS' else (self.contract_num + 1) % 2
+                for day in range(bills):
+                    Bill.objects.create(invoice=invoice, income=Decimal(amount) / (2 if period == 'FIS' else 1),
+                                        date=date(2017, 5, 2 + day + j))
+
+    def get(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/mm/contract/')
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def income(self, contract, period):
+        # 原先逐行汇总进账
+        q_income = Bill.objects.filter(invoice__invoice__contract=contract, invoice__invoice__period=period)
+        income = q_income.aggregate(total_income=Sum('income'))['total_income'] or 0
+        amount = contract.fis_amount if period == 'FIS' else contract.fin_amount
+        if not income:
+            return '0/%s' % amount
+        if amount - income > 0:
+            return format_html('<span style="color:{};">{}</span>', 'red', '%s / %s' % (income, amount))
+        return '%s/%s' % (income, q_income.order_by('date').last().date)
+
+    def test_query_count_is_constant(self):
+        self.client.force_login(self.user)
+        self.add_contracts(2)
+        # 首次请求读取并缓存业务员名单
+        self.get()
+        count = self.get()[0]
+        self.add_contracts(10)
+        self.assertEqual(self.get()[0], count)
+
+    def test_values(self):
+        self.client.force_login(self.user)
+        self.add_contracts(6)
+        result_list = self.get()[1].context['cl'].result_list
+        contract_admin = admin.site._registry[Contract]
+        self.assertEqual(len(result_list), 6)
+        for obj in result_list:
+            self.assertEqual(contract_admin.fis_income(obj), self.income(obj, 'FIS'))
+            self.assertEqual(contract_admin.fin_income(obj), self.income(obj, 'FIN'))
+        # 列表页之外逐个读取
+        obj = Contract.objects.get(contract_number='C004')
+        self.assertEqual(contract_admin.fis_income(obj), self.income(obj, 'FIS'))
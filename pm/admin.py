@@ -1,38 +1,30 @@
 from django.contrib import admin
 from .models import Project, QcSubmit, ExtSubmit, LibSubmit
-from lims.models import SampleInfo, QcTask, ExtTask, LibTask
+from lims.models import QcTask, ExtTask, LibTask
 from django import forms
 from datetime import date, timedelta
-from fm.models import Bill
 from mm.models import Contract
-from django.db.models import Sum
 from django.utils.html import format_html
-from django.contrib import messages
-
-
-def add_business_days(from_date, number_of_days):
-    to_date = from_date
-    if number_of_days >= 0:
-        while number_of_days:
-            to_date += timedelta(1)
-            if to_date.weekday() < 5:
-                number_of_days -= 1
-    else:
-        while number_of_days:
-            to_date -= timedelta(1)
-            if to_date.weekday() < 5:
-                number_of_days += 1
-    return to_date
-
-
-def is_period_income(contract, period):
-    income = Bill.objects.filter(invoice__invoice__contract=contract).filter(invoice__invoice__period=period)\
-            .aggregate(total_income=Sum('income'))['total_income'] or 0
-    if period == 'FIS':
-        amount = Contract.objects.filter(contract_number=contract)[0].fis_amount
-    elif period == 'FIN':
-        amount = Contract.objects.filter(contract_number=contract)[0].fin_amount
-    return amount - income
+from django.db.models import Q
+from .status import project_status_map, sample_summary_map
+from BMS.workdays import add_business_days
+from .submit import submit_tasks
+from jobs.actions import run_or_enqueue
+from .pickers import pending_samples, search_samples, SamplePickerWidget
+from BMS.enrichers import RowEnricherMixin
+from django.conf.urls import url
+from django.core.exceptions import PermissionDenied
+from django.core.urlresolvers import reverse
+from django.http import JsonResponse
+from django.template.response import TemplateResponse
+from django.conf import settings
+from .timeline import project_timelines
+from lims.scheduler import project_plan_map
+
+
+def pending_projects(model):
+    # 含未出结果实验任务的项目，作为子查询使用
+    return model.objects.filter(result=None).values('sample__project')
 
 
 class StatusListFilter(admin.SimpleListFilter):
@@ -52,46 +44,31 @@ class StatusListFilter(admin.SimpleListFilter):
         )
 
     def queryset(self, request, queryset):
+        # 各状态均以子查询在数据库中完成筛选，不在Python中展开样品或项目列表
         if self.value() == 'FIS':
             return queryset.filter(contract__fis_date=None)
         if self.value() == 'ENS':
-            projects = []
-            ext_samples = list(set(ExtTask.objects.filter(result=None).values_list('sample__pk', flat=True)))
-            projects += list(set(SampleInfo.objects.filter(id__in=ext_samples).values_list('project__pk', flat=True)))
-
-            qc_samples = list(set(QcTask.objects.filter(result=None).values_list('sample__pk', flat=True)))
-            projects += list(set(SampleInfo.objects.filter(id__in=qc_samples).values_list('project__pk', flat=True)))
-
-            lib_samples = list(set(LibTask.objects.filter(result=None).values_list('sample__pk', flat=True)))
-            projects += list(set(SampleInfo.objects.filter(id__in=lib_samples).values_list('project__pk', flat=True)))
-
-            projects += Project.objects.exclude(seq_start_date=None).filter(seq_end_date=None)\
-                .values_list('pk', flat=True)
-            projects += Project.objects.exclude(ana_start_date=None).filter(ana_end_date=None)\
-                .values_list('pk', flat=True)
-
-            projects += Project.objects.exclude(ana_start_date=None).exclude(ana_end_date=None)\
-                .filter(contract__fin_date=None).values_list('pk', flat=True)
-            print(projects)
-            return queryset.exclude(contract__fis_date=None).exclude(id__in=projects)
+            return queryset.exclude(contract__fis_date=None).exclude(
+                Q(id__in=pending_projects(ExtTask)) |
+                Q(id__in=pending_projects(QcTask)) |
+                Q(id__in=pending_projects(LibTask)) |
+                Q(seq_start_date__isnull=False, seq_end_date=None) |
+                Q(ana_start_date__isnull=False, ana_end_date=None) |
+                Q(ana_start_date__isnull=False, ana_end_date__isnull=False, contract__fin_date=None)
+            )
         if self.value() == 'EXT':
-            samples = list(set(ExtTask.objects.filter(result=None).values_list('sample__pk', flat=True)))
-            projects = list(set(SampleInfo.objects.filter(id__in=samples).values_list('project__pk', flat=True)))
-            return queryset.filter(id__in=projects)
+            return queryset.filter(id__in=pending_projects(ExtTask))
         if self.value() == 'QC':
-            samples = list(set(QcTask.objects.filter(result=None).values_list('sample__pk', flat=True)))
-            projects = list(set(SampleInfo.objects.filter(id__in=samples).values_list('project__pk', flat=True)))
-            return queryset.filter(id__in=projects)
+            return queryset.filter(id__in=pending_projects(QcTask))
         if self.value() == 'LIB':
-            samples = list(set(LibTask.objects.filter(result=None).values_list('sample__pk', flat=True)))
-            projects = list(set(SampleInfo.objects.filter(id__in=samples).values_list('project__pk', flat=True)))
-            return queryset.filter(id__in=projects)
+            return queryset.filter(id__in=pending_projects(LibTask))
         if self.value() == 'SEQ':
-            return queryset.exclude(seq_start_date=None).filter(seq_end_date=None)
+            return queryset.filter(seq_start_date__isnull=False, seq_end_date=None)
         if self.value() == 'ANA':
-            return queryset.exclude(ana_start_date=None).filter(ana_end_date=None)
+            return queryset.filter(ana_start_date__isnull=False, ana_end_date=None)
         if self.value() == 'FIN':
-            return queryset.exclude(ana_start_date=None).exclude(ana_end_date=None).filter(contract__fin_date=None)
+            return queryset.filter(ana_start_date__isnull=False, ana_end_date__isnull=False,
+                                   contract__fin_date=None)
 
 
 class ProjectForm(forms.ModelForm):
@@ -167,11 +144,11 @@ class ProjectForm(forms.ModelForm):
 #                 raise forms.ValidationError('未收到样品的项目无法确认启动')
 
 
-class ProjectAdmin(admin.ModelAdmin):
+class ProjectAdmin(RowEnricherMixin, admin.ModelAdmin):
     form = ProjectForm
     list_display = ('id', 'contract_name', 'is_confirm', 'status', 'sample_num', 'receive_date',
-                    'contract_node', 'ext_status', 'qc_status', 'lib_status', 'seq_status', 'ana_status',
-                    'report_sub', 'result_sub', 'data_sub')
+                    'contract_node', 'ext_status', 'qc_status', 'lib_status', 'lab_projected', 'seq_status',
+                    'ana_status', 'report_sub', 'result_sub', 'data_sub')
     # list_editable = ['is_confirm']
     list_filter = [StatusListFilter]
     fieldsets = (
@@ -195,38 +172,36 @@ class ProjectAdmin(admin.ModelAdmin):
     readonly_fields = ['contract_name']
     raw_id_fields = ['contract']
     actions = ['make_confirm']
+    list_select_related = ['contract', 'progress']
+    change_list_template = 'admin/pm/project/change_list.html'
+    row_enrichers = [('status', 'status_map'), ('samples', 'sample_map'), ('projected', 'projected_map')]
+
+    def status_map(self, objs):
+        return project_status_map(objs)
+
+    def sample_map(self, objs):
+        samples = sample_summary_map([obj.pk for obj in objs])
+        return dict((obj.pk, samples.get(obj.pk, (0, None))) for obj in objs)
+
+    def projected_map(self, objs):
+        return project_plan_map([obj.pk for obj in objs])
 
     def contract_name(self, obj):
         return obj.contract.name
     contract_name.short_description = '项目名称'
 
     def status(self, obj):
-        if is_period_income(obj.contract, 'FIS') > 0:
-            return '待首款'
-        if obj.ana_end_date and is_period_income(obj.contract, 'FIN') > 0:
-            return '待尾款'
-        if obj.ana_start_date and not obj.ana_end_date:
-            return '分析中'
-        if obj.seq_start_date and not obj.seq_end_date:
-            return '测序中'
-        if LibTask.objects.filter(sample__project=obj).filter(result=None).count():
-            return '建库中'
-        if QcTask.objects.filter(sample__project=obj).filter(result=None).count():
-            return '质检中'
-        if ExtTask.objects.filter(sample__project=obj).filter(result=None).count():
-            return '提取中'
-        if is_period_income(obj.contract, 'FIS') == 0:
-            return '待处理'
+        return self.row_value(obj, 'status')['status']
     status.short_description = '状态'
 
     def sample_num(self, obj):
-        return SampleInfo.objects.filter(project=obj).count()
+        return self.row_value(obj, 'samples')[0]
     sample_num.short_description = '收样数'
 
     def receive_date(self, obj):
-        qs_sample = SampleInfo.objects.filter(project=obj)
-        if qs_sample:
-            return qs_sample.last().receive_date.strftime('%Y%m%d')
+        receive_date = self.row_value(obj, 'samples')[1]
+        if receive_date:
+            return receive_date.strftime('%Y%m%d')
     receive_date.short_description = '收样时间'
 
     def contract_node(self, obj):
@@ -258,11 +233,8 @@ class ProjectAdmin(admin.ModelAdmin):
     def ext_status(self, obj):
         if not obj.due_date or not obj.is_ext:
             return '-'
-        total = ExtTask.objects.filter(sample__project=obj).count()
-        done = ExtTask.objects.filter(sample__project=obj).exclude(result=None).count()
-        if done != total or not total:
-            obj.ext_date = None
-            obj.save()
+        if not obj.ext_date:
+            done, total, _ = self.row_value(obj, 'status')['ext']
             left = (obj.due_date - timedelta(obj.ana_cycle + obj.seq_cycle + obj.lib_cycle + obj.qc_cycle) -
                     date.today()).days
             if left >= 0:
@@ -270,8 +242,6 @@ class ProjectAdmin(admin.ModelAdmin):
             else:
                 return format_html('<span style="color:{};">{}</span>', 'red', '%s/%s-延%s天' % (done, total, -left))
         else:
-            obj.ext_date = ExtTask.objects.filter(sample__project=obj).order_by('-date').first().date
-            obj.save()
             left = (obj.due_date - timedelta(obj.ana_cycle + obj.seq_cycle + obj.lib_cycle + obj.qc_cycle) -
                     obj.ext_date).days
             if left >= 0:
@@ -284,19 +254,14 @@ class ProjectAdmin(admin.ModelAdmin):
     def qc_status(self, obj):
         if not obj.due_date or not obj.is_qc:
             return '-'
-        total = QcTask.objects.filter(sample__project=obj).count()
-        done = QcTask.objects.filter(sample__project=obj).exclude(result=None).count()
-        if done != total or not total:
-            obj.qc_date = None
-            obj.save()
+        if not obj.qc_date:
+            done, total, _ = self.row_value(obj, 'status')['qc']
             left = (obj.due_date - timedelta(obj.ana_cycle + obj.seq_cycle + obj.lib_cycle) - date.today()).days
             if left >= 0:
                 return '%s/%s-余%s天' % (done, total, left)
             else:
                 return format_html('<span style="color:{};">{}</span>', 'red', '%s/%s-延%s天' % (done, total, -left))
         else:
-            obj.qc_date = QcTask.objects.filter(sample__project=obj).order_by('-date').first().date
-            obj.save()
             left = (obj.due_date - timedelta(obj.ana_cycle + obj.seq_cycle + obj.lib_cycle) - obj.qc_date).days
             if left >= 0:
                 return '%s-提前%s天' % (obj.qc_date.strftime('%Y%m%d'), left)
@@ -307,19 +272,14 @@ class ProjectAdmin(admin.ModelAdmin):
     def lib_status(self, obj):
         if not obj.due_date or not obj.is_lib:
             return '-'
-        total = LibTask.objects.filter(sample__project=obj).count()
-        done = LibTask.objects.filter(sample__project=obj).exclude(result=None).count()
-        if done != total or not total:
-            obj.lib_date = None
-            obj.save()
+        if not obj.lib_date:
+            done, total, _ = self.row_value(obj, 'status')['lib']
             left = (obj.due_date - timedelta(obj.ana_cycle + obj.seq_cycle) - date.today()).days
             if left >= 0:
                 return '%s/%s-余%s天' % (done, total, left)
             else:
                 return format_html('<span style="color:{};">{}</span>', 'red', '%s/%s-延%s天' % (done, total, -left))
         else:
-            obj.lib_date = LibTask.objects.filter(sample__project=obj).order_by('-date').first().date
-            obj.save()
             left = (obj.due_date - timedelta(obj.ana_cycle + obj.seq_cycle) - obj.lib_date).days
             if left >= 0:
                 return '%s-提前%s天' % (obj.lib_date.strftime('%Y%m%d'), left)
@@ -327,6 +287,13 @@ class ProjectAdmin(admin.ModelAdmin):
                 return format_html('<span style="color:{};">{}</span>', 'red', '%s-延%s天' % (obj.lib_date.strftime('%Y%m%d'), -left))
     lib_status.short_description = '建库进度'
 
+    def lab_projected(self, obj):
+        # 按实验产能排期的待处理实验任务预计完成日
+        projected = self.row_value(obj, 'projected')
+        if projected:
+            return projected.strftime('%Y%m%d')
+    lab_projected.short_description = '实验预计完成'
+
     def seq_status(self, obj):
         if not obj.due_date:
             return '-'
@@ -364,24 +331,7 @@ class ProjectAdmin(admin.ModelAdmin):
     ana_status.short_description = '分析进度'
 
     def make_confirm(self, request, queryset):
-        projects = []
-        for obj in queryset:
-            qs = SampleInfo.objects.filter(project=obj)
-            if not obj.is_ext and not obj.is_qc and not obj.is_lib:
-                receive_date = qs.last().receive_date
-                cycle = obj.ext_cycle + obj.qc_cycle + obj.lib_cycle + obj.seq_cycle + obj.ana_cycle
-                due_date = add_business_days(receive_date, cycle)
-                obj.due_date = due_date
-                obj.save()
-            if qs.count():
-                projects += list(set(qs.values_list('project__pk', flat=True)))
-        rows_updated = queryset.filter(id__in=projects).update(is_confirm=True)
-        select_num = queryset.count()
-        if rows_updated:
-            self.message_user(request, '%s 个项目已经完成确认可启动, %s 个项目不含样品无法启动'
-                              % (rows_updated, select_num-rows_updated))
-        else:
-            self.message_user(request, '所选项目不含样品或系统问题无法确认启动', level=messages.ERROR)
+        run_or_enqueue(self, request, 'pm.confirm_projects', queryset)
     make_confirm.short_description = '设置所选项目为确认可启动状态'
 
     def save_model(self, request, obj, form, change):
@@ -399,6 +349,52 @@ class ProjectAdmin(admin.ModelAdmin):
     #     # if request.user.has_perm('pm.add_project')
     #     return super(ProjectAdmin, self).get_changelist_formset(request, **kwargs)
 
+    def get_urls(self):
+        return [
+            url(r'^timeline/$', self.admin_site.admin_view(self.timeline_view), name='pm_project_timeline'),
+            url(r'^timeline/chart/$', self.admin_site.admin_view(self.timeline_chart_view),
+                name='pm_project_timeline_chart'),
+        ] + super(ProjectAdmin, self).get_urls()
+
+    def timeline_view(self, request):
+        """
+        项目时间线JSON：已确认的项目按主键分页，GET参数status同状态筛选，after为上一页返回的next
+        """
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        queryset = self.get_queryset(request).filter(is_confirm=True).select_related('contract', 'progress')\
+            .order_by('pk')
+        status = request.GET.get('status')
+        if status:
+            status_filter = StatusListFilter(request, {'status': status}, Project, self)
+            if status not in dict(status_filter.lookup_choices):
+                return JsonResponse({'error': '未知的项目状态：%s' % status}, status=400)
+            queryset = status_filter.queryset(request, queryset)
+        try:
+            after = int(request.GET.get('after', 0))
+        except ValueError:
+            after = 0
+        projects = list(queryset.filter(pk__gt=after)[:settings.TIMELINE_PAGE_SIZE + 1])
+        more = len(projects) > settings.TIMELINE_PAGE_SIZE
+        projects = projects[:settings.TIMELINE_PAGE_SIZE]
+        return JsonResponse({
+            'today': date.today().isoformat(),
+            'projects': project_timelines(projects),
+            'next': projects[-1].pk if more else None,
+        })
+
+    def timeline_chart_view(self, request):
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.model._meta,
+            title='项目时间线',
+            status=request.GET.get('status', ''),
+            status_choices=StatusListFilter(request, {}, Project, self).lookup_choices,
+        )
+        return TemplateResponse(request, 'admin/pm/project/timeline.html', context)
+
     def get_list_display_links(self, request, list_display):
         if not request.user.has_perm('pm.add_project'):
             return
@@ -419,23 +415,54 @@ class ProjectAdmin(admin.ModelAdmin):
         return actions
 
 
-class ExtSubmitForm(forms.ModelForm):
-    # 已经提交提取的样品不显示
+class SamplePickerMixin(object):
+    """
+    下单选样接口：GET参数q为搜索词，page为页码，返回可下单样品的JSON
+    """
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            url(r'^samples/$', self.admin_site.admin_view(self.samples_view), name='%s_%s_samples' % info),
+        ] + super(SamplePickerMixin, self).get_urls()
+
+    def samples_view(self, request):
+        if not (self.has_add_permission(request) or self.has_change_permission(request)):
+            raise PermissionDenied
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        results, more = search_samples(pending_samples(self.form.stage), request.GET.get('q', '').strip(), page)
+        return JsonResponse({'results': [{'id': pk, 'text': text} for pk, text in results], 'more': more})
+
+
+class SubmitForm(forms.ModelForm):
+    # 候选样品按阶段由pending_samples得到，表单只渲染已选样品，其余由接口分页搜索
+    stage = None
+
     def __init__(self, *args, **kwargs):
         forms.ModelForm.__init__(self, *args, **kwargs)
         if 'sample' in self.fields:
-            values = ExtTask.objects.all().values_list('sample__pk', flat=True)
-            self.fields['sample'].queryset = SampleInfo.is_ext_objects.exclude(id__in=list(set(values)))
+            field = self.fields['sample']
+            field.widget = SamplePickerWidget(reverse('admin:pm_%ssubmit_samples' % self.stage))
+            field.queryset = pending_samples(self.stage)
+            field.help_text = ''
 
     def clean(self):
-        self.instance.__sample__ = self.cleaned_data['sample']
+        self.instance.__sample__ = self.cleaned_data.get('sample')
+
+
+class ExtSubmitForm(SubmitForm):
+    # 已经提交提取的样品不显示
+    stage = 'ext'
 
 
-class ExtSubmitAdmin(admin.ModelAdmin):
+class ExtSubmitAdmin(SamplePickerMixin, admin.ModelAdmin):
     form = ExtSubmitForm
     list_display = ['slug', 'contract_count', 'project_count', 'sample_count', 'date', 'is_submit']
-    filter_horizontal = ('sample',)
     fields = ('slug', 'date', 'sample', 'is_submit')
+    # 计算合同节点所需的剩余周期
+    cycle_fields = ('ext_cycle', 'qc_cycle', 'lib_cycle', 'seq_cycle', 'ana_cycle')
 
     def contract_count(self, obj):
         return len(set(i.project.contract.contract_number for i in obj.sample.all()))
@@ -458,38 +485,23 @@ class ExtSubmitAdmin(admin.ModelAdmin):
         # 选中提交复选框时自动记录提交时间
         if obj.is_submit and not obj.date:
             obj.date = date.today()
-            projects = []
-            for sample in form.instance.__sample__:
-                ExtTask.objects.create(sample=sample, sub_date=date.today())
-                projects.append(sample.project)
-            for i in set(projects):
-                if not i.due_date:
-                    cycle = i.ext_cycle + i.qc_cycle + i.lib_cycle + i.seq_cycle + i.ana_cycle
-                    i.due_date = add_business_days(date.today(), cycle)
-                    i.save()
+            task_num, project_num, seconds = submit_tasks(ExtTask, 'ext', form.instance.__sample__, self.cycle_fields)
+            self.message_user(request, '%s 个样品已下单，%s 个项目设置合同节点，用时 %.2f 秒'
+                              % (task_num, project_num, seconds))
         obj.save()
 
 
-class QcSubmitForm(forms.ModelForm):
+class QcSubmitForm(SubmitForm):
     # 如果需要提取的显示已经合格的样品，已经质检合格的或正在质检的不显示
-    def __init__(self, *args, **kwargs):
-        forms.ModelForm.__init__(self, *args, **kwargs)
-        if 'sample' in self.fields:
-            ext_values = set(SampleInfo.is_ext_objects.values_list('pk', flat=True))\
-                        - set(ExtTask.objects.filter(result=True).values_list('sample__pk', flat=True))
-            qc_values = QcTask.objects.all().values_list('sample__pk', flat=True)
-            self.fields['sample'].queryset = SampleInfo.is_qc_objects.exclude(id__in=list(ext_values))\
-                .exclude(id__in=list(set(qc_values)))
-
-    def clean(self):
-        self.instance.__sample__ = self.cleaned_data['sample']
+    stage = 'qc'
 
 
-class QcSubmitAdmin(admin.ModelAdmin):
+class QcSubmitAdmin(SamplePickerMixin, admin.ModelAdmin):
     form = QcSubmitForm
     list_display = ['slug', 'contract_count', 'project_count', 'sample_count', 'date', 'is_submit']
-    filter_horizontal = ('sample',)
     fields = ('slug', 'date', 'sample', 'is_submit')
+    # 计算合同节点所需的剩余周期
+    cycle_fields = ('qc_cycle', 'lib_cycle', 'seq_cycle', 'ana_cycle')
 
     def contract_count(self, obj):
         return len(set(i.project.contract.contract_number for i in obj.sample.all()))
@@ -512,38 +524,23 @@ class QcSubmitAdmin(admin.ModelAdmin):
         # 选中提交复选框时自动记录提交时间
         if obj.is_submit and not obj.date:
             obj.date = date.today()
-            projects = []
-            for sample in form.instance.__sample__:
-                QcTask.objects.create(sample=sample, sub_date=date.today())
-                projects.append(sample.project)
-            for i in set(projects):
-                if not i.due_date:
-                    cycle = i.qc_cycle + i.lib_cycle + i.seq_cycle + i.ana_cycle
-                    i.due_date = add_business_days(date.today(), cycle)
-                    i.save()
+            task_num, project_num, seconds = submit_tasks(QcTask, 'qc', form.instance.__sample__, self.cycle_fields)
+            self.message_user(request, '%s 个样品已下单，%s 个项目设置合同节点，用时 %.2f 秒'
+                              % (task_num, project_num, seconds))
         obj.save()
 
 
-class LibSubmitForm(forms.ModelForm):
-    # 如果需要质检的显示已经合格和可以风险建库的样品，已经建库合格的或正在建库的不显示
-    def __init__(self, *args, **kwargs):
-        forms.ModelForm.__init__(self, *args, **kwargs)
-        if 'sample' in self.fields:
-            qc_values = set(SampleInfo.is_ext_objects.values_list('pk', flat=True))\
-                         - set(QcTask.objects.filter(result__in=[1, 2]).values_list('sample__pk', flat=True))
-            lib_values = LibTask.objects.exclude(result=False).values_list('sample__pk', flat=True)
-            self.fields['sample'].queryset = SampleInfo.is_lib_objects.exclude(id__in=list(qc_values))\
-                .exclude(id__in=list(set(lib_values)))
-
-    def clean(self):
-        self.instance.__sample__ = self.cleaned_data['sample']
+class LibSubmitForm(SubmitForm):
+    # 如果需要提取的显示质检合格和可以风险建库的样品，已经建库合格的或正在建库的不显示
+    stage = 'lib'
 
 
-class LibSubmitAdmin(admin.ModelAdmin):
+class LibSubmitAdmin(SamplePickerMixin, admin.ModelAdmin):
     form = LibSubmitForm
     list_display = ['slug', 'contract_count', 'project_count', 'sample_count', 'date', 'is_submit']
-    filter_horizontal = ('sample',)
     fields = ('slug', 'date', 'sample', 'is_submit')
+    # 计算合同节点所需的剩余周期
+    cycle_fields = ('lib_cycle', 'seq_cycle', 'ana_cycle')
 
     def contract_count(self, obj):
         return len(set(i.project.contract.contract_number for i in obj.sample.all()))
@@ -566,15 +563,9 @@ class LibSubmitAdmin(admin.ModelAdmin):
         # 选中提交复选框时自动记录提交时间
         if obj.is_submit and not obj.date:
             obj.date = date.today()
-            projects = []
-            for sample in form.instance.__sample__:
-                LibTask.objects.create(sample=sample, sub_date=date.today())
-                projects.append(sample.project)
-            for i in set(projects):
-                if not i.due_date:
-                    cycle = i.lib_cycle + i.seq_cycle + i.ana_cycle
-                    i.due_date = add_business_days(date.today(), cycle)
-                    i.save()
+            task_num, project_num, seconds = submit_tasks(LibTask, 'lib', form.instance.__sample__, self.cycle_fields)
+            self.message_user(request, '%s 个样品已下单，%s 个项目设置合同节点，用时 %.2f 秒'
+                              % (task_num, project_num, seconds))
         obj.save()
 
 
@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class PmConfig(AppConfig):
     name = 'pm'
     verbose_name = "项目管理系统"
+
+    def ready(self):
+        from BMS.db import configure_sqlite
+        connection_created.connect(configure_sqlite, dispatch_uid='bms_configure_sqlite')
@@ -0,0 +1,46 @@
+"""
+项目确认可启动
+
+所选项目的最后收样日期由一次分组聚合得到，合同节点批量计算，确认状态和合同节点在一个事务中批量更新，
+查询数与所选项目数无关。批量更新不触发项目的post_save信号，样品流程状态和实验排期在此直接更新。
+"""
+from django.db import transaction
+from django.db.models import Max
+from BMS.db import bulk_update
+from BMS.workdays import add_business_days_many
+from lims.models import SampleInfo
+from lims.scheduler import mark_dirty
+from lims.stages import refresh_stages
+from .models import Project
+
+CONFIRMED = 'confirmed'
+NO_SAMPLES = 'no_samples'
+
+CYCLE_FIELDS = ('ext_cycle', 'qc_cycle', 'lib_cycle', 'seq_cycle', 'ana_cycle')
+
+
+def confirm_projects(project_ids):
+    """
+    设置项目为确认可启动状态，不含样品的项目不能确认；
+    不需提取、质检、建库的项目以最后收样日期加全部周期（工作日）为合同节点
+    :return: {项目ID: CONFIRMED或NO_SAMPLES}
+    """
+    project_ids = set(project_ids)
+    with transaction.atomic():
+        last_receive = dict(SampleInfo.objects.filter(project__in=project_ids).values_list('project')
+                            .annotate(last_date=Max('receive_date')).order_by())
+        projects = list(Project.objects.filter(pk__in=last_receive)
+                        .only('is_ext', 'is_qc', 'is_lib', 'due_date', 'is_confirm', *CYCLE_FIELDS))
+        direct = [obj for obj in projects if not obj.is_ext and not obj.is_qc and not obj.is_lib]
+        due_dates = add_business_days_many(
+            (last_receive[obj.pk], sum(getattr(obj, name) for name in CYCLE_FIELDS)) for obj in direct)
+        for obj, due_date in zip(direct, due_dates):
+            obj.due_date = due_date
+        for obj in projects:
+            obj.is_confirm = True
+        bulk_update(projects, ['due_date', 'is_confirm'])
+        refresh_stages(obj.pk for obj in projects)
+        mark_dirty()
+    outcomes = dict((pk, NO_SAMPLES) for pk in project_ids)
+    outcomes.update((obj.pk, CONFIRMED) for obj in projects)
+    return outcomes
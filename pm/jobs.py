@@ -0,0 +1,19 @@
+from django.contrib import messages
+from jobs.registry import register, chunked
+from .confirm import confirm_projects, CONFIRMED
+
+
+@register('pm.confirm_projects')
+def confirm_projects_job(job, ids):
+    """
+    设置项目为确认可启动状态，不含样品的项目不能确认
+    """
+    outcomes = {}
+    for part in chunked(ids):
+        outcomes.update(confirm_projects(part))
+        job.set_progress(len(outcomes), len(ids))
+    rows_updated = sum(1 for outcome in outcomes.values() if outcome == CONFIRMED)
+    if rows_updated:
+        return [(messages.INFO, '%s 个项目已经完成确认可启动, %s 个项目不含样品无法启动'
+                 % (rows_updated, len(ids) - rows_updated))]
+    return [(messages.ERROR, '所选项目不含样品或系统问题无法确认启动')]
@@ -0,0 +1,111 @@
+import json
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+import django
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+from BMS.instrumentation import QueryRecorder
+from BMS.seeding import seed
+
+
+class Command(BaseCommand):
+    help = '在测试数据库中生成模拟数据，逐个渲染后台列表页和编辑页，记录查询数、耗时和内存峰值'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=100, help='模拟数据的合同数')
+        parser.add_argument('--seed', type=int, default=0, help='随机种子')
+        parser.add_argument('--repeat', type=int, default=3, help='每个页面计时的次数，取中位数')
+        parser.add_argument('--output', default='bench_admin.json', help='结果JSON文件')
+        parser.add_argument('--baseline', help='对比的历史结果JSON文件')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0)
+        old_config = runner.setup_databases()
+        try:
+            started = time.time()
+            counts = seed(options['scale'], seed=options['seed'], stdout=self.stdout)
+            self.stdout.write('生成数据用时 %.1f 秒：%s' % (time.time() - started, counts))
+            results = self.run_pages(options['repeat'])
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        report = {
+            'date': datetime.now().isoformat(),
+            'scale': options['scale'],
+            'seed': options['seed'],
+            'rows': counts,
+            'database': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'pages': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        self.stdout.write('结果已写入 %s' % options['output'])
+        if options['baseline']:
+            self.compare(results, options['baseline'])
+
+    def run_pages(self, repeat):
+        user = User.objects.create_superuser('bench', 'bench@example.com', 'bench')
+        client = Client()
+        client.force_login(user)
+        results = []
+        for model, model_admin in sorted(admin.site._registry.items(), key=lambda item: item[0]._meta.label):
+            info = (model._meta.app_label, model._meta.model_name)
+            urls = [('changelist', reverse('admin:%s_%s_changelist' % info))]
+            obj = model.objects.order_by('-pk').first()
+            if obj is not None:
+                urls.append(('change', reverse('admin:%s_%s_change' % info, args=[obj.pk])))
+            for view, url in urls:
+                result = self.measure(client, url, repeat)
+                result.update({'model': model._meta.label, 'view': view, 'url': url})
+                results.append(result)
+                self.stdout.write('%(model)s %(view)s：%(status)s，%(queries)s 次查询，SQL %(sql_ms).1f ms，'
+                                  'Python %(python_ms).1f ms，内存峰值 %(peak_kb).0f KB' % result)
+        return results
+
+    def measure(self, client, url, repeat):
+        client.get(url)  # 预热模板和缓存
+        samples = []
+        for _ in range(max(repeat, 1)):
+            with QueryRecorder() as recorder:
+                started = time.perf_counter()
+                response = client.get(url)
+                total = time.perf_counter() - started
+            samples.append((total, recorder.seconds, recorder.count))
+        total, sql, queries = sorted(samples)[len(samples) // 2]
+        # 内存单独测一次，避免tracemalloc拖慢计时
+        tracemalloc.start()
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            'status': response.status_code,
+            'queries': queries,
+            'sql_ms': sql * 1000,
+            'python_ms': (total - sql) * 1000,
+            'total_ms': total * 1000,
+            'peak_kb': peak / 1024,
+        }
+
+    def compare(self, results, path):
+        with open(path, encoding='utf-8') as f:
+            baseline = dict(((page['model'], page['view']), page) for page in json.load(f)['pages'])
+        for page in results:
+            old = baseline.get((page['model'], page['view']))
+            if not old:
+                continue
+            if page['queries'] > old['queries'] or page['total_ms'] > old['total_ms'] * 1.2:
+                self.stdout.write(self.style.WARNING('%s %s：查询 %s -> %s，耗时 %.1f -> %.1f ms' % (
+                    page['model'], page['view'], old['queries'], page['queries'], old['total_ms'],
+                    page['total_ms'])))
@@ -0,0 +1,68 @@
+import random
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction, OperationalError
+from django.db.models import F
+from lims.models import ExtTask
+from pm.models import Project
+from pm.status import project_status_map
+
+
+class Command(BaseCommand):
+    help = '模拟多用户并发读写，测试当前数据库配置的吞吐量和锁冲突'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=8, help='并发用户数')
+        parser.add_argument('--seconds', type=float, default=10, help='测试时长（秒）')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='写操作比例')
+        parser.add_argument('--page-size', type=int, default=100, help='每次读取的项目数')
+
+    def handle(self, *args, **options):
+        task_ids = list(ExtTask.objects.values_list('pk', flat=True))
+        stats = {'read': [], 'write': [], 'locked': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.time() + options['seconds']
+
+        def read():
+            projects = Project.objects.select_related('contract', 'progress').order_by('-id')[:options['page_size']]
+            project_status_map(projects)
+
+        def write():
+            # 在事务内更新后回滚，占用写锁但不改动数据
+            with transaction.atomic():
+                ExtTask.objects.filter(pk=random.choice(task_ids)).update(note=F('note'))
+                transaction.set_rollback(True)
+
+        def user():
+            try:
+                while time.time() < deadline:
+                    kind = 'write' if task_ids and random.random() < options['write_ratio'] else 'read'
+                    start = time.time()
+                    try:
+                        read() if kind == 'read' else write()
+                    except OperationalError as e:
+                        with lock:
+                            stats['locked' if 'locked' in str(e) else 'errors'] += 1
+                        continue
+                    with lock:
+                        stats[kind].append(time.time() - start)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=user) for _ in range(options['users'])]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.stdout.write('数据库：%s %s' % (connection.vendor, connection.settings_dict['NAME']))
+        for kind in ('read', 'write'):
+            times = sorted(stats[kind])
+            if not times:
+                self.stdout.write('%s：0 次' % kind)
+                continue
+            self.stdout.write('%s：%s 次，%.1f 次/秒，平均 %.1f ms，p95 %.1f ms' % (
+                kind, len(times), len(times) / options['seconds'], sum(times) / len(times) * 1000,
+                times[int(len(times) * 0.95)] * 1000))
+        self.stdout.write('锁冲突 %s 次，其他错误 %s 次' % (stats['locked'], stats['errors']))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from lims.stages import rebuild_stages
+from pm.progress import rebuild_progress
+
+
+class Command(BaseCommand):
+    help = '按实验任务重建全部项目进度和样品流程状态'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每批处理的项目数')
+
+    def handle(self, *args, **options):
+        count = rebuild_progress(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('已重建 %s 个项目的进度' % count))
+        count = rebuild_stages(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('%s 个样品的流程状态已更新' % count))
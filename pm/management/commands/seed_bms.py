@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+from BMS.seeding import seed
+
+
+class Command(BaseCommand):
+    help = '按规模生成客户、合同、财务、项目和实验的模拟数据，用于压测'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, required=True, help='合同数，每个合同约生成100行关联数据')
+        parser.add_argument('--seed', type=int, default=None, help='随机种子，指定后生成结果可复现')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每条INSERT写入的行数')
+        parser.add_argument('--chunk-size', type=int, default=100, help='每个事务生成的合同数')
+
+    def handle(self, *args, **options):
+        started = time.time()
+        counts = seed(options['scale'], seed=options['seed'], batch_size=options['batch_size'],
+                      chunk_size=options['chunk_size'], stdout=self.stdout)
+        for label, count in counts.items():
+            self.stdout.write('%s：%s 行' % (label, count))
+        self.stdout.write(self.style.SUCCESS('共生成 %s 行，用时 %.1f 秒' % (sum(counts.values()), time.time() - started)))
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 18:30
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pm', '0016_sync_models'),
+        ('lims', '0009_sync_models'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='Sample',
+        ),
+        migrations.DeleteModel(
+            name='SequenceInfo',
+        ),
+        migrations.AddField(
+            model_name='qcsubmit',
+            name='sample',
+            field=models.ManyToManyField(to='lims.SampleInfo', verbose_name='样品'),
+        ),
+        migrations.AddField(
+            model_name='libsubmit',
+            name='sample',
+            field=models.ManyToManyField(to='lims.SampleInfo', verbose_name='样品'),
+        ),
+        migrations.AddField(
+            model_name='extsubmit',
+            name='sample',
+            field=models.ManyToManyField(to='lims.SampleInfo', verbose_name='样品'),
+        ),
+        migrations.RemoveField(
+            model_name='project',
+            name='description',
+        ),
+        migrations.RemoveField(
+            model_name='project',
+            name='init_date',
+        ),
+        migrations.RemoveField(
+            model_name='project',
+            name='status',
+        ),
+    ]
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 18:30
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_progress(apps, schema_editor):
+    # 按已有实验任务生成全部项目进度，同rebuild_progress命令
+    from pm.progress import rebuild_progress
+    rebuild_progress(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pm', '0017_sync_models'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectProgress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ext_total', models.PositiveIntegerField(default=0, verbose_name='提取样品数')),
+                ('ext_done', models.PositiveIntegerField(default=0, verbose_name='提取完成数')),
+                ('ext_date', models.DateField(blank=True, null=True, verbose_name='最后提取日')),
+                ('qc_total', models.PositiveIntegerField(default=0, verbose_name='质检样品数')),
+                ('qc_done', models.PositiveIntegerField(default=0, verbose_name='质检完成数')),
+                ('qc_date', models.DateField(blank=True, null=True, verbose_name='最后质检日')),
+                ('lib_total', models.PositiveIntegerField(default=0, verbose_name='建库样品数')),
+                ('lib_done', models.PositiveIntegerField(default=0, verbose_name='建库完成数')),
+                ('lib_date', models.DateField(blank=True, null=True, verbose_name='最后建库日')),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='pm.Project', verbose_name='项目')),
+            ],
+            options={
+                'verbose_name': '项目进度',
+                'verbose_name_plural': '项目进度',
+            },
+        ),
+        migrations.RunPython(fill_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 18:30
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+# 部分索引：只索引进行中的项目，体积小且正好覆盖状态筛选的查询条件
+# Django 1.10 的迁移操作不支持部分索引，SQLite和PostgreSQL 9.5+直接执行建索引语句，其他数据库跳过
+PARTIAL_INDEXES = (
+    ('pm_project_seq_running', 'pm_project', 'id', 'seq_start_date IS NOT NULL AND seq_end_date IS NULL'),
+    ('pm_project_ana_running', 'pm_project', 'id', 'ana_start_date IS NOT NULL AND ana_end_date IS NULL'),
+)
+
+
+def create_partial_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    for name, table, columns, condition in PARTIAL_INDEXES:
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS %s ON %s (%s) WHERE %s' % (name, table, columns, condition))
+
+
+def drop_partial_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    for name, _, _, _ in PARTIAL_INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS %s' % name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pm', '0018_projectprogress'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='project',
+            name='is_confirm',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='确认'),
+        ),
+        migrations.RunPython(create_partial_indexes, drop_partial_indexes),
+    ]
@@ -34,7 +34,7 @@ class Project(models.Model):
     result_date = models.DateField('释放结果日', blank=True, null=True)
     data_date = models.DateField('释放数据日', blank=True, null=True)
     due_date = models.DateField('合同节点', blank=True, null=True)
-    is_confirm = models.BooleanField('确认', default=False)
+    is_confirm = models.BooleanField('确认', default=False, db_index=True)
 
     class Meta:
         unique_together = ('contract', 'name')
@@ -45,6 +45,37 @@ class Project(models.Model):
         return '%s' % self.name
 
 
+class ProjectProgress(models.Model):
+    # 项目各阶段实验进度，由实验任务变动时维护，避免列表页逐行统计
+    project = models.OneToOneField(
+        Project,
+        verbose_name='项目',
+        related_name='progress',
+        on_delete=models.CASCADE,
+    )
+    ext_total = models.PositiveIntegerField('提取样品数', default=0)
+    ext_done = models.PositiveIntegerField('提取完成数', default=0)
+    ext_date = models.DateField('最后提取日', blank=True, null=True)
+    qc_total = models.PositiveIntegerField('质检样品数', default=0)
+    qc_done = models.PositiveIntegerField('质检完成数', default=0)
+    qc_date = models.DateField('最后质检日', blank=True, null=True)
+    lib_total = models.PositiveIntegerField('建库样品数', default=0)
+    lib_done = models.PositiveIntegerField('建库完成数', default=0)
+    lib_date = models.DateField('最后建库日', blank=True, null=True)
+
+    class Meta:
+        verbose_name = '项目进度'
+        verbose_name_plural = '项目进度'
+
+    def __str__(self):
+        return '%s' % self.project
+
+    def get_stage(self, stage):
+        # 返回(完成数, 总数, 最后完成日)
+        return (getattr(self, '%s_done' % stage), getattr(self, '%s_total' % stage),
+                getattr(self, '%s_date' % stage))
+
+
 class ExtSubmit(models.Model):
     slug = models.SlugField('任务号', allow_unicode=True)
     sample = models.ManyToManyField(
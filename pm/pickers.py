@@ -0,0 +1,83 @@
+"""
+实验下单选样
+
+各阶段可下单的样品由样品的流程状态字段直接查询；下单表单只渲染已选样品，候选样品由后台接口分页搜索加载。
+"""
+from django import forms
+from django.db.models import Q
+from django.utils.encoding import force_text
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+from lims.models import SampleInfo
+
+PAGE_SIZE = 50
+SEARCH_FIELDS = ('name', 'project__name', 'project__contract__contract_number')
+
+
+def pending_samples(stage):
+    """
+    可下单的样品，按样品的流程状态索引查询，见lims.stages
+    ext：需提取且未下过提取任务
+    qc：需质检，需提取的须提取合格，且未下过质检任务
+    lib：需建库，之前的阶段均合格（质检可风险建库），且没有未失败的建库任务
+    """
+    managers = {
+        'ext': SampleInfo.is_ext_objects,
+        'qc': SampleInfo.is_qc_objects,
+        'lib': SampleInfo.is_lib_objects,
+    }
+    if stage not in managers:
+        raise ValueError('未知的阶段：%s' % stage)
+    return managers[stage].all()
+
+
+def sample_label(sample):
+    return '%s %s %s [%s]' % (sample.project.contract.contract_number, sample.project, sample.name,
+                              sample.receive_date)
+
+
+def search_samples(queryset, term='', page=1, page_size=PAGE_SIZE):
+    """
+    按样品名称、项目注解、合同号搜索，分页返回
+    :return: ([(主键, 显示名称)], 是否还有下一页)
+    """
+    if term:
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{'%s__icontains' % field: term})
+        queryset = queryset.filter(condition)
+    offset = (page - 1) * page_size
+    # 多取一条判断是否有下一页，不执行COUNT
+    samples = list(queryset.select_related('project__contract')
+                   .only('name', 'receive_date', 'project__name', 'project__contract__contract_number')
+                   .order_by('-pk')[offset:offset + page_size + 1])
+    return [(sample.pk, sample_label(sample)) for sample in samples[:page_size]], len(samples) > page_size
+
+
+class SamplePickerWidget(forms.SelectMultiple):
+    """
+    只渲染已选样品的多选框，另附搜索框，候选样品由url接口加载
+    """
+    class Media:
+        js = ('pm/js/sample_picker.js',)
+
+    def __init__(self, url, attrs=None):
+        self.url = url
+        super(SamplePickerWidget, self).__init__(attrs)
+
+    def render(self, name, value, attrs=None):
+        attrs = dict(attrs or {}, **{'class': 'sample-picker', 'data-url': self.url, 'size': 10})
+        select = super(SamplePickerWidget, self).render(name, value, attrs)
+        return format_html(
+            '<div class="sample-picker-box">'
+            '<p><input type="search" class="sample-picker-search vTextField" placeholder="搜索样品名称、项目、合同号">'
+            '</p><div class="sample-picker-results" style="max-height: 15em; overflow-y: auto;"></div>'
+            '<p class="help">已选样品（双击移除）：</p>{}</div>', select)
+
+    def render_options(self, selected_choices):
+        selected = set(force_text(value) for value in selected_choices if force_text(value).isdigit())
+        if not selected:
+            return ''
+        samples = SampleInfo.objects.filter(pk__in=selected).select_related('project__contract').order_by('-pk')
+        return mark_safe('\n'.join(format_html('<option value="{}" selected="selected">{}</option>', sample.pk,
+                                               sample_label(sample)) for sample in samples))
@@ -0,0 +1,69 @@
+from collections import defaultdict
+from django.apps import apps as global_apps
+from django.db import transaction
+from .models import Project, ProjectProgress
+from .status import STAGE_TASKS, stage_progress_map
+from lims.stages import refresh_stages
+from lims.scheduler import mark_dirty
+
+
+def refresh_progress(project_ids, stages=None):
+    """
+    实验任务新增或结果变动后，重新统计项目进度并同步项目各阶段完成日（全部完成时取最后完成日，否则清空），
+    同时更新样品的流程状态，并清除对应阶段的排期缓存
+    :param project_ids: 受影响的项目
+    :param stages: 需要更新的阶段，默认为ext、qc、lib全部
+    """
+    project_ids = set(project_ids)
+    if not project_ids:
+        return
+    stage_tasks = [(stage, model) for stage, model in STAGE_TASKS if not stages or stage in stages]
+    with transaction.atomic():
+        existing = set(ProjectProgress.objects.filter(project__in=project_ids).values_list('project', flat=True))
+        missing = project_ids - existing
+        if missing:
+            # 新建的进度记录需统计全部阶段
+            ProjectProgress.objects.bulk_create([ProjectProgress(project_id=pk) for pk in missing])
+            _refresh(missing, STAGE_TASKS)
+        _refresh(existing, stage_tasks)
+        refresh_stages(project_ids)
+        mark_dirty([stage for stage, _ in stage_tasks])
+
+
+def _refresh(project_ids, stage_tasks, project_model=Project, progress_model=ProjectProgress):
+    if not project_ids:
+        return
+    progress = dict((stage, stage_progress_map(model, project_ids)) for stage, model in stage_tasks)
+    for pk in project_ids:
+        values = {}
+        for stage, _ in stage_tasks:
+            done, total, last_date = progress[stage].get(pk, (0, 0, None))
+            values.update({'%s_total' % stage: total, '%s_done' % stage: done, '%s_date' % stage: last_date})
+        progress_model.objects.filter(project=pk).update(**values)
+    for stage, _ in stage_tasks:
+        field = '%s_date' % stage
+        projects = defaultdict(list)
+        for pk in project_ids:
+            done, total, last_date = progress[stage].get(pk, (0, 0, None))
+            projects[last_date if total and done == total else None].append(pk)
+        for value, pks in projects.items():
+            project_model.objects.filter(pk__in=pks).exclude(**{field: value}).update(**{field: value})
+
+
+def rebuild_progress(batch_size=500, apps=global_apps):
+    """
+    清空并按实验任务重建全部项目进度
+    :param apps: 模型注册表，数据迁移中传入历史模型
+    :return: 重建的项目数
+    """
+    project_model = apps.get_model('pm', 'Project')
+    progress_model = apps.get_model('pm', 'ProjectProgress')
+    stage_tasks = [(stage, apps.get_model('lims', model.__name__)) for stage, model in STAGE_TASKS]
+    project_ids = list(project_model.objects.order_by('pk').values_list('pk', flat=True))
+    with transaction.atomic():
+        progress_model.objects.all().delete()
+        for i in range(0, len(project_ids), batch_size):
+            batch = project_ids[i:i + batch_size]
+            progress_model.objects.bulk_create([progress_model(project_id=pk) for pk in batch])
+            _refresh(batch, stage_tasks, project_model, progress_model)
+    return len(project_ids)
@@ -0,0 +1,70 @@
+/* 实验下单选样：按输入分页搜索可下单样品，点击加入已选，双击已选样品移除 */
+(function($) {
+    'use strict';
+
+    function init(box) {
+        var select = box.find('select.sample-picker');
+        var results = box.find('.sample-picker-results');
+        var search = box.find('.sample-picker-search');
+        var url = select.data('url');
+        var term = '';
+        var page = 1;
+        var timer = null;
+
+        function load(reset) {
+            if (reset) {
+                page = 1;
+                results.empty();
+            }
+            $.getJSON(url, {q: term, page: page}, function(data) {
+                results.find('.sample-picker-more').remove();
+                $.each(data.results, function(i, item) {
+                    if (select.find('option[value="' + item.id + '"]').length) {
+                        return;
+                    }
+                    $('<a href="#" class="sample-picker-item"></a>').text(item.text).data('id', item.id)
+                        .appendTo($('<div></div>').appendTo(results));
+                });
+                if (data.more) {
+                    $('<a href="#" class="sample-picker-more">更多…</a>').appendTo(results);
+                }
+                if (!results.children().length) {
+                    results.text('没有可下单的样品');
+                }
+            });
+        }
+
+        search.on('input', function() {
+            clearTimeout(timer);
+            timer = setTimeout(function() {
+                term = $.trim(search.val());
+                load(true);
+            }, 300);
+        });
+        results.on('click', '.sample-picker-item', function(event) {
+            event.preventDefault();
+            var item = $(this);
+            $('<option selected="selected"></option>').val(item.data('id')).text(item.text()).appendTo(select);
+            item.parent().remove();
+        });
+        results.on('click', '.sample-picker-more', function(event) {
+            event.preventDefault();
+            page += 1;
+            load(false);
+        });
+        select.on('dblclick', 'option', function() {
+            $(this).remove();
+        });
+        // 提交时已选列表中的样品全部选中
+        select.closest('form').on('submit', function() {
+            select.find('option').prop('selected', true);
+        });
+        load(true);
+    }
+
+    $(function() {
+        $('.sample-picker-box').each(function() {
+            init($(this));
+        });
+    });
+})(django.jQuery);
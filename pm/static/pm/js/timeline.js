@@ -0,0 +1,88 @@
+/* 项目时间线：按页读取全部项目的计划、实际窗口，每个项目一行，各阶段计划与实际各画一条 */
+(function($) {
+    'use strict';
+
+    var DAY = 24 * 3600 * 1000;
+
+    function parse(value) {
+        return value ? Date.parse(value) : null;
+    }
+
+    function load(box, projects, after, done) {
+        var params = {status: box.data('status') || ''};
+        if (after) {
+            params.after = after;
+        }
+        $.getJSON(box.data('url'), params, function(data) {
+            projects.push.apply(projects, data.projects);
+            $('.timeline-count').text('已读取 ' + projects.length + ' 个项目');
+            if (data.next) {
+                load(box, projects, data.next, done);
+            } else {
+                done(projects, parse(data.today));
+            }
+        });
+    }
+
+    function range(projects, today) {
+        var first = today, last = today;
+        $.each(projects, function(i, project) {
+            $.each(project.stages, function(j, stage) {
+                $.each(stage.planned.concat(stage.actual), function(k, value) {
+                    var day = parse(value);
+                    if (day !== null) {
+                        first = Math.min(first, day);
+                        last = Math.max(last, day);
+                    }
+                });
+            });
+        });
+        return [first, last + DAY];
+    }
+
+    function bar(cls, start, end, bounds, title) {
+        var span = bounds[1] - bounds[0];
+        return $('<div class="timeline-bar"></div>').addClass(cls).attr('title', title).css({
+            left: (start - bounds[0]) / span * 100 + '%',
+            width: Math.max(end - start, DAY) / span * 100 + '%'
+        });
+    }
+
+    function render(box, projects, today) {
+        var bounds = range(projects, today);
+        var rows = $('<div class="timeline-rows"></div>');
+        projects.sort(function(a, b) {
+            return (a.due_date || '').localeCompare(b.due_date || '');
+        });
+        $.each(projects, function(i, project) {
+            var row = $('<div class="timeline-row"></div>').appendTo(rows);
+            $('<div class="timeline-label"></div>').text(project.contract + ' ' + project.name)
+                .attr('title', project.customer + ' 合同节点 ' + (project.due_date || '-')).appendTo(row);
+            var track = $('<div class="timeline-track"></div>').appendTo(row);
+            track.append(bar('today', today, today, bounds, '今天'));
+            $.each(project.stages, function(j, stage) {
+                var planned = [parse(stage.planned[0]), parse(stage.planned[1])];
+                var actual = [parse(stage.actual[0]), parse(stage.actual[1])];
+                var progress = stage.total ? ' ' + stage.done + '/' + stage.total : '';
+                if (planned[0] !== null) {
+                    track.append(bar('planned stage-' + stage.stage, planned[0], planned[1], bounds,
+                        stage.label + '计划 ' + stage.planned.join(' ~ ')));
+                }
+                if (actual[0] !== null) {
+                    var end = actual[1] !== null ? actual[1] : today;
+                    var late = planned[1] !== null && end > planned[1];
+                    track.append(bar('actual stage-' + stage.stage + (late ? ' late' : ''), actual[0], end, bounds,
+                        stage.label + '实际 ' + stage.actual[0] + ' ~ ' + (stage.actual[1] || '进行中') + progress));
+                }
+            });
+        });
+        box.empty().append(rows);
+    }
+
+    $(function() {
+        var box = $('#timeline');
+        load(box, [], null, function(projects, today) {
+            render(box, projects, today);
+        });
+    });
+})(django.jQuery);
@@ -0,0 +1,82 @@
+from django.db.models import Count, Max
+from fm.models import Ledger
+from lims.models import SampleInfo, ExtTask, QcTask, LibTask
+from .models import ProjectProgress
+
+
+STAGE_TASKS = (
+    ('ext', ExtTask),
+    ('qc', QcTask),
+    ('lib', LibTask),
+)
+
+
+def period_income_map(contract_ids):
+    # 按合同和款期读取台账的到账金额 {(contract_id, period): income}
+    rows = Ledger.objects.filter(contract__in=contract_ids).values_list('contract', 'period', 'received')
+    return {(contract, period): income for contract, period, income in rows}
+
+
+def stage_progress_map(model, project_ids):
+    # 按项目汇总实验任务 {project_id: (done, total, last_date)}
+    rows = model.objects.filter(sample__project__in=project_ids).values_list('sample__project')\
+        .annotate(total=Count('id'), done=Count('result'), last_date=Max('date')).order_by()
+    return {project: (done, total, last_date) for project, total, done, last_date in rows}
+
+
+def sample_summary_map(project_ids):
+    # 按项目汇总样品 {project_id: (样品数, 最后收样日)}
+    rows = SampleInfo.objects.filter(project__in=project_ids).values_list('project')\
+        .annotate(num=Count('id'), last_date=Max('receive_date')).order_by()
+    return {project: (num, last_date) for project, num, last_date in rows}
+
+
+def get_progress(project, stage):
+    """
+    读取项目阶段进度，尚无进度记录的项目视为没有实验任务
+    :return: (完成数, 总数, 最后完成日)
+    """
+    try:
+        return project.progress.get_stage(stage)
+    except ProjectProgress.DoesNotExist:
+        return 0, 0, None
+
+
+def project_status_map(projects):
+    """
+    批量计算一页项目的状态，查询数与项目数无关
+    :param projects: 项目列表，需已加载contract和progress
+    :return: {project.pk: {'status': 状态, 'fis': 首款应收, 'fin': 尾款应收, 'ext'/'qc'/'lib': (完成数, 总数, 最后完成日)}}
+    """
+    projects = list(projects)
+    if not projects:
+        return {}
+    income = period_income_map(set(p.contract_id for p in projects))
+    result = {}
+    for p in projects:
+        info = {
+            'fis': p.contract.fis_amount - (income.get((p.contract_id, 'FIS')) or 0),
+            'fin': p.contract.fin_amount - (income.get((p.contract_id, 'FIN')) or 0),
+        }
+        for stage, _ in STAGE_TASKS:
+            info[stage] = get_progress(p, stage)
+        info['status'] = get_status(p, info)
+        result[p.pk] = info
+    return result
+
+
+def get_status(project, info):
+    if info['fis'] > 0:
+        return '待首款'
+    if project.ana_end_date and info['fin'] > 0:
+        return '待尾款'
+    if project.ana_start_date and not project.ana_end_date:
+        return '分析中'
+    if project.seq_start_date and not project.seq_end_date:
+        return '测序中'
+    for stage, label in (('lib', '建库中'), ('qc', '质检中'), ('ext', '提取中')):
+        done, total, _ = info[stage]
+        if done < total:
+            return label
+    if info['fis'] == 0:
+        return '待处理'
@@ -0,0 +1,37 @@
+import time
+from collections import defaultdict
+from datetime import date
+from django.db import transaction
+from BMS.workdays import add_business_days
+from .models import Project
+from .progress import refresh_progress
+
+
+def submit_tasks(model, stage, samples, cycle_fields, batch_size=500):
+    """
+    实验任务批量下单：一次写入全部任务，尚无合同节点的项目按剩余周期一并设置合同节点
+    :param model: ExtTask、QcTask或LibTask
+    :param stage: 对应阶段ext、qc或lib
+    :param samples: 下单的样品
+    :param cycle_fields: 计算合同节点所需累加的项目周期字段
+    :return: (任务数, 设置合同节点的项目数, 用时秒数)
+    """
+    start = time.time()
+    today = date.today()
+    samples = list(samples.select_related('project'))
+    projects = dict((sample.project_id, sample.project) for sample in samples)
+    due_dates = defaultdict(list)
+    for project in projects.values():
+        if not project.due_date:
+            cycle = sum(getattr(project, field) for field in cycle_fields)
+            due_dates[add_business_days(today, cycle)].append(project.pk)
+    with transaction.atomic():
+        model.objects.bulk_create([model(sample=sample, sub_date=today) for sample in samples],
+                                  batch_size=batch_size)
+        # 同一天下单的项目合同节点大多相同，按节点分组更新
+        for due_date, pks in due_dates.items():
+            for i in range(0, len(pks), batch_size):
+                Project.objects.filter(pk__in=pks[i:i + batch_size], due_date=None).update(due_date=due_date)
+        # bulk_create不触发信号，需手动同步项目进度
+        refresh_progress(projects.keys(), [stage])
+    return len(samples), sum(len(pks) for pks in due_dates.values()), time.time() - start
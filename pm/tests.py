@@ -1,3 +1,405 @@
-from django.test import TestCase
+import re
+from datetime import date, timedelta
+from unittest import skipUnless
+from django.contrib import admin
+from django.contrib.auth.models import User, Permission
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from lims.models import SampleInfo, ExtTask, QcTask, LibTask
+from lims.scheduler import plan_versions
+from BMS.workdays import add_business_days, load_calendar
+from mm.models import Contract
+from .admin import StatusListFilter
+from .confirm import confirm_projects, CONFIRMED, NO_SAMPLES
+from .pickers import pending_samples
+from .timeline import planned_windows
+from .models import Project, ProjectProgress
+from .progress import rebuild_progress
+from .submit import submit_tasks
 
-# Create your tests here.
+
+@skipUnless(connection.vendor == 'sqlite', '执行计划格式依赖SQLite')
+class QueryPlanTest(TestCase):
+    """
+    状态筛选和选样查询走索引
+    """
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def status_queryset(self, status):
+        status_filter = StatusListFilter(None, {'status': status}, Project, admin.site._registry[Project])
+        return status_filter.queryset(None, Project.objects.all())
+
+    def assertUsesIndex(self, queryset, index):
+        plan = self.explain(queryset)
+        self.assertTrue(any(index in row for row in plan), plan)
+        # 不允许全表扫描
+        full_scan = re.compile(r'SCAN (TABLE )?%s$' % queryset.model._meta.db_table)
+        self.assertFalse(any(full_scan.match(row) for row in plan), plan)
+
+    def test_status_filters(self):
+        self.assertUsesIndex(self.status_queryset('FIS'), 'INDEX mm_contract_')
+        for status, table in (('EXT', 'lims_exttask'), ('QC', 'lims_qctask'), ('LIB', 'lims_libtask')):
+            self.assertUsesIndex(self.status_queryset(status), 'COVERING INDEX %s_result_' % table)
+        self.assertUsesIndex(self.status_queryset('SEQ'), 'INDEX pm_project_seq_running')
+        self.assertUsesIndex(self.status_queryset('ANA'), 'INDEX pm_project_ana_running')
+
+    def test_sample_pickers(self):
+        for manager in (SampleInfo.is_ext_objects, SampleInfo.is_qc_objects, SampleInfo.is_lib_objects):
+            self.assertUsesIndex(manager.all(), '(stage=?)')
+
+
+class ConfirmProjectsTest(TestCase):
+    """
+    确认可启动：查询数与项目数无关，合同节点按最后收样日期计算
+    """
+    def setUp(self):
+        user = User.objects.create_user('sale')
+        contract = Contract.objects.create(contract_number='C001', name='合同', type=1, salesman=user, price=1,
+                                           range=1, fis_amount=1, fin_amount=0)
+        self.projects = [Project.objects.create(
+            contract=contract, customer='客户', name='项目%s' % i, service_type='16S', data_amount='1G',
+            is_ext=i % 2 == 0, is_qc=False, is_lib=False, ext_cycle=1, ext_task_cycle=1, qc_cycle=1,
+            qc_task_cycle=1, lib_cycle=1, lib_task_cycle=1, seq_cycle=1, ana_cycle=1) for i in range(6)]
+        for obj in self.projects[:4]:
+            for day in (date(2017, 5, 2), date(2017, 5, 5)):
+                SampleInfo.objects.create(project=obj, type='G', species='人', name='S%s' % day.day, volume=1,
+                                          concentration=1, receive_date=day)
+
+    def test_confirm(self):
+        ids = [obj.pk for obj in self.projects]
+        versions = plan_versions()
+        # 聚合、读取项目、批量更新，推算样品流程状态5次，更新排期版本，另加事务的保存点
+        with self.assertNumQueries(13):
+            outcomes = confirm_projects(ids)
+        self.assertEqual(plan_versions(), dict((stage, version + 1) for stage, version in versions.items()))
+        self.assertEqual([outcomes[pk] for pk in ids], [CONFIRMED] * 4 + [NO_SAMPLES] * 2)
+        confirmed = dict(Project.objects.values_list('pk', 'is_confirm'))
+        self.assertEqual([confirmed[pk] for pk in ids], [True] * 4 + [False] * 2)
+        due_dates = dict(Project.objects.values_list('pk', 'due_date'))
+        # 周五收样，加5个工作日
+        self.assertEqual([due_dates[pk] for pk in ids[:4]], [None, date(2017, 5, 12), None, date(2017, 5, 12)])
+
+
+    def test_all_null_due_dates(self):
+        # 所选项目都需提取时合同节点全为空，直接SET NULL，不生成无类型的CASE（PostgreSQL推断为text）
+        ids = [obj.pk for obj in self.projects[:4:2]]
+        with CaptureQueriesContext(connection) as context:
+            confirm_projects(ids)
+        update = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE "pm_project"')]
+        self.assertEqual(len(update), 1)
+        self.assertIn('"due_date" = NULL', update[0])
+        self.assertEqual(list(Project.objects.filter(pk__in=ids).values_list('is_confirm', 'due_date')),
+                         [(True, None)] * 2)
+
+class PendingSamplesTest(TestCase):
+    """
+    下单选样：已下单的样品不可选，下单表单不渲染候选样品
+    """
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        contract = Contract.objects.create(contract_number='C001', name='合同', type=1, salesman=self.user, price=1,
+                                           range=1, fis_amount=1, fin_amount=0)
+        project = Project.objects.create(
+            contract=contract, customer='客户', name='项目', service_type='16S', data_amount='1G', is_ext=True,
+            is_qc=True, is_lib=True, ext_cycle=1, ext_task_cycle=1, qc_cycle=1, qc_task_cycle=1, lib_cycle=1,
+            lib_task_cycle=1, seq_cycle=1, ana_cycle=1, is_confirm=True)
+        self.samples = [SampleInfo.objects.create(project=project, type='G', species='人', name='S%s' % i, volume=1,
+                                                  concentration=1, receive_date=date(2017, 5, 2), check=True)
+                        for i in range(4)]
+        self.today = date(2017, 5, 3)
+
+    def pending(self, stage):
+        return sorted(pending_samples(stage).values_list('name', flat=True))
+
+    def test_pending(self):
+        ExtTask.objects.create(sample=self.samples[0], sub_date=self.today, result=True)
+        ExtTask.objects.create(sample=self.samples[1], sub_date=self.today, result=False)
+        self.assertEqual(self.pending('ext'), ['S2', 'S3'])
+        self.assertEqual(self.pending('qc'), ['S0'])
+        QcTask.objects.create(sample=self.samples[0], sub_date=self.today, result=1)
+        self.assertEqual(self.pending('qc'), [])
+        self.assertEqual(self.pending('lib'), ['S0'])
+        LibTask.objects.create(sample=self.samples[0], sub_date=self.today, result=False)
+        self.assertEqual(self.pending('lib'), ['S0'])
+
+    def test_picker(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/pm/extsubmit/add/')
+        self.assertNotContains(response, '<option value="%s"' % self.samples[0].pk)
+        data = self.client.get('/pm/extsubmit/samples/', {'q': 'S1'}).json()
+        self.assertEqual([item['id'] for item in data['results']], [self.samples[1].pk])
+        self.assertFalse(data['more'])
+
+
+class ProjectChangeListTest(TestCase):
+    """
+    项目列表页：状态、进度和收样列按页批量计算，查询数与项目数无关
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.contract = Contract.objects.create(contract_number='C001', name='合同', type=1, salesman=self.user,
+                                                price=1, range=1, fis_amount=0, fin_amount=0)
+        self.project_num = 0
+
+    def add_projects(self, num):
+        for i in range(num):
+            self.project_num += 1
+            project = Project.objects.create(
+                contract=self.contract, customer='客户', name='项目%s' % self.project_num, service_type='16S',
+                data_amount='1G', is_ext=True, is_qc=True, is_lib=True, ext_cycle=1, ext_task_cycle=1, qc_cycle=1,
+                qc_task_cycle=1, lib_cycle=1, lib_task_cycle=1, seq_cycle=1, ana_cycle=1, is_confirm=True,
+                due_date=date(2017, 6, 1))
+            samples = [SampleInfo.objects.create(project=project, type='G', species='人', name='S%s' % day.day,
+                                                 volume=1, concentration=1, receive_date=day, check=True)
+                       for day in (date(2017, 5, 2), date(2017, 5, 5))]
+            # 提取完成一半
+            ExtTask.objects.create(sample=samples[0], sub_date=date(2017, 5, 8), date=date(2017, 5, 9), result=True)
+            ExtTask.objects.create(sample=samples[1], sub_date=date(2017, 5, 8))
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/pm/project/')
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_query_count_is_constant(self):
+        self.client.force_login(self.user)
+        self.add_projects(2)
+        count, response = self.count_queries()
+        self.assertContains(response, '20170505')
+        self.assertContains(response, '1/2-')
+        self.add_projects(20)
+        self.assertEqual(self.count_queries()[0], count)
+
+    def test_no_writes(self):
+        # 列表页只读：阶段完成日由任务写入时同步，渲染时不写库
+        self.client.force_login(self.user)
+        self.add_projects(2)
+        ExtTask.objects.filter(result=None).update(date=date(2017, 5, 10), result=True)
+        Project.objects.update(ext_date=None, qc_date=date(2017, 5, 1))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/pm/project/')
+        self.assertEqual(response.status_code, 200)
+        writes = [query['sql'] for query in context.captured_queries
+                  if query['sql'].lstrip().upper().startswith(('UPDATE', 'INSERT', 'DELETE'))]
+        self.assertEqual(writes, [])
+        self.assertEqual(list(Project.objects.values_list('ext_date', 'qc_date').distinct()),
+                         [(None, date(2017, 5, 1))])
+
+    def test_row_value_outside_changelist(self):
+        self.add_projects(1)
+        project_admin = admin.site._registry[Project]
+        project = Project.objects.get()
+        self.assertEqual(project_admin.sample_num(project), 2)
+        self.assertEqual(project_admin.receive_date(project), '20170505')
+
+
+class SubmitTasksTest(TestCase):
+    """
+    实验任务批量下单：写入全部任务，只为尚无合同节点的项目设置合同节点，并同步项目进度和样品流程状态
+    """
+    def setUp(self):
+        user = User.objects.create_user('sale')
+        contract = Contract.objects.create(contract_number='C001', name='合同', type=1, salesman=user, price=1,
+                                           range=1, fis_amount=1, fin_amount=0)
+        self.projects = [Project.objects.create(
+            contract=contract, customer='客户', name='项目%s' % i, service_type='16S', data_amount='1G', is_ext=True,
+            is_qc=True, is_lib=True, ext_cycle=1, ext_task_cycle=1, qc_cycle=2, qc_task_cycle=1, lib_cycle=3,
+            lib_task_cycle=1, seq_cycle=4, ana_cycle=5, is_confirm=True, due_date=due_date)
+            for i, due_date in enumerate((None, date(2017, 6, 1), None))]
+        for project in self.projects:
+            for i in range(2):
+                SampleInfo.objects.create(project=project, type='G', species='人', name='S%s' % i, volume=1,
+                                          concentration=1, receive_date=date(2017, 5, 2), check=True)
+
+    def test_submit(self):
+        today = date.today()
+        versions = plan_versions()
+        samples = SampleInfo.objects.filter(project__in=self.projects[:2])
+        self.assertEqual(submit_tasks(ExtTask, 'ext', samples, ['ext_cycle', 'seq_cycle', 'ana_cycle'])[:2], (4, 1))
+        self.assertEqual(list(ExtTask.objects.values_list('sub_date', flat=True).distinct()), [today])
+        due_dates = dict(Project.objects.values_list('pk', 'due_date'))
+        self.assertEqual([due_dates[obj.pk] for obj in self.projects],
+                         [add_business_days(today, 10), date(2017, 6, 1), None])
+        # bulk_create不触发信号，进度、样品流程状态和排期版本由submit_tasks同步
+        progress = dict(ProjectProgress.objects.values_list('project', 'ext_total'))
+        self.assertEqual([progress.get(obj.pk) for obj in self.projects], [2, 2, None])
+        self.assertEqual(sorted(SampleInfo.objects.values_list('project', 'stage').distinct()),
+                         [(self.projects[0].pk, 'ext_running'), (self.projects[1].pk, 'ext_running'),
+                          (self.projects[2].pk, 'ext_pending')])
+        self.assertEqual(plan_versions()['ext'], versions.get('ext', 0) + 1)
+        # 再次下单不改变已有的合同节点
+        submit_tasks(ExtTask, 'ext', SampleInfo.objects.filter(project=self.projects[0]), ['ana_cycle'])
+        self.assertEqual(Project.objects.get(pk=self.projects[0].pk).due_date, add_business_days(today, 10))
+
+
+class RebuildProgressTest(TestCase):
+    """
+    重建项目进度：按实验任务重新统计，与任务写入时增量维护的结果一致，迁移中可用历史模型
+    """
+    def setUp(self):
+        user = User.objects.create_user('sale')
+        contract = Contract.objects.create(contract_number='C001', name='合同', type=1, salesman=user, price=1,
+                                           range=1, fis_amount=1, fin_amount=0)
+        self.projects = [Project.objects.create(
+            contract=contract, customer='客户', name='项目%s' % i, service_type='16S', data_amount='1G',
+            is_ext=True, is_qc=True, is_lib=False, ext_cycle=1, ext_task_cycle=1, qc_cycle=1, qc_task_cycle=1,
+            lib_cycle=1, lib_task_cycle=1, seq_cycle=1, ana_cycle=1, is_confirm=True) for i in range(3)]
+        samples = [SampleInfo.objects.create(project=self.projects[0], type='G', species='人', name='S%s' % i,
+                                             volume=1, concentration=1, receive_date=date(2017, 5, 2), check=True)
+                   for i in range(2)]
+        ExtTask.objects.create(sample=samples[0], sub_date=date(2017, 5, 3), date=date(2017, 5, 4), result=True)
+        ExtTask.objects.create(sample=samples[1], sub_date=date(2017, 5, 3), date=date(2017, 5, 5), result=True)
+        QcTask.objects.create(sample=samples[0], sub_date=date(2017, 5, 6))
+
+    def progress(self):
+        return list(ProjectProgress.objects.order_by('project').values_list(
+            'project', 'ext_total', 'ext_done', 'ext_date', 'qc_total', 'qc_done', 'qc_date', 'lib_total'))
+
+    def dates(self):
+        return list(Project.objects.order_by('pk').values_list('ext_date', 'qc_date'))
+
+    def test_rebuild(self):
+        expected, dates = self.progress(), self.dates()
+        self.assertEqual(expected[0][1:], (2, 2, date(2017, 5, 5), 1, 0, None, 0))
+        self.assertEqual(dates[0], (date(2017, 5, 5), None))
+        ProjectProgress.objects.all().delete()
+        Project.objects.update(ext_date=None, qc_date=date(2017, 5, 1))
+        self.assertEqual(rebuild_progress(batch_size=2), 3)
+        # 没有实验任务的项目也生成进度记录
+        self.assertEqual(self.progress(), expected[:1] + [(obj.pk, 0, 0, None, 0, 0, None, 0)
+                                                          for obj in self.projects[1:]])
+        self.assertEqual(self.dates(), dates)
+
+    def test_historical_models(self):
+        # 迁移pm 0018中用历史模型重建
+        rebuild_progress()
+        expected = self.progress()
+        ProjectProgress.objects.all().delete()
+        apps = MigrationLoader(connection).project_state(('pm', '0018_projectprogress')).apps
+        rebuild_progress(apps=apps)
+        self.assertEqual(self.progress(), expected)
+
+
+class TimelineTest(TestCase):
+    """
+    项目时间线：计划窗口按工作日由合同节点逆推并缓存，接口查询数与项目数无关
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.contract = Contract.objects.create(contract_number='C001', name='合同', type=1, salesman=self.user,
+                                                price=1, range=1, fis_amount=0, fin_amount=0)
+
+    def add_projects(self, num, **kwargs):
+        values = dict(contract=self.contract, customer='客户', service_type='16S', data_amount='1G', is_ext=False,
+                      is_qc=True, is_lib=False, ext_cycle=1, ext_task_cycle=1, qc_cycle=2, qc_task_cycle=1,
+                      lib_cycle=1, lib_task_cycle=1, seq_cycle=3, ana_cycle=5, is_confirm=True,
+                      due_date=date(2017, 5, 19))
+        values.update(kwargs)
+        return [Project.objects.create(name='项目%s' % Project.objects.count(), **values) for _ in range(num)]
+
+    def test_planned_windows(self):
+        project = self.add_projects(1)[0]
+        # 2017-05-19为周五，向前依次扣除分析5、测序3、质检2个工作日
+        self.assertEqual(planned_windows(project), {
+            'ana': (date(2017, 5, 12), date(2017, 5, 19)),
+            'seq': (date(2017, 5, 9), date(2017, 5, 12)),
+            'qc': (date(2017, 5, 5), date(2017, 5, 9)),
+        })
+        self.assertEqual(planned_windows(Project(due_date=None)), {})
+
+    def test_view(self):
+        self.client.force_login(self.user)
+        projects = self.add_projects(2, seq_start_date=date(2017, 5, 10))
+        sample = SampleInfo.objects.create(project=projects[0], type='G', species='人', name='S', volume=1,
+                                           concentration=1, receive_date=date(2017, 5, 2), check=True)
+        QcTask.objects.create(sample=sample, sub_date=date(2017, 5, 4))
+        with CaptureQueriesContext(connection) as context:
+            data = self.client.get('/pm/project/timeline/').json()
+        count = len(context.captured_queries)
+        stages = data['projects'][0]['stages']
+        self.assertEqual([stage['stage'] for stage in stages], ['qc', 'seq', 'ana'])
+        self.assertEqual(stages[0]['actual'], ['2017-05-04', None])
+        self.assertEqual((stages[0]['done'], stages[0]['total']), (0, 1))
+        self.assertEqual(stages[1]['planned'], ['2017-05-09', '2017-05-12'])
+        self.assertEqual(stages[1]['actual'], ['2017-05-10', None])
+        self.assertIsNone(data['next'])
+        self.add_projects(20)
+        with self.assertNumQueries(count):
+            data = self.client.get('/pm/project/timeline/').json()
+        self.assertEqual(len(data['projects']), 22)
+        # 合同节点变动后重新计算计划窗口
+        Project.objects.filter(pk=projects[0].pk).update(due_date=date(2017, 5, 26))
+        data = self.client.get('/pm/project/timeline/').json()
+        self.assertEqual(data['projects'][0]['stages'][2]['planned'], ['2017-05-19', '2017-05-26'])
+        self.assertEqual(self.client.get('/pm/project/timeline/chart/').status_code, 200)
+
+    def test_view_scope(self):
+        # 业务员只能看到自己合同下的项目，未知状态返回400
+        salesman = User.objects.create_user('sale', password='sale', is_staff=True)
+        salesman.user_permissions.add(Permission.objects.get(codename='change_project'))
+        own = Contract.objects.create(contract_number='C002', name='合同2', type=1, salesman=salesman, price=1,
+                                      range=1, fis_amount=0, fin_amount=0)
+        self.add_projects(2)
+        project = self.add_projects(1, contract=own)[0]
+        self.client.force_login(salesman)
+        data = self.client.get('/pm/project/timeline/').json()
+        self.assertEqual([item['id'] for item in data['projects']], [project.pk])
+        self.assertEqual(self.client.get('/pm/project/timeline/?status=XXX').status_code, 400)
+        data = self.client.get('/pm/project/timeline/?status=FIS').json()
+        self.assertEqual([item['id'] for item in data['projects']], [project.pk])
+
+
+class WorkdaysTest(SimpleTestCase):
+    """
+    工作日计算：扣除法定节假日，补入调休上班日，与逐日推算一致
+    """
+    def step(self, calendar, day, number_of_days):
+        # 逐日推算
+        direction = 1 if number_of_days > 0 else -1
+        for _ in range(abs(number_of_days)):
+            day += timedelta(direction)
+            while not calendar.is_workday(day):
+                day += timedelta(direction)
+        return day
+
+    def test_holidays(self):
+        for from_date, number_of_days, expected in (
+                (date(2026, 9, 30), 1, date(2026, 10, 8)),  # 国庆
+                (date(2026, 10, 8), -1, date(2026, 9, 30)),
+                (date(2026, 10, 9), 1, date(2026, 10, 10)),  # 周六调休上班
+                (date(2026, 10, 10), 1, date(2026, 10, 12)),
+                (date(2026, 2, 13), 1, date(2026, 2, 14)),  # 春节前周六上班
+                (date(2026, 2, 14), 1, date(2026, 2, 24)),
+                (date(2026, 2, 24), -1, date(2026, 2, 14)),
+                (date(2025, 12, 31), 1, date(2026, 1, 4)),  # 元旦后周日上班
+                (date(2026, 1, 4), -1, date(2025, 12, 31)),
+                (date(2017, 9, 29), 3, date(2017, 10, 10)),
+                (date(2026, 6, 18), 0, date(2026, 6, 18))):
+            self.assertEqual(add_business_days(from_date, number_of_days), expected, (from_date, number_of_days))
+
+    def test_matches_stepping(self):
+        calendar = load_calendar()
+        day = date(2016, 3, 1)
+        while day < date(2026, 12, 1):
+            for number_of_days in (-25, -6, -1, 1, 6, 25):
+                self.assertEqual(calendar.add_business_days(day, number_of_days),
+                                 self.step(calendar, day, number_of_days), (day, number_of_days))
+            day += timedelta(11)
+        self.assertEqual(calendar.warned_years, set())
+
+    def test_uncovered_year(self):
+        calendar = load_calendar()
+        with self.assertLogs('BMS.workdays', 'WARNING') as logs:
+            self.assertEqual(calendar.add_business_days(date(2040, 1, 2), 1), date(2040, 1, 3))
+            calendar.add_business_days(date(2040, 3, 1), 1)
+        self.assertEqual(len(logs.output), 1)
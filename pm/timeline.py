@@ -0,0 +1,112 @@
+"""
+项目时间线（甘特图数据）
+
+计划窗口由合同节点按工作日逆推：分析在合同节点前ana_cycle个工作日开始，测序在分析开始前seq_cycle个工作日开始，
+依次类推，不需提取、质检、建库的阶段跳过。计划窗口只与合同节点、是否需各阶段和各阶段周期有关，
+按这些字段的摘要缓存，字段变动后摘要不同即重新计算。实际窗口中提取、质检、建库的开始日为首个实验任务的提交日，
+每页按阶段各一次分组聚合；完成日和测序、分析的起止日直接取自项目。一页的查询数与项目数无关。
+"""
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min
+from BMS.workdays import add_business_days
+from .status import STAGE_TASKS, get_progress
+
+# (阶段, 名称, 是否需要该阶段的字段, 周期字段, 实际开始日字段, 实际完成日字段)
+TIMELINE_STAGES = (
+    ('ext', '提取', 'is_ext', 'ext_cycle', None, 'ext_date'),
+    ('qc', '质检', 'is_qc', 'qc_cycle', None, 'qc_date'),
+    ('lib', '建库', 'is_lib', 'lib_cycle', None, 'lib_date'),
+    ('seq', '测序', None, 'seq_cycle', 'seq_start_date', 'seq_end_date'),
+    ('ana', '分析', None, 'ana_cycle', 'ana_start_date', 'ana_end_date'),
+)
+PLAN_FIELDS = ('due_date', 'is_ext', 'is_qc', 'is_lib', 'ext_cycle', 'qc_cycle', 'lib_cycle', 'seq_cycle', 'ana_cycle')
+
+
+def plan_key(project):
+    # 计划窗口的缓存键，包含计划相关字段的摘要
+    digest = hashlib.md5(repr([getattr(project, name) for name in PLAN_FIELDS]).encode()).hexdigest()
+    return 'pm:timeline:%s:%s' % (project.pk, digest)
+
+
+def planned_windows(project):
+    """
+    :return: {阶段: (计划开始日, 计划完成日)}，未设合同节点时为空
+    """
+    if not project.due_date:
+        return {}
+    windows = {}
+    end = project.due_date
+    for stage, _, required, cycle_field, _, _ in reversed(TIMELINE_STAGES):
+        if required and not getattr(project, required):
+            continue
+        start = add_business_days(end, -getattr(project, cycle_field))
+        windows[stage] = (start, end)
+        end = start
+    return windows
+
+
+def planned_map(projects):
+    # 批量读取计划窗口，缓存中没有的计算后写入
+    keys = dict((project.pk, plan_key(project)) for project in projects)
+    cached = cache.get_many(keys.values())
+    missing = {}
+    result = {}
+    for project in projects:
+        windows = cached.get(keys[project.pk])
+        if windows is None:
+            windows = missing[keys[project.pk]] = planned_windows(project)
+        result[project.pk] = windows
+    if missing:
+        cache.set_many(missing, settings.TIMELINE_CACHE_TIMEOUT)
+    return result
+
+
+def task_start_map(model, project_ids):
+    # 按项目取首个实验任务的提交日 {project_id: sub_date}
+    return dict(model.objects.filter(sample__project__in=project_ids).values_list('sample__project')
+                .annotate(start=Min('sub_date')).order_by())
+
+
+def project_timelines(projects):
+    """
+    :param projects: 项目列表，需已加载contract和progress
+    :return: [{'id', 'name', 'customer', 'contract', 'due_date', 'stages': [{'stage', 'label', 'planned',
+              'actual', 'done', 'total'}]}]，日期为ISO格式，未开始或未完成为None
+    """
+    projects = list(projects)
+    if not projects:
+        return []
+    project_ids = [project.pk for project in projects]
+    planned = planned_map(projects)
+    task_starts = dict((stage, task_start_map(model, project_ids)) for stage, model in STAGE_TASKS)
+    result = []
+    for project in projects:
+        stages = []
+        for stage, label, required, _, start_field, end_field in TIMELINE_STAGES:
+            if required and not getattr(project, required):
+                continue
+            start = getattr(project, start_field) if start_field else task_starts[stage].get(project.pk)
+            item = {
+                'stage': stage,
+                'label': label,
+                'planned': _isoformat(planned[project.pk].get(stage, (None, None))),
+                'actual': _isoformat((start, getattr(project, end_field))),
+            }
+            if stage in task_starts:
+                item['done'], item['total'], _ = get_progress(project, stage)
+            stages.append(item)
+        result.append({
+            'id': project.pk,
+            'name': project.name,
+            'customer': project.customer,
+            'contract': '%s %s' % (project.contract.contract_number, project.contract.name),
+            'due_date': _isoformat((project.due_date,))[0],
+            'stages': stages,
+        })
+    return result
+
+
+def _isoformat(dates):
+    return [day.isoformat() if day else None for day in dates]